@@ -0,0 +1,204 @@
+"""Compare how many concurrent connections one process serves in sync and async mode.
+
+Runs the read endpoints (/products, /cart/items, /cart-summary, /orders)
+once on the WSGI apps behind a fixed thread pool, like `gunicorn --threads N`,
+and once on yepto.asgi under uvicorn, each in its own process. In sync mode every
+open request pins a thread, including while it waits on the database.
+Capacity is the highest concurrency whose p95 stays under --slo-ms without
+errors.
+
+Usage: python benchmarks/async_capacity.py [--levels 8,32,128,512] [--threads 8] [--duration 10]
+Set DATABASE_URL to a networked database for realistic I/O waits; the
+default SQLite file has almost none, so it mostly shows connection limits.
+Seeding drops every table first, so any database other than SQLite also
+needs --drop-existing.
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.gettempdir(), 'yepto_async_capacity.db')}")
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret-key-with-enough-bytes')  # Shared with the server processes
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from werkzeug.serving import BaseWSGIServer
+
+CONTENT_LENGTH = re.compile(rb'(?i)\r\ncontent-length:\s*(\d+)')
+CONNECTION_CLOSE = re.compile(rb'(?i)\r\nconnection:\s*close')
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    # A fixed number of handler threads; further connections queue for a free one
+    multithread = True
+
+    def __init__(self, host, port, app, threads, handler=None):
+        super().__init__(host, port, app, handler=handler)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def serve_sync(port, threads):
+    from loadtest import create_app, QuietHandler
+    app = create_app(os.environ['DATABASE_URL'])
+    PooledWSGIServer('127.0.0.1', port, app, threads, handler=QuietHandler).serve_forever()
+
+
+def serve_async(port):
+    import uvicorn
+    from yepto import asgi
+    uvicorn.run(asgi.app, host='127.0.0.1', port=port, log_level='warning', access_log=False)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, threads):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, __file__, '--serve', mode, '--port', str(port), '--threads', str(threads)])
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def request(reader, writer, path, token):
+    auth = f'Authorization: Bearer {token}\r\n' if token else ''
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n{auth}\r\n'.encode())
+    head = await reader.readuntil(b'\r\n\r\n')
+    await reader.readexactly(int(CONTENT_LENGTH.search(head).group(1)))
+    return int(head.split(b' ', 2)[1]), not CONNECTION_CLOSE.search(head)
+
+
+async def client(port, tokens, products, deadline, timeout, seed_value, samples):
+    rng = random.Random(seed_value)
+    conn = None
+    while time.monotonic() < deadline:
+        token = rng.choice(tokens)
+        path, token = rng.choice([
+            (f'/products?page={rng.randint(1, max(products // 50, 1))}&per_page=50', None),
+            ('/cart/items', token),
+            ('/cart-summary', token),
+            ('/orders', token),
+        ])
+        start = time.perf_counter()
+        try:
+            if conn is None:
+                conn = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+            status, keep_alive = await asyncio.wait_for(request(*conn, path, token), timeout)
+            if not keep_alive:
+                conn[1].close()
+                conn = None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, AttributeError):
+            status = None
+            if conn:
+                conn[1].close()
+            conn = None
+        samples.append((status, time.perf_counter() - start))
+    if conn:
+        conn[1].close()
+
+
+async def drive(port, tokens, products, concurrency, duration, timeout):
+    samples = []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*[
+        client(port, tokens, products, deadline, timeout, i, samples) for i in range(concurrency)
+    ])
+    return samples
+
+
+def summarize(samples, duration):
+    ok = sorted(elapsed for status, elapsed in samples if status is not None and status < 500)
+    errors = len(samples) - len(ok)
+    pct = lambda p: ok[min(len(ok) - 1, int(p / 100 * len(ok)))] * 1000 if ok else float('inf')
+    return {'rps': len(ok) / duration, 'p50_ms': pct(50), 'p95_ms': pct(95), 'errors': errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--serve', choices=['sync', 'async'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--levels', default='8,32,128,512', help='Comma separated connection counts')
+    parser.add_argument('--threads', type=int, default=8, help='Handler threads in sync mode')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per level')
+    parser.add_argument('--timeout', type=float, default=5.0, help='Per-request timeout, counted as an error')
+    parser.add_argument('--slo-ms', type=float, default=250.0)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--drop-existing', action='store_true',
+                        help='Allow dropping every table of a DATABASE_URL other than SQLite')
+    args = parser.parse_args()
+
+    if args.serve == 'sync':
+        return serve_sync(args.port, args.threads)
+    if args.serve == 'async':
+        return serve_async(args.port)
+
+    from loadtest import create_app, check_droppable, seed
+    from yepto.models import db, CartItem
+    try:
+        check_droppable(os.environ['DATABASE_URL'], args.drop_existing)
+    except ValueError as e:
+        parser.error(str(e))
+    app = create_app(os.environ['DATABASE_URL'])
+    tokens = seed(app, args.products, args.users, orders=args.users * 5, drop_existing=args.drop_existing)
+    with app.app_context():
+        rng = random.Random(1)
+        db.session.execute(CartItem.__table__.insert(), [
+            {'cart_id': cart_id, 'product_id': rng.randint(1, args.products), 'quantity': 1}
+            for cart_id in range(1, args.users + 1) for _ in range(3)
+        ])
+        db.session.commit()
+
+    levels = [int(level) for level in args.levels.split(',')]
+    capacity = {}
+    print(f"{'mode':<7}{'conns':>7}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for mode in ('sync', 'async'):
+        proc, port = start_server(mode, args.threads)
+        try:
+            asyncio.run(drive(port, tokens, args.products, 4, 2.0, args.timeout))  # Warm up pools and the facet snapshot
+            capacity[mode] = 0
+            for level in levels:
+                stats = summarize(asyncio.run(drive(port, tokens, args.products, level, args.duration, args.timeout)),
+                                  args.duration)
+                print(f"{mode:<7}{level:>7}{stats['rps']:>10.1f}{stats['p50_ms']:>10.1f}"
+                      f"{stats['p95_ms']:>10.1f}{stats['errors']:>8}")
+                if stats['errors'] == 0 and stats['p95_ms'] <= args.slo_ms:
+                    capacity[mode] = level
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    for mode, level in capacity.items():
+        print(f"{mode} capacity at p95 <= {args.slo_ms:g}ms: {level or 'below ' + str(levels[0])} connections")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+"""Load test the storefront API with scripted scenarios and a concurrent client.
+
+Boots every yepto view on one app over a threaded local HTTP server,
+backed by SQLite (default) or any DATABASE_URL, seeds a synthetic catalog,
+then reports latency percentiles, requests/sec and queries per request.
+SQLite serializes writers, so checkout numbers (and its lock errors) only
+mean something against the production database via --database-url.
+
+Seeding drops every table first. A --database-url other than SQLite is
+refused unless --drop-existing is passed as well, so point it at a scratch
+database only.
+
+    python benchmarks/loadtest.py --products 5000 --users 200 --duration 30 --out run.json
+    python benchmarks/loadtest.py --out new.json --compare run.json --max-regression 0.1
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')  # Replaced in create_app; only needed to import yepto
+
+from flask import g, has_request_context
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert, make_url
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from yepto.config import Config
+from yepto.models import (db, User, Cart, Category, Product, ProductVariant, Order, OrderItem,
+                          OrderStatus, Review, Payment)
+from yepto.pricing import order_totals
+from yepto.storefront import create_app as create_storefront
+
+SCENARIOS = {
+    'browse': 40,
+    'search': 25,
+    'add_to_cart': 20,
+    'checkout': 10,
+    'order_history': 10,
+    'admin': 5,
+}
+
+SEARCH_TERMS = ['red', 'blue', 'shirt', 'lamp', 'pro', 'mini', 'classic', 'eco']
+ADJECTIVES = ['red', 'blue', 'classic', 'eco', 'mini', 'pro', 'smart', 'vintage']
+NOUNS = ['shirt', 'lamp', 'mug', 'chair', 'bag', 'watch', 'speaker', 'sneaker']
+
+
+def create_app(database_url):
+    app = create_storefront(
+        database_url,
+        JWT_SECRET_KEY=Config.JWT_SECRET_KEY or 'bench-secret-key-with-enough-bytes',
+        RATE_LIMITS={},  # The load generator is one client IP
+    )
+
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_query(*args):
+            if has_request_context():
+                g.query_count = g.get('query_count', 0) + 1
+
+    @app.after_request
+    def add_query_count(response):
+        response.headers['X-Query-Count'] = str(g.get('query_count', 0))
+        return response
+
+    return app
+
+
+def check_droppable(database_url, drop_existing=False):
+    # Only SQLite files are dropped unasked, so a typo can't wipe a real database
+    url = make_url(database_url)
+    if not drop_existing and url.get_backend_name() != 'sqlite':
+        raise ValueError(f"Refusing to drop every table of {url.render_as_string(hide_password=True)}; "
+                         "pass --drop-existing if it is a scratch database")
+
+
+def seed(app, products, users, orders, seed_value=1, drop_existing=False):
+    check_droppable(app.config['SQLALCHEMY_DATABASE_URI'], drop_existing)
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(insert(Category), [{'name': f'category-{i}'} for i in range(max(products // 100, 5))])
+        categories = max(products // 100, 5)
+        db.session.execute(insert(Product), [
+            {'name': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}', 'description': 'Synthetic product',
+             'price': rng.randint(200, 80000), 'stock': 1000000, 'category_id': rng.randint(1, categories),
+             'image_url': f'https://cdn.example.com/p/{i}.jpg', 'created_at': now, 'updated_at': now}
+            for i in range(products)
+        ])
+        db.session.execute(insert(ProductVariant), [
+            {'product_id': pid, 'variant_type': 'size', 'variant_value': size, 'price_modifier': 0, 'stock': 100000}
+            for pid in range(1, products + 1, 5) for size in ('S', 'M', 'L')
+        ])
+
+        password = generate_password_hash('bench-password')  # Hashed once, hashing per user dominates seeding
+        db.session.execute(insert(User), [
+            {'username': f'user{i}', 'email': f'user{i}@example.com', 'password': password,
+             'is_admin': i == 0, 'created_at': now}
+            for i in range(users)
+        ])
+        db.session.execute(insert(Cart), [{'user_id': uid} for uid in range(1, users + 1)])
+        db.session.execute(insert(Review), [
+            {'user_id': rng.randint(1, users), 'product_id': rng.randint(1, products),
+             'rating': rng.randint(1, 5), 'created_at': now}
+            for _ in range(products // 2)
+        ])
+
+        order_rows = [
+            {'user_id': rng.randint(1, users), 'status': OrderStatus.COMPLETED,
+             'return_status': 'not_returned', 'created_at': now - timedelta(minutes=rng.randint(0, 525600))}
+            for _ in range(orders)
+        ]
+        items = [
+            {'order_id': oid, 'product_id': rng.randint(1, products), 'quantity': rng.randint(1, 3),
+             'price': rng.randint(200, 80000)}
+            for oid in range(1, orders + 1) for _ in range(rng.randint(1, 5))
+        ]
+        totals = order_totals([i['order_id'] for i in items], [i['price'] for i in items],
+                              [i['quantity'] for i in items])
+        for oid, order in enumerate(order_rows, 1):
+            order['total'] = totals.get(oid, 0)
+        db.session.execute(insert(Order), order_rows)
+        for start in range(0, len(items), 5000):
+            db.session.execute(insert(OrderItem), items[start:start + 5000])
+        db.session.execute(insert(Payment), [
+            {'order_id': oid, 'amount': order['total'], 'payment_method': 'card', 'status': 'completed',
+             'created_at': now}
+            for oid, order in enumerate(order_rows, 1)
+        ])
+        db.session.commit()
+        return [create_access_token(identity=uid) for uid in range(1, users + 1)]
+
+
+class QuietHandler(WSGIRequestHandler):  # Access logs would dominate the profile
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class Client:  # One keep-alive HTTP connection per worker thread
+
+    def __init__(self, port):
+        self.port = port
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def request(self, method, path, token=None, body=None):
+        headers = {'Accept-Encoding': 'gzip'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, payload, headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            return None, time.perf_counter() - start, 0, None
+        elapsed = time.perf_counter() - start
+        queries = int(response.getheader('X-Query-Count', 0))
+        if response.getheader('Content-Encoding') == 'gzip':
+            data = gzip.decompress(data)
+        parsed = None
+        if data[:1] in (b'{', b'['):
+            parsed = json.loads(data)
+        return response.status, elapsed, queries, parsed
+
+
+def run_scenario(name, client, rng, tokens, products, record):
+    token = rng.choice(tokens[1:] or tokens)
+
+    def call(step, method, path, use_token=None, body=None):
+        status, elapsed, queries, data = client.request(method, path, use_token, body)
+        record(step, status, elapsed, queries)
+        return status, data
+
+    if name == 'browse':
+        call('GET /', 'GET', '/')
+        call('GET /products', 'GET', f'/products?page={rng.randint(1, 20)}&per_page=50')
+    elif name == 'search':
+        term = rng.choice(SEARCH_TERMS)
+        call('GET /products?search', 'GET', f'/products?search={term}&sort=price_asc&page=1&per_page=50')
+    elif name == 'add_to_cart':
+        call('POST /cart', 'POST', '/cart', token, {'product_id': rng.randint(1, products), 'quantity': 1})
+        call('GET /cart/items', 'GET', '/cart/items', token)
+    elif name == 'checkout':
+        call('POST /cart', 'POST', '/cart', token, {'product_id': rng.randint(1, products), 'quantity': 1})
+        status, data = call('POST /checkout', 'POST', '/checkout', token)
+        if status == 201 and data:
+            call('POST /payments/process', 'POST', '/payments/process', token,
+                 {'order_id': data['order_id'], 'payment_method': 'card'})
+    elif name == 'order_history':
+        status, data = call('GET /orders', 'GET', '/orders', token)
+        if status == 200 and data['next_cursor']:
+            call('GET /orders?cursor', 'GET', f"/orders?cursor={data['next_cursor']}", token)
+        if status == 200 and data['orders']:
+            call('GET /orders/<id>', 'GET', f"/orders/{data['orders'][0]['id']}", token)
+    elif name == 'admin':
+        admin = tokens[0]
+        call('GET /admin/dashboard/sales', 'GET', '/admin/dashboard/sales', admin)
+        call('GET /admin/orders', 'GET', f'/admin/orders?page={rng.randint(1, 20)}', admin)
+        call('GET /admin/users', 'GET', '/admin/users', admin)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples, wall_time):
+    report = {}
+    for step, rows in sorted(samples.items()):
+        latencies = sorted(elapsed for _, elapsed, _ in rows)
+        report[step] = {
+            'requests': len(rows),
+            'errors': sum(1 for status, _, _ in rows if status is None or status >= 500),
+            'rps': len(rows) / wall_time,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'queries_per_request': sum(q for _, _, q in rows) / len(rows),
+        }
+    return report
+
+
+def run(app, tokens, products, concurrency, duration, seed_value=1):
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    samples = defaultdict(list)
+    samples_lock = threading.Lock()
+    names, weights = zip(*SCENARIOS.items())
+    deadline = time.perf_counter() + duration
+
+    def record(step, status, elapsed, queries):
+        with samples_lock:
+            samples[step].append((status, elapsed, queries))
+
+    def worker(index):
+        rng = random.Random(seed_value * 1000 + index)
+        client = Client(server.server_port)
+        while time.perf_counter() < deadline:
+            run_scenario(rng.choices(names, weights)[0], client, rng, tokens, products, record)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall_time = time.perf_counter() - start
+    server.shutdown()
+    return summarize(samples, wall_time), wall_time
+
+
+def compare(current, baseline, max_regression):
+    # Flags steps whose p95 grew or throughput dropped by more than max_regression
+    failures = []
+    for step, stats in current['steps'].items():
+        base = baseline['steps'].get(step)
+        if not base:
+            continue
+        if stats['p95_ms'] > base['p95_ms'] * (1 + max_regression):
+            failures.append(f"{step}: p95 {base['p95_ms']:.1f}ms -> {stats['p95_ms']:.1f}ms")
+        if stats['rps'] < base['rps'] * (1 - max_regression):
+            failures.append(f"{step}: rps {base['rps']:.1f} -> {stats['rps']:.1f}")
+    return failures
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(__file__)).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='Defaults to a throwaway SQLite file')
+    parser.add_argument('--drop-existing', action='store_true',
+                        help='Allow dropping every table of a --database-url other than SQLite')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds of load')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='Write results as JSON')
+    parser.add_argument('--compare', help='Baseline JSON to check for regressions')
+    parser.add_argument('--max-regression', type=float, default=0.10)
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+    try:
+        check_droppable(database_url, args.drop_existing)
+    except ValueError as e:
+        parser.error(str(e))
+    app = create_app(database_url)
+    print(f"seeding {args.products} products, {args.users} users, {args.orders} orders")
+    tokens = seed(app, args.products, args.users, args.orders, args.seed, args.drop_existing)
+
+    print(f"running {args.duration:g}s at concurrency {args.concurrency}")
+    steps, wall_time = run(app, tokens, args.products, args.concurrency, args.duration, args.seed)
+
+    print(f"{'step':<28}{'reqs':>7}{'err':>5}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>7}")
+    for step, s in steps.items():
+        print(f"{step:<28}{s['requests']:>7}{s['errors']:>5}{s['rps']:>9.1f}{s['p50_ms']:>9.1f}"
+              f"{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['queries_per_request']:>7.1f}")
+
+    result = {
+        'revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'database': database_url.split(':', 1)[0],
+        'params': {k: v for k, v in vars(args).items() if k not in ('out', 'compare', 'database_url', 'drop_existing')},
+        'wall_time': wall_time,
+        'steps': steps,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            failures = compare(result, json.load(f), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Time a full co-purchase recommendation build against order volume.
+
+Every volume drops all tables of DATABASE_URL (in-memory SQLite by default)
+before seeding; any other database than SQLite also needs --drop-existing.
+
+Usage: python benchmarks/recommendations.py [--drop-existing] [products] [orders ...]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadtest import check_droppable
+from yepto import app
+from yepto.models import db, Product, Order, OrderItem, OrderStatus, ProductRecommendation
+from yepto.recommendations import build_recommendations
+
+
+def seed(products, orders, rng):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Product.__table__.insert(), [
+        {'name': f'product-{i}', 'price': 1000, 'stock': 100, 'created_at': datetime.utcnow()}
+        for i in range(products)
+    ])
+    db.session.execute(Order.__table__.insert(), [
+        {'total': 0, 'status': OrderStatus.COMPLETED.name, 'created_at': datetime.utcnow()}
+        for _ in range(orders)
+    ])
+    # Zipf-distributed popularity, 1-6 lines per order
+    sizes = rng.integers(1, 7, orders)
+    product_ids = (rng.zipf(1.3, sizes.sum()) - 1) % products + 1
+    order_ids = np.repeat(np.arange(1, orders + 1), sizes)
+    db.session.execute(OrderItem.__table__.insert(), [
+        {'order_id': int(o), 'product_id': int(p), 'quantity': 1, 'price': 1000}
+        for o, p in zip(order_ids, product_ids)
+    ])
+    db.session.commit()
+    return len(order_ids)
+
+
+def main():
+    argv = [arg for arg in sys.argv[1:] if arg != '--drop-existing']
+    try:
+        check_droppable(os.environ['DATABASE_URL'], len(argv) < len(sys.argv) - 1)
+    except ValueError as e:
+        sys.exit(str(e))
+    products = int(argv[0]) if argv else 5000
+    volumes = [int(v) for v in argv[1:]] or [1000, 10000, 100000]
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+    rng = np.random.default_rng(42)
+
+    with app.app_context():
+        print(f"products={products}")
+        for orders in volumes:
+            lines = seed(products, orders, rng)
+            start = time.perf_counter()
+            built = build_recommendations()
+            elapsed = time.perf_counter() - start
+            stored = db.session.query(ProductRecommendation).count()
+            print(f"orders={orders:>8,} lines={lines:>9,} products_with_recs={built:>6,} "
+                  f"rows={stored:>7,} build={elapsed:7.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Time the key endpoints at growing data scales and flag super-linear latency growth.
+
+Each scale is bulk-loaded by yepto.datagen into its own database and measured
+in its own process, so in-process caches (catalog snapshot, trending tracker,
+first order-history pages) are built from that scale's data alone. Latency is
+the median of --requests sequential in-process requests after a warm-up.
+Steps served from a per-process cache reset it, untimed, before each request
+so they measure the queries behind it. Every scale ends at the same hour, so
+the trending window holds the newest generated events.
+Between consecutive scales an endpoint's growth exponent is
+log(latency ratio) / log(row ratio): about 0 for index lookups, 1 for full
+scans, and above 1 when something grows super-linearly, which fails the run.
+
+Every scale drops all tables of its database before generating. A
+--database-url other than SQLite is refused unless --drop-existing is
+passed as well, so point it at scratch databases only.
+
+    python benchmarks/scaling.py --scales 10k,1m,10m --out scaling.json
+    python benchmarks/scaling.py --database-url 'postgresql://localhost/yepto_{scale}' --drop-existing
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import select, delete, func
+from loadtest import create_app, check_droppable, git_revision
+from yepto import order_history, trending
+from yepto.datagen import SCALES, generate
+from yepto.models import db, Order, OrderItem, TrendingCheckpoint
+
+
+def scale_rows(scale):
+    # A named scale or a plain analytics row count
+    return SCALES[scale] if scale in SCALES else int(scale)
+
+
+def sync_trending():
+    # Sync on the request instead of serving the last ranking, as every TRENDING_SYNC_SECONDS
+    trending.last_sync = 0.0
+    if trending.tracker is not None:
+        trending.tracker.results.clear()
+
+
+def restore_trending():
+    # A fresh worker: no tracker and no checkpoint, so the window is replayed from analytics
+    trending.tracker = None
+    trending.last_sync = 0.0
+    db.session.execute(delete(TrendingCheckpoint))
+    db.session.commit()
+
+
+def endpoints(product_id, order_id):
+    # (step, path, token, reset) where token is 'user' (the user with most
+    # orders), 'admin' or None, and reset runs before each request
+    return [
+        ('GET /products', '/products?page=1&per_page=50', None, None),
+        ('GET /products (no page)', '/products', None, None),
+        ('GET /products?search', '/products?search=lamp&sort=price_asc&page=1&per_page=50', None, None),
+        ('GET /products?category', '/products?category=category-0&sort=rating&page=1&per_page=50', None, None),
+        ('GET /categories', '/categories', None, None),
+        ('GET /products/trending', '/products/trending', None, sync_trending),
+        ('GET /products/trending (cold)', '/products/trending', None, restore_trending),
+        ('GET /products/<id>/related', f'/products/{product_id}/related', None, None),
+        ('GET /orders', '/orders', 'user', order_history.first_page_cache.clear),
+        ('GET /orders/<id>', f'/orders/{order_id}', 'user', None),
+        ('GET /cart-summary', '/cart-summary', 'user', None),
+        ('GET /admin/dashboard/sales', '/admin/dashboard/sales', 'admin', None),
+        ('GET /admin/orders', '/admin/orders?page=100', 'admin', None),
+        ('GET /admin/inventory/low-stock', '/admin/inventory/low-stock', 'admin', None),
+    ]
+
+
+def measure(scale, database_url, requests, warmup, seed, end, drop_existing=False):
+    # Generates one scale and times every endpoint against it; runs in a child process
+    check_droppable(database_url, drop_existing)
+    app = create_app(database_url)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        start = time.perf_counter()
+        written = generate(scale_rows(scale), seed, end,
+                           echo=lambda message: print(f"[{scale}] {message}", file=sys.stderr))
+        generate_seconds = time.perf_counter() - start
+
+        product_id = db.session.execute(
+            select(OrderItem.product_id).group_by(OrderItem.product_id).order_by(func.count().desc()).limit(1)
+        ).scalar()
+        user_id = db.session.execute(
+            select(Order.user_id).group_by(Order.user_id).order_by(func.count().desc()).limit(1)
+        ).scalar()
+        order_id = db.session.execute(select(func.max(Order.id)).where(Order.user_id == user_id)).scalar()
+        tokens = {'user': create_access_token(identity=user_id), 'admin': create_access_token(identity=1)}
+
+    client = app.test_client()
+    steps = {}
+    for step, path, token, reset in endpoints(product_id, order_id):
+        headers = {'Authorization': f'Bearer {tokens[token]}'} if token else {}
+        latencies, queries = [], 0
+        for i in range(warmup + requests):
+            if reset:
+                with app.app_context():
+                    reset()
+            start = time.perf_counter()
+            response = client.get(path, headers=headers)
+            elapsed = time.perf_counter() - start
+            if response.status_code >= 400:
+                raise RuntimeError(f"{step} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+            if i >= warmup:
+                latencies.append(elapsed)
+                queries += int(response.headers.get('X-Query-Count', 0))
+        latencies.sort()
+        steps[step] = {
+            'p50_ms': latencies[len(latencies) // 2] * 1000,
+            'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+            'queries_per_request': queries / requests,
+        }
+    return {'scale': scale, 'rows': sum(written.values()), 'tables': written,
+            'generate_seconds': generate_seconds, 'steps': steps}
+
+
+def growth(results, min_ms, tolerance):
+    # Growth exponent of each step between consecutive scales, and the steps above 1 + tolerance
+    exponents, flagged = {}, []
+    for small, large in zip(results, results[1:]):
+        row_ratio = math.log(large['rows'] / small['rows'])
+        for step, stats in large['steps'].items():
+            before = max(small['steps'][step]['p50_ms'], min_ms)  # Below min_ms timings are mostly noise
+            after = max(stats['p50_ms'], min_ms)
+            exponent = math.log(after / before) / row_ratio
+            exponents.setdefault(step, []).append(exponent)
+            if exponent > 1 + tolerance:
+                flagged.append(f"{step}: {small['steps'][step]['p50_ms']:.1f}ms at {small['scale']} -> "
+                               f"{stats['p50_ms']:.1f}ms at {large['scale']} (exponent {exponent:.2f})")
+    return exponents, flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='10k,1m,10m',
+                        help=f"Comma-separated, smallest first: {', '.join(SCALES)} or analytics row counts")
+    parser.add_argument('--database-url', help="URL with a {scale} placeholder; defaults to throwaway SQLite files")
+    parser.add_argument('--drop-existing', action='store_true',
+                        help='Allow dropping every table of a --database-url other than SQLite')
+    parser.add_argument('--requests', type=int, default=30, help='Timed requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--min-ms', type=float, default=2.0, help='Latency floor when computing growth')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed growth exponent above 1')
+    parser.add_argument('--out', help='Write results as JSON')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)  # Child process: measure one scale, print JSON
+    parser.add_argument('--end', type=datetime.fromisoformat, help=argparse.SUPPRESS)  # Newest generated timestamp
+    args = parser.parse_args()
+
+    if args.measure:
+        result = measure(args.measure, args.database_url, args.requests, args.warmup, args.seed, args.end,
+                         args.drop_existing)
+        print(json.dumps(result))
+        return
+
+    scales = args.scales.split(',')
+    try:
+        rows = [scale_rows(scale) for scale in scales]
+    except ValueError:
+        parser.error(f"--scales takes {', '.join(SCALES)} or row counts")
+    if len(scales) < 2 or any(small >= large for small, large in zip(rows, rows[1:])):
+        parser.error("--scales needs at least two scales in increasing order")
+    if args.database_url:
+        try:
+            check_droppable(args.database_url.format(scale=scales[0]), args.drop_existing)
+        except ValueError as e:
+            parser.error(str(e))
+    directory = tempfile.mkdtemp()
+    end = datetime.utcnow().replace(minute=0, second=0, microsecond=0)  # Same rows at every scale
+    results = []
+    for scale in scales:
+        database_url = (args.database_url or f"sqlite:///{os.path.join(directory, 'scale_{scale}.db')}").format(
+            scale=scale)
+        print(f"generating and measuring {scale}", flush=True)
+        output = subprocess.run(
+            [sys.executable, __file__, '--measure', scale, '--database-url', database_url,
+             '--requests', str(args.requests), '--warmup', str(args.warmup), '--seed', str(args.seed),
+             '--end', end.isoformat()] + (['--drop-existing'] if args.drop_existing else []),
+            stdout=subprocess.PIPE, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{scale}: {result['rows']} rows generated in {result['generate_seconds']:.1f}s")
+        results.append(result)
+
+    exponents, flagged = growth(results, args.min_ms, args.tolerance)
+    header = ''.join(f"{r['scale'] + ' ms':>11}" for r in results)
+    print(f"{'step':<32}{header}{'q/req':>7}  growth")
+    for step in results[0]['steps']:
+        latencies = ''.join(f"{r['steps'][step]['p50_ms']:>11.1f}" for r in results)
+        growths = ' '.join(f'{e:.2f}' for e in exponents.get(step, []))
+        print(f"{step:<32}{latencies}{results[-1]['steps'][step]['queries_per_request']:>7.1f}  {growths}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({
+                'revision': git_revision(),
+                'timestamp': datetime.utcnow().isoformat(),
+                'params': {k: v for k, v in vars(args).items() if k not in ('out', 'measure', 'database_url', 'end', 'drop_existing')},
+                'end': end.isoformat(),
+                'results': results,
+                'exponents': exponents,
+                'flagged': flagged,
+            }, f, indent=2)
+
+    for flag in flagged:
+        print(f"SUPER-LINEAR {flag}")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == '__main__':
+    main()
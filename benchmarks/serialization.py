@@ -0,0 +1,89 @@
+"""Compare rows/sec of the ORM + dict + jsonify path with yepto.serializers.
+
+Usage: python benchmarks/serialization.py [rows] [repeat]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import jsonify
+from yepto import app
+from yepto.models import db, Product, Category, Order, OrderStatus
+from yepto.serializers import ProductSchema, OrderSchema, json_response, orjson
+
+
+def seed(rows):
+    categories = [Category(name=f'category-{i}') for i in range(20)]
+    db.session.add_all(categories)
+    db.session.flush()
+    db.session.execute(Product.__table__.insert(), [
+        {'name': f'product-{i}', 'price': 999 + i % 100 * 100, 'stock': i % 50,
+         'category_id': categories[i % 20].id, 'image_url': f'https://cdn.example.com/{i}.jpg',
+         'created_at': datetime.utcnow()}
+        for i in range(rows)
+    ])
+    db.session.execute(Order.__table__.insert(), [
+        {'user_id': None, 'total': 1950 + i % 300 * 100, 'status': OrderStatus.COMPLETED.name,
+         'return_status': 'not_returned', 'created_at': datetime.utcnow()}
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+
+def products_orm():
+    products = Product.query.all()
+    return jsonify({'products': [
+        {'id': p.id, 'name': p.name, 'price': p.price, 'image_url': p.image_url, 'category': p.category.name}
+        for p in products
+    ]}).get_data()
+
+
+def products_schema():
+    stmt = ProductSchema.select().select_from(Product).outerjoin(Category, Category.id == Product.category_id)
+    return json_response({'products': ProductSchema.all(stmt)}).get_data()
+
+
+def orders_orm():
+    return jsonify([{
+        'id': o.id, 'user_id': o.user_id, 'total': o.total,
+        'status': o.status.value, 'created_at': o.created_at.isoformat()
+    } for o in Order.query.all()]).get_data()
+
+
+def orders_schema():
+    return json_response(OrderSchema.all(OrderSchema.select())).get_data()
+
+
+def measure(fn, rows, repeat):
+    fn()  # Warm up statement caches
+    best = float('inf')
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return rows / best
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+
+    with app.app_context():
+        db.create_all()
+        seed(rows)
+        print(f"rows={rows} repeat={repeat} encoder={'orjson' if orjson else 'json'}")
+        for name, baseline, schema in [('products', products_orm, products_schema),
+                                       ('orders', orders_orm, orders_schema)]:
+            old = measure(baseline, rows, repeat)
+            new = measure(schema, rows, repeat)
+            print(f"{name:<10} orm+jsonify {old:>12,.0f} rows/s   schema {new:>12,.0f} rows/s   x{new / old:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Measure signups/sec through POST /auth/register and bulk provisioning.
+
+Register is measured end to end, password hashing included, together with
+SQL statements and commits per signup. Bulk provisioning is measured at each
+batch size, once with passwords and once without (invite-only accounts), to
+separate hashing cost from database cost.
+
+All tables are dropped first; a --database-url other than SQLite also
+needs --drop-existing.
+
+Usage: python benchmarks/signups.py [--signups 200] [--bulk 20000] [--hashed 500] [--batch-sizes 100,1000,5000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import event
+from loadtest import create_app, check_droppable
+from yepto.models import db, User
+from yepto.provisioning import provision_users
+
+
+def count_commits(app):
+    commits = [0]
+    with app.app_context():
+        event.listen(db.engine, 'commit', lambda conn: commits.__setitem__(0, commits[0] + 1))
+    return commits
+
+
+def bench_register(app, signups, commits):
+    client = app.test_client()
+    queries = 0
+    commits[0] = 0
+    start = time.perf_counter()
+    for i in range(signups):
+        response = client.post('/auth/register', json={
+            'email': f'signup{i}@example.com', 'username': f'signup{i}', 'password': 'correct horse battery',
+        })
+        assert response.status_code == 201, response.get_data(as_text=True)
+        queries += int(response.headers['X-Query-Count'])
+    elapsed = time.perf_counter() - start
+
+    duplicate = client.post('/auth/register', json={
+        'email': 'signup0@example.com', 'username': 'someone-else', 'password': 'x',
+    })
+    assert duplicate.status_code == 409, duplicate.get_data(as_text=True)
+    return signups / elapsed, queries / signups, commits[0] / signups
+
+
+def bench_bulk(app, total, batch_size, passwords, offset):
+    users = [
+        {'email': f'bulk{offset + i}@example.com', 'username': f'bulk{offset + i}',
+         'password': 'correct horse battery' if passwords else None}
+        for i in range(total)
+    ]
+    with app.app_context():
+        start = time.perf_counter()
+        created, skipped = provision_users(users, batch_size)
+        elapsed = time.perf_counter() - start
+        assert created == total and not skipped
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='Defaults to a throwaway SQLite file')
+    parser.add_argument('--drop-existing', action='store_true',
+                        help='Allow dropping every table of a --database-url other than SQLite')
+    parser.add_argument('--signups', type=int, default=200, help='Sequential POST /auth/register calls')
+    parser.add_argument('--bulk', type=int, default=20000, help='Users per bulk provisioning run')
+    parser.add_argument('--hashed', type=int, default=500, help='Users per bulk run that set a password')
+    parser.add_argument('--batch-sizes', default='100,1000,5000')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'signups.db')}"
+    try:
+        check_droppable(database_url, args.drop_existing)
+    except ValueError as e:
+        parser.error(str(e))
+    app = create_app(database_url)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    commits = count_commits(app)
+
+    rate, queries, commit_count = bench_register(app, args.signups, commits)
+    print(f"register: {rate:.1f} signups/sec, {queries:.1f} statements and {commit_count:.1f} commits per signup")
+
+    offset = 0
+    for batch_size in [int(size) for size in args.batch_sizes.split(',')]:
+        for passwords in (True, False):
+            total = args.hashed if passwords else args.bulk
+            rate = bench_bulk(app, total, batch_size, passwords, offset)
+            offset += total
+            label = 'with passwords' if passwords else 'no passwords'
+            print(f"bulk batch={batch_size:<6} {label:<15} {rate:>10.1f} signups/sec ({total} users)")
+
+    with app.app_context():
+        print(f"{db.session.query(User).count()} users created")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""Add covering index for per-user order history.
+
+Revision ID: 1a7c3e9b5d62
+Revises: f2d86b1c7e40
+Create Date: 2026-10-19 15:12:47.530216
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a7c3e9b5d62'
+down_revision = 'f2d86b1c7e40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_user_created', ['user_id', 'created_at', 'id'], unique=False,
+                              postgresql_include=['total', 'status'])
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_user_created')
@@ -0,0 +1,55 @@
+"""Add job lease and admin stat tables, cart item timestamps.
+
+Revision ID: 3d9f1b6a8e24
+Revises: 7e5b2d8c4f19
+Create Date: 2026-10-19 18:22:37.504118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d9f1b6a8e24'
+down_revision = '7e5b2d8c4f19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_lease',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('owner', sa.String(length=200), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.Column('checkpoint', sa.JSON(), nullable=True),
+    sa.Column('last_started_at', sa.DateTime(), nullable=True),
+    sa.Column('last_finished_at', sa.DateTime(), nullable=True),
+    sa.Column('last_duration', sa.Float(), nullable=True),
+    sa.Column('last_rows', sa.Integer(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('runs', sa.Integer(), nullable=False),
+    sa.Column('failures', sa.Integer(), nullable=False),
+    sa.Column('total_rows', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('admin_stat',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('added_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_cart_item_added_at'), ['added_at'], unique=False)
+
+    # Items already in carts start their hold now rather than being released on the first run
+    op.execute("UPDATE cart_item SET added_at = CURRENT_TIMESTAMP")
+
+
+def downgrade():
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_cart_item_added_at'))
+        batch_op.drop_column('added_at')
+
+    op.drop_table('admin_stat')
+    op.drop_table('job_lease')
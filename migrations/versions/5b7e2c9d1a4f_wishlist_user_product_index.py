@@ -0,0 +1,32 @@
+"""Add unique (user_id, product_id) index on wishlist.
+
+Revision ID: 5b7e2c9d1a4f
+Revises: 41e1c2400e1c
+Create Date: 2026-10-19 09:12:40.114233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c9d1a4f'
+down_revision = '41e1c2400e1c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Wishlists had no uniqueness before, so keep the first row of each
+    # duplicate pair. The derived table lets MySQL read the table it deletes from.
+    op.execute(
+        "DELETE FROM wishlist WHERE id NOT IN (SELECT id FROM ("
+        "SELECT MIN(id) AS id FROM wishlist GROUP BY user_id, product_id) AS oldest)"
+    )
+    with op.batch_alter_table('wishlist', schema=None) as batch_op:
+        batch_op.create_index('ix_wishlist_user_product', ['user_id', 'product_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('wishlist', schema=None) as batch_op:
+        batch_op.drop_index('ix_wishlist_user_product')
@@ -0,0 +1,31 @@
+"""One low stock row per product or variant.
+
+Revision ID: 6f1d3b9a2c57
+Revises: a4c8e1f6b372
+Create Date: 2026-10-19 23:02:41.736108
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1d3b9a2c57'
+down_revision = 'a4c8e1f6b372'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the newest row of any duplicates left by concurrent flushes. The
+    # derived table lets MySQL read the table it deletes from.
+    op.execute(
+        "DELETE FROM low_stock WHERE id NOT IN (SELECT id FROM ("
+        "SELECT MAX(id) AS id FROM low_stock GROUP BY product_id, COALESCE(variant_id, 0)) AS newest)"
+    )
+    op.create_index('ix_low_stock_item', 'low_stock',
+                    ['product_id', sa.func.coalesce(sa.column('variant_id'), 0)], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_low_stock_item', table_name='low_stock')
@@ -0,0 +1,60 @@
+"""Add low stock table.
+
+Revision ID: 7e5b2d8c4f19
+Revises: 1a7c3e9b5d62
+Create Date: 2026-10-19 16:04:12.918345
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e5b2d8c4f19'
+down_revision = '1a7c3e9b5d62'
+branch_labels = None
+depends_on = None
+
+# LOW_STOCK_THRESHOLD's default when this was written, fixed so the result
+# doesn't depend on the config of whoever runs it
+LOW_STOCK_THRESHOLD = 5
+
+
+def upgrade():
+    op.create_table('low_stock',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('variant_id', sa.Integer(), nullable=True),
+    sa.Column('level', sa.String(length=10), nullable=False),
+    sa.Column('since', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.ForeignKeyConstraint(['variant_id'], ['product_variant.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('low_stock', schema=None) as batch_op:
+        batch_op.create_index('ix_low_stock_level_since', ['level', 'since'], unique=False)
+        batch_op.create_index(batch_op.f('ix_low_stock_product_id'), ['product_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_low_stock_variant_id'), ['variant_id'], unique=False)
+
+    # Seed from current stock; the flush hook keeps it up to date from here
+    # on. Products sold only through their variants are judged by the
+    # variant rows.
+    op.execute(sa.text(
+        "INSERT INTO low_stock (product_id, variant_id, level, since) "
+        "SELECT id, NULL, CASE WHEN stock <= 0 THEN 'out' ELSE 'low' END, CURRENT_TIMESTAMP "
+        "FROM product WHERE stock <= :threshold AND id NOT IN (SELECT product_id FROM product_variant)"
+    ).bindparams(threshold=LOW_STOCK_THRESHOLD))
+    op.execute(sa.text(
+        "INSERT INTO low_stock (product_id, variant_id, level, since) "
+        "SELECT product_id, id, CASE WHEN stock <= 0 THEN 'out' ELSE 'low' END, CURRENT_TIMESTAMP "
+        "FROM product_variant WHERE stock <= :threshold"
+    ).bindparams(threshold=LOW_STOCK_THRESHOLD))
+
+
+def downgrade():
+    with op.batch_alter_table('low_stock', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_low_stock_variant_id'))
+        batch_op.drop_index(batch_op.f('ix_low_stock_product_id'))
+        batch_op.drop_index('ix_low_stock_level_since')
+
+    op.drop_table('low_stock')
@@ -0,0 +1,54 @@
+"""Add product variants with per-variant stock.
+
+Revision ID: 8d3f6a1e2b57
+Revises: 5b7e2c9d1a4f
+Create Date: 2026-10-19 10:02:11.530817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3f6a1e2b57'
+down_revision = '5b7e2c9d1a4f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_variant',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('variant_type', sa.String(length=50), nullable=False),
+    sa.Column('variant_value', sa.String(length=50), nullable=False),
+    sa.Column('price_modifier', sa.Float(), nullable=True),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('product_variant', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_product_variant_product_id'), ['product_id'], unique=False)
+
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('variant_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_cart_item_variant_id', 'product_variant', ['variant_id'], ['id'])
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('variant_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_order_item_variant_id', 'product_variant', ['variant_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_order_item_variant_id', type_='foreignkey')
+        batch_op.drop_column('variant_id')
+
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_cart_item_variant_id', type_='foreignkey')
+        batch_op.drop_column('variant_id')
+
+    with op.batch_alter_table('product_variant', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_variant_product_id'))
+
+    op.drop_table('product_variant')
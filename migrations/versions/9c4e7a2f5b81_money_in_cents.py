@@ -0,0 +1,63 @@
+"""Store money as integer cents.
+
+Revision ID: 9c4e7a2f5b81
+Revises: 3d9f1b6a8e24
+Create Date: 2026-10-19 20:41:09.271536
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e7a2f5b81'
+down_revision = '3d9f1b6a8e24'
+branch_labels = None
+depends_on = None
+
+
+# (table, column, integer type, nullable). Discount.value is scaled the same
+# way: fixed amounts become cents, percentages become basis points.
+MONEY_COLUMNS = [
+    ('product', 'price', sa.Integer(), False),
+    ('product_variant', 'price_modifier', sa.Integer(), True),
+    ('discount', 'value', sa.Integer(), False),
+    ('order', 'total', sa.BigInteger(), False),
+    ('order_item', 'price', sa.Integer(), False),
+    ('payment', 'amount', sa.BigInteger(), False),
+]
+
+
+def upgrade():
+    # Scale while the columns are still floats, then change their type; the
+    # values are whole numbers by then, so the cast is exact on every backend
+    for table, column, type_, nullable in MONEY_COLUMNS:
+        money = sa.column(column)
+        op.execute(sa.table(table, money).update().values({column: sa.func.round(money * 100)}))
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.Float(), type_=type_, existing_nullable=nullable,
+                                  postgresql_using=f'{column}::bigint')
+
+    # total_sales was stored in currency units; the admin_counts job recomputes it
+    op.execute("DELETE FROM admin_stat")
+    with op.batch_alter_table('admin_stat', schema=None) as batch_op:
+        batch_op.alter_column('value', existing_type=sa.Float(), type_=sa.BigInteger(), existing_nullable=False,
+                              postgresql_using='value::bigint')
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_status_total', ['status', 'total'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_status_total')
+
+    op.execute("DELETE FROM admin_stat")
+    with op.batch_alter_table('admin_stat', schema=None) as batch_op:
+        batch_op.alter_column('value', existing_type=sa.BigInteger(), type_=sa.Float(), existing_nullable=False)
+
+    for table, column, type_, nullable in MONEY_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=type_, type_=sa.Float(), existing_nullable=nullable)
+        money = sa.column(column)
+        op.execute(sa.table(table, money).update().values({column: money / 100.0}))
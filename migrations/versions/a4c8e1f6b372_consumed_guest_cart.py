@@ -0,0 +1,33 @@
+"""Record guest cart tokens already merged into an account.
+
+Revision ID: a4c8e1f6b372
+Revises: b5e8d2a7c613
+Create Date: 2026-10-19 22:48:03.517290
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8e1f6b372'
+down_revision = 'b5e8d2a7c613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('consumed_guest_cart',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('consumed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('consumed_guest_cart', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_consumed_guest_cart_consumed_at'), ['consumed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('consumed_guest_cart', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_consumed_guest_cart_consumed_at'))
+
+    op.drop_table('consumed_guest_cart')
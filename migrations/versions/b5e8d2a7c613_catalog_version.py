@@ -0,0 +1,29 @@
+"""Add shared catalog version row.
+
+Revision ID: b5e8d2a7c613
+Revises: 9c4e7a2f5b81
+Create Date: 2026-10-19 22:07:45.613902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e8d2a7c613'
+down_revision = '9c4e7a2f5b81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalog_version = op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(catalog_version, [{'id': 1, 'version': 1}])
+
+
+def downgrade():
+    op.drop_table('catalog_version')
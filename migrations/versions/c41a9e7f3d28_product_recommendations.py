@@ -0,0 +1,41 @@
+"""Add co-purchase counts and top-K product recommendations.
+
+Revision ID: c41a9e7f3d28
+Revises: 8d3f6a1e2b57
+Create Date: 2026-10-19 11:20:54.902146
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41a9e7f3d28'
+down_revision = '8d3f6a1e2b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_cooccurrence',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('other_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['other_id'], ['product.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'other_id')
+    )
+    op.create_table('product_recommendation',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.SmallInteger(), autoincrement=False, nullable=False),
+    sa.Column('related_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.ForeignKeyConstraint(['related_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'rank')
+    )
+
+
+def downgrade():
+    op.drop_table('product_recommendation')
+    op.drop_table('product_cooccurrence')
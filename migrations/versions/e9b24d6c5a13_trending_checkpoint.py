@@ -0,0 +1,35 @@
+"""Add trending tracker checkpoints and analytics created_at index.
+
+Revision ID: e9b24d6c5a13
+Revises: c41a9e7f3d28
+Create Date: 2026-10-19 12:41:08.377520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b24d6c5a13'
+down_revision = 'c41a9e7f3d28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trending_checkpoint',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('last_event_id', sa.Integer(), nullable=False),
+    sa.Column('state', sa.LargeBinary(length=16777215), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('analytics', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_analytics_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('analytics', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_analytics_created_at'))
+
+    op.drop_table('trending_checkpoint')
@@ -0,0 +1,34 @@
+"""Add audit log targets, payload and query indexes.
+
+Revision ID: f2d86b1c7e40
+Revises: e9b24d6c5a13
+Create Date: 2026-10-19 13:55:31.268094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2d86b1c7e40'
+down_revision = 'e9b24d6c5a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('target_type', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('target_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('payload', sa.JSON(), nullable=True))
+        batch_op.create_index('ix_audit_log_admin_timestamp', ['admin_id', 'timestamp', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_audit_log_timestamp'), ['timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_audit_log_timestamp'))
+        batch_op.drop_index('ix_audit_log_admin_timestamp')
+        batch_op.drop_column('payload')
+        batch_op.drop_column('target_id')
+        batch_op.drop_column('target_type')
@@ -0,0 +1,70 @@
+import os
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')  # Replaced per test; only needed to import yepto
+
+import pytest
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from yepto.models import db, User, Cart, Category, Product, ProductVariant, Order, OrderItem, OrderStatus
+from yepto.order_history import first_page_cache
+from yepto.storefront import create_app
+from yepto.wishlist import wishlist_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    # Every module app's views on one app, over a throwaway SQLite file
+    app = create_app(
+        f"sqlite:///{tmp_path / 'yepto.db'}",
+        TESTING=True,
+        JWT_SECRET_KEY='test-secret-key-long-enough-for-hs256',
+        SECRET_KEY='test-secret-key',
+        RATE_LIMITS={},
+    )
+    with app.app_context():
+        db.create_all()
+    # Per-process caches keyed by user id, which every test's database reuses
+    first_page_cache.clear()
+    wishlist_cache.clear()
+    return app
+
+
+@pytest.fixture
+def tokens(app):
+    # 5 products, product 1 sold through 3 variants, one past order; user 1 is an admin
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.execute(insert(Category), [{'name': 'shirts'}, {'name': 'lamps'}])
+        db.session.execute(insert(Product), [
+            {'name': f'product {i}', 'price': 1000 * i, 'stock': 0 if i == 1 else 100,
+             'category_id': 1 + i % 2, 'created_at': now, 'updated_at': now}
+            for i in range(1, 6)
+        ])
+        db.session.execute(insert(ProductVariant), [
+            {'product_id': 1, 'variant_type': 'size', 'variant_value': size, 'price_modifier': 100 * i, 'stock': 20}
+            for i, size in enumerate(('S', 'M', 'L'))
+        ])
+        password = generate_password_hash('password')
+        db.session.execute(insert(User), [
+            {'username': f'user{i}', 'email': f'user{i}@example.com', 'password': password,
+             'is_admin': i == 1, 'created_at': now}
+            for i in (1, 2)
+        ])
+        db.session.execute(insert(Cart), [{'user_id': 1}, {'user_id': 2}])
+        db.session.execute(insert(Order), [{'user_id': 1, 'total': 3000, 'status': OrderStatus.COMPLETED,
+                                            'return_status': 'not_returned', 'created_at': now - timedelta(days=1)}])
+        db.session.execute(insert(OrderItem), [{'order_id': 1, 'product_id': 3, 'quantity': 1, 'price': 3000}])
+        db.session.commit()
+        return [create_access_token(identity=uid) for uid in (1, 2)]
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def auth(token):
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from conftest import auth
+from yepto.models import db, AuditLog
+
+START = datetime(2026, 1, 1)
+
+
+def audit(client, token, **args):
+    response = client.get('/admin/audit', headers=auth(token), query_string=args)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_pages_follow_timestamps_not_ids(app, client, tokens):
+    # Ids come from the batch write, so a later batch can hold earlier actions
+    with app.app_context():
+        db.session.execute(insert(AuditLog), [
+            {'admin_id': 1, 'action': f'a{minute}', 'timestamp': START + timedelta(minutes=minute)}
+            for minute in (5, 6, 1, 2, 3, 4)
+        ] + [{'admin_id': 2, 'action': 'other', 'timestamp': START + timedelta(minutes=10)}])
+        db.session.commit()
+
+    first = audit(client, tokens[0], admin_id=1, per_page=4)
+    assert [e['action'] for e in first['entries']] == ['a6', 'a5', 'a4', 'a3']
+    second = audit(client, tokens[0], admin_id=1, per_page=4, before_id=first['next_before_id'])
+    assert [e['action'] for e in second['entries']] == ['a2', 'a1']
+    assert second['next_before_id'] is None
+
+
+def test_time_range_for_one_admin(app, client, tokens):
+    with app.app_context():
+        db.session.execute(insert(AuditLog), [
+            {'admin_id': admin_id, 'action': f'{admin_id}:{day}', 'timestamp': START + timedelta(days=day)}
+            for day in range(10) for admin_id in (1, 2)
+        ])
+        db.session.commit()
+
+    page = audit(client, tokens[0], admin_id=2, since=(START + timedelta(days=3)).isoformat(),
+                 until=(START + timedelta(days=6)).isoformat())
+    assert [e['action'] for e in page['entries']] == ['2:5', '2:4', '2:3']
+
+
+def test_audit_log_is_admin_only(client, tokens):
+    assert client.get('/admin/audit', headers=auth(tokens[1])).status_code == 403
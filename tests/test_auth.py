@@ -0,0 +1,38 @@
+import pytest
+
+from conftest import auth
+from yepto.maintenance import prune_revoked_tokens
+from yepto.models import db, RevokedToken
+
+
+def test_logged_out_token_is_refused(client, tokens):
+    assert client.get('/cart/items', headers=auth(tokens[1])).status_code == 200
+    assert client.post('/auth/logout', headers=auth(tokens[1])).status_code == 200
+    assert client.get('/cart/items', headers=auth(tokens[1])).status_code == 401
+    assert client.get('/cart/items', headers=auth(tokens[0])).status_code == 200  # Other tokens still work
+
+
+def test_prune_keeps_revocations_until_the_token_expires(app, client, tokens):
+    client.post('/auth/logout', headers=auth(tokens[1]))
+    with app.app_context():
+        assert prune_revoked_tokens() == 0
+        db.session.get(RevokedToken, db.session.query(RevokedToken.jti).scalar()).expires_at = \
+            db.func.datetime('now', '-1 second')
+        db.session.commit()
+        assert prune_revoked_tokens() == 1
+
+
+def test_async_app_refuses_tokens_logged_out_on_the_wsgi_apps(app, client, tokens, monkeypatch):
+    pytest.importorskip('aiosqlite')
+    pytest.importorskip('greenlet')
+    pytest.importorskip('httpx')
+    from starlette.testclient import TestClient
+    from yepto import asgi
+
+    monkeypatch.setitem(asgi.flask_app.config, 'JWT_SECRET_KEY', app.config['JWT_SECRET_KEY'])
+    monkeypatch.setitem(asgi.flask_app.config, 'ASYNC_DATABASE_URL',
+                        asgi.async_database_url(app.config['SQLALCHEMY_DATABASE_URI']))
+    with TestClient(asgi.app) as async_client:
+        assert async_client.get('/cart/items', headers=auth(tokens[1])).status_code == 200
+        client.post('/auth/logout', headers=auth(tokens[1]))
+        assert async_client.get('/cart/items', headers=auth(tokens[1])).status_code == 401
@@ -0,0 +1,48 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from yepto import facets
+from yepto.models import db, Category, Product
+
+
+@pytest.fixture
+def catalog(app, tokens):
+    with app.app_context():
+        db.session.add(Category(id=3, name='bags, large'))
+        db.session.add_all([
+            Product(id=6, name='100% cotton', price=500, stock=1, category_id=3),
+            Product(id=7, name='1000 cotton', price=500, stock=1),
+            Product(id=8, name='snake_case', price=500, stock=1, category_id=3),
+            Product(id=9, name='snakeXcase', price=500, stock=1),
+        ])
+        db.session.commit()
+    return app
+
+
+def both_paths(app, **args):
+    # (SQL cold-start result, snapshot result) for the same query string
+    filters = facets.parse_filters(MultiDict(args))
+    with app.app_context():
+        return facets.sql_query(filters), facets.CatalogSnapshot(0).query(filters)
+
+
+@pytest.mark.parametrize('search, expected', [('0%', [6]), ('e_c', [8]), ('COTTON', [6, 7]), ('x', [9])])
+def test_search_is_a_literal_substring_on_both_paths(catalog, search, expected):
+    from_sql, from_snapshot = both_paths(catalog, search=search)
+    assert from_sql[:2] == from_snapshot[:2] == (expected, len(expected))
+
+
+def test_category_names_may_contain_commas(catalog):
+    from_sql, from_snapshot = both_paths(catalog, category=['bags, large', 'lamps'])
+    assert from_sql[0] == from_snapshot[0] == [1, 3, 5, 6, 8]
+    assert from_sql[2] == from_snapshot[2]
+
+
+def test_facet_counts_ignore_their_own_filter(catalog):
+    from_sql, from_snapshot = both_paths(catalog, category='shirts', max_price='25')
+    assert from_sql == from_snapshot
+    ids, total, counts = from_snapshot
+    assert (ids, total) == ([2], 1)
+    assert counts['categories'] == {'bags, large': 2, 'lamps': 1, 'shirts': 1}
+    assert counts['price'] == {'0-25': 1, '25-50': 1, '50-100': 0, '100-250': 0, '250-500': 0,
+                               '500-1000': 0, '1000+': 0}
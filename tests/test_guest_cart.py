@@ -0,0 +1,82 @@
+from sqlalchemy import select
+
+from yepto.guest_cart import GUEST_CART_HEADER, dump_guest_cart, load_guest_token
+from yepto.models import db, Cart, CartItem, Product, ProductVariant
+
+
+def guest_add(client, token=None, **item):
+    headers = {GUEST_CART_HEADER: token} if token else {}
+    response = client.post('/guest/cart', headers=headers, json=item)
+    return response, response.headers.get(GUEST_CART_HEADER)
+
+
+def login(client, token, email='user2@example.com'):
+    client.delete_cookie('guest_cart')  # Only the token under test is sent
+    response = client.post('/auth/login', headers={GUEST_CART_HEADER: token},
+                           json={'email': email, 'password': 'password'})
+    assert response.status_code == 200
+    return response.get_json().get('cart_merged')
+
+
+def cart_lines(app, user_id=2):
+    with app.app_context():
+        return db.session.execute(
+            select(CartItem.product_id, CartItem.variant_id, CartItem.quantity)
+            .join(Cart, Cart.id == CartItem.cart_id).where(Cart.user_id == user_id).order_by(CartItem.id)
+        ).all()
+
+
+def test_token_round_trip(app):
+    with app.test_request_context():
+        token = dump_guest_cart('abc', [(2, None, 3, 2000), (1, 2, 1, 1100)])
+        assert load_guest_token(token) == ('abc', [(2, None, 3, 2000), (1, 2, 1, 1100)])
+
+
+def test_tampered_or_foreign_tokens_are_an_empty_cart(app):
+    with app.test_request_context():
+        token = dump_guest_cart('abc', [(2, None, 3, 2000)])
+        tampered = token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB')
+        assert load_guest_token(tampered) == (None, [])
+    app.config['SECRET_KEY'] = 'another-secret'
+    with app.test_request_context():
+        assert load_guest_token(token) == (None, [])
+
+
+def test_guest_cart_is_priced_from_the_catalog(app, client, tokens):
+    _, token = guest_add(client, product_id=2, quantity=2)
+    _, token = guest_add(client, token, product_id=1, variant_id=3, quantity=1)
+    with app.app_context():
+        db.session.get(Product, 2).price = 2500
+        db.session.commit()
+    cart = client.get('/guest/cart', headers={GUEST_CART_HEADER: token}).get_json()
+    assert [(i['product_id'], i['price'], i['price_changed']) for i in cart['items']] == \
+        [(2, 25.0, True), (1, 12.0, False)]
+    assert cart['total_price'] == 62.0
+
+
+def test_merge_reserves_stock_and_a_replayed_token_merges_nothing(app, client, tokens):
+    _, token = guest_add(client, product_id=2, quantity=2)
+    _, token = guest_add(client, token, product_id=2, quantity=1)
+    assert login(client, token) == 1
+    assert cart_lines(app) == [(2, None, 3)]
+    with app.app_context():
+        assert db.session.get(Product, 2).stock == 97
+
+    # Edits keep the cart id, so neither the same token nor a later copy merges again
+    _, edited = guest_add(client, token, product_id=4, quantity=1)
+    assert login(client, token) == 0
+    assert login(client, edited) == 0
+    assert cart_lines(app) == [(2, None, 3)]
+
+
+def test_merge_caps_quantity_at_the_stock_left(app, client, tokens):
+    _, token = guest_add(client, product_id=1, variant_id=2, quantity=15)
+    _, token = guest_add(client, token, product_id=5, quantity=1)
+    with app.app_context():
+        db.session.get(ProductVariant, 2).stock = 4  # Sold since the guest added it
+        db.session.get(Product, 5).stock = 0
+        db.session.commit()
+    assert login(client, token) == 1
+    assert cart_lines(app) == [(1, 2, 4)]
+    with app.app_context():
+        assert db.session.get(ProductVariant, 2).stock == 0
@@ -0,0 +1,49 @@
+from conftest import auth
+from yepto.http_cache import load_catalog_version
+from yepto.models import db, Product, ProductVariant
+
+
+def version(app):
+    with app.app_context():
+        return load_catalog_version()
+
+
+def add(client, token, **item):
+    return client.post('/cart/items', headers=auth(token), json=item)
+
+
+def test_cart_writes_leave_the_catalog_version_alone(app, client, tokens):
+    etag = client.get('/products').headers['ETag']
+    before = version(app)
+    assert add(client, tokens[1], product_id=2, quantity=3).status_code == 201
+    assert add(client, tokens[1], product_id=1, variant_id=2, quantity=1).status_code == 201
+    assert version(app) == before
+    assert client.get('/products', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_selling_out_changes_the_catalog_version(app, client, tokens):
+    before = version(app)
+    assert add(client, tokens[1], product_id=1, variant_id=2, quantity=20).status_code == 201
+    assert version(app) == before + 1
+
+
+def test_displayed_fields_change_the_catalog_version(app, client, tokens):
+    etag = client.get('/products').headers['ETag']
+    before = version(app)
+    with app.app_context():
+        db.session.get(Product, 2).name = 'renamed'
+        db.session.commit()
+    assert version(app) == before + 1
+    response = client.get('/products', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'renamed' in response.get_data(as_text=True)
+
+
+def test_restock_by_assignment_of_an_expired_row(app, tokens):
+    before = version(app)
+    with app.app_context():
+        db.session.get(ProductVariant, 3).stock = 0
+        db.session.commit()
+        db.session.get(ProductVariant, 3).stock = 5  # Loaded again after the commit expired it
+        db.session.commit()
+    assert version(app) == before + 2
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, func
+
+from conftest import auth
+from yepto import maintenance
+from yepto.inventory import lock_cart_lines
+from yepto.models import db, Cart, CartItem, Order, Product, ProductVariant
+
+
+def stock(app, model, id):
+    with app.app_context():
+        return db.session.get(model, id).stock
+
+
+def add(client, token, **item):
+    return client.post('/cart/items', headers=auth(token), json=item)
+
+
+def checkout(client, token):
+    return client.post('/checkout', headers=auth(token), json={'shipping_address': 'x', 'payment_method': 'card'})
+
+
+def test_adding_to_cart_reserves_product_or_variant_stock(app, client, tokens):
+    before = stock(app, Product, 2), stock(app, ProductVariant, 2), stock(app, Product, 1)
+    assert add(client, tokens[1], product_id=2, quantity=3).status_code == 201
+    assert add(client, tokens[1], product_id=1, variant_id=2, quantity=2).status_code == 201
+    assert stock(app, Product, 2) == before[0] - 3
+    assert stock(app, ProductVariant, 2) == before[1] - 2
+    assert stock(app, Product, 1) == before[2]  # Sold through its variants
+
+
+def test_adding_more_than_in_stock_is_refused(app, client, tokens):
+    with app.app_context():
+        db.session.get(Product, 2).stock = 2
+        db.session.commit()
+    assert add(client, tokens[1], product_id=2, quantity=3).status_code == 400
+    assert stock(app, Product, 2) == 2
+
+
+def test_checkout_orders_and_empties_the_cart(app, client, tokens):
+    full = stock(app, Product, 2)
+    add(client, tokens[1], product_id=2, quantity=2)
+    response = checkout(client, tokens[1])
+    assert response.status_code == 201
+    assert stock(app, Product, 2) == full - 2  # The reservation, not taken a second time
+    with app.app_context():
+        order = db.session.get(Order, response.get_json()['order_id'])
+        assert [(i.product_id, i.quantity) for i in order.items] == [(2, 2)]
+        assert order.total == 2 * db.session.get(Product, 2).price
+        assert db.session.execute(select(CartItem)).scalars().all() == []
+    assert checkout(client, tokens[1]).status_code == 400
+
+
+def test_cancelling_puts_the_stock_back_once(app, client, tokens):
+    full = stock(app, ProductVariant, 1)
+    add(client, tokens[1], product_id=1, variant_id=1, quantity=4)
+    order_id = checkout(client, tokens[1]).get_json()['order_id']
+    assert stock(app, ProductVariant, 1) == full - 4
+    assert client.post(f'/orders/{order_id}/cancel', headers=auth(tokens[1])).status_code == 200
+    assert stock(app, ProductVariant, 1) == full
+    assert client.post(f'/orders/{order_id}/cancel', headers=auth(tokens[1])).status_code == 400
+    assert client.post(f'/api/orders/{order_id}/return', headers=auth(tokens[1])).status_code == 400
+    assert stock(app, ProductVariant, 1) == full
+
+
+def return_order(client, token, order_id):
+    return client.post(f'/api/orders/{order_id}/return', headers=auth(token))
+
+
+def test_returning_puts_the_stock_back_once(app, client, tokens):
+    full = stock(app, Product, 3)
+    assert return_order(client, tokens[0], 1).status_code == 200
+    assert stock(app, Product, 3) == full + 1
+    assert return_order(client, tokens[0], 1).get_json() == {'error': 'Order already returned'}
+    assert client.post('/orders/1/cancel', headers=auth(tokens[0])).status_code == 400
+    assert stock(app, Product, 3) == full + 1
+
+
+def test_returns_close_with_the_window(app, client, tokens):
+    with app.app_context():
+        db.session.get(Order, 1).return_status = 'return_expired'
+        db.session.commit()
+    assert return_order(client, tokens[0], 1).get_json() == {'error': 'Order return period has expired'}
+
+    with app.app_context():
+        db.session.get(Order, 1).return_status = 'not_returned'
+        db.session.commit()
+    app.config['RETURN_WINDOW_DAYS'] = 0  # A day old, so past a window the job hasn't applied yet
+    assert return_order(client, tokens[0], 1).get_json() == {'error': 'Order return period has expired'}
+    app.config['RETURN_WINDOW_DAYS'] = 2
+    assert return_order(client, tokens[0], 1).status_code == 200
+
+
+def test_checkout_refuses_a_variant_removed_from_the_catalog(app, client, tokens):
+    add(client, tokens[1], product_id=1, variant_id=3, quantity=1)
+    with app.app_context():
+        db.session.delete(db.session.get(ProductVariant, 3))
+        db.session.commit()
+        orders = db.session.execute(select(func.count(Order.id))).scalar()
+    assert checkout(client, tokens[1]).status_code == 409
+    with app.app_context():
+        assert db.session.execute(select(func.count(Order.id))).scalar() == orders
+
+
+def test_release_gives_back_stock_of_abandoned_lines_only(app, client, tokens, monkeypatch):
+    full = stock(app, Product, 2)
+    add(client, tokens[0], product_id=2, quantity=2)
+    add(client, tokens[1], product_id=2, quantity=3)
+    with app.app_context():
+        db.session.execute(update(CartItem).values(added_at=datetime.utcnow() - timedelta(days=30)))
+        db.session.commit()
+        abandoned, refreshed = db.session.execute(select(CartItem.id).order_by(CartItem.id)).scalars().all()
+
+        # The second line is touched between the job's first read and its lock
+        def refreshed_before_lock(item_ids, skip_locked=False):
+            db.session.execute(update(CartItem).where(CartItem.id == refreshed).values(added_at=datetime.utcnow()))
+            return lock_cart_lines(item_ids, skip_locked)
+
+        monkeypatch.setattr(maintenance, 'lock_cart_lines', refreshed_before_lock)
+        assert maintenance.release_abandoned_stock(None, 100) == (1, None)
+        db.session.commit()
+        assert db.session.execute(select(CartItem.id)).scalars().all() == [refreshed]
+    assert stock(app, Product, 2) == full - 3
+
+
+def test_a_purged_cart_is_recreated_on_the_next_add(app, client, tokens):
+    app.config['STALE_CART_DAYS'] = 0
+    with app.app_context():
+        assert maintenance.purge_stale_carts(None, 100) == (2, None)
+        db.session.commit()
+    assert client.post('/cart', headers=auth(tokens[1]), json={'product_id': 2, 'quantity': 1}).status_code == 201
+    assert add(client, tokens[0], product_id=3, quantity=1).status_code == 201
+    with app.app_context():
+        carts = db.session.execute(select(Cart.user_id, CartItem.product_id).join(CartItem, CartItem.cart_id == Cart.id)
+                                   .order_by(Cart.user_id)).all()
+        assert carts == [(1, 3), (2, 2)]
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from yepto.jobs import Cron, Every, Scheduler, parse_schedule
+from yepto.models import db, JobLease
+
+
+def test_parse_schedule():
+    assert isinstance(parse_schedule(300), Every)
+    assert isinstance(parse_schedule('300'), Every)
+    assert isinstance(parse_schedule('*/5 * * * *'), Cron)
+
+
+def test_every_counts_from_previous_start():
+    assert Every(90).next_after(datetime(2026, 1, 1, 12, 0)) == datetime(2026, 1, 1, 12, 1, 30)
+
+
+@pytest.mark.parametrize('expr, after, expected', [
+    ('15 3 * * *', datetime(2026, 1, 1, 3, 15), datetime(2026, 1, 2, 3, 15)),
+    ('15 3 * * *', datetime(2026, 1, 1, 3, 14, 59), datetime(2026, 1, 1, 3, 15)),
+    ('*/20 * * * *', datetime(2026, 1, 1, 10, 41), datetime(2026, 1, 1, 11, 0)),
+    ('0 9-17/4 * * *', datetime(2026, 1, 1, 13, 0), datetime(2026, 1, 1, 17, 0)),
+    ('0 0 1 * *', datetime(2026, 1, 15), datetime(2026, 2, 1)),
+    ('0 0 29 2 *', datetime(2026, 3, 1), datetime(2028, 2, 29)),
+    ('30 6 * * 0', datetime(2026, 10, 19), datetime(2026, 10, 25, 6, 30)),  # Next Sunday
+    ('0 0 13 * 5', datetime(2026, 10, 19), datetime(2026, 10, 23)),  # Either the 13th or a Friday
+])
+def test_cron_next_after(expr, after, expected):
+    assert Cron(expr).next_after(after) == expected
+
+
+@pytest.mark.parametrize('expr', ['* * * *', '60 * * * *', '0 24 * * *', '0 0 0 * *', '5-1 * * * *', 'a * * * *'])
+def test_cron_rejects_invalid_expressions(expr):
+    with pytest.raises(ValueError):
+        Cron(expr)
+
+
+def test_cron_that_never_matches():
+    with pytest.raises(ValueError):
+        Cron('0 0 31 2 *').next_after(datetime(2026, 1, 1))
+
+
+def _scheduler(app, ran):
+    scheduler = Scheduler()
+    scheduler.job('nightly', '0 3 * * *')(lambda: ran.append(1) or 1)
+    scheduler.configure(app)
+    return scheduler
+
+
+def test_leased_job_runs_once_across_processes(app):
+    ran = []
+    first, second = _scheduler(app, ran), _scheduler(app, ran)
+    now = datetime(2026, 1, 1, 3, 0)
+
+    claimed = first.claim_due(now)
+    assert [job.name for job in claimed] == ['nightly']
+    assert second.claim_due(now) == []  # Leased by the first process
+
+    first.run(claimed[0])
+    assert ran == [1]
+    assert second.claim_due(now + timedelta(minutes=1)) == []  # Not due again until tomorrow
+    assert [job.name for job in second.claim_due(now + timedelta(days=1))] == ['nightly']
+
+    with app.app_context():
+        lease = db.session.get(JobLease, 'nightly')
+        assert (lease.runs, lease.last_rows, lease.last_error) == (1, 1, None)
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from conftest import auth
+from yepto.local_cache import LocalCache
+from yepto.models import db, Order, OrderStatus
+
+
+def orders(client, token, **args):
+    response = client.get('/orders', headers=auth(token), query_string=args)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def add_orders(app, user_id, count, start=datetime(2026, 1, 1)):
+    with app.app_context():
+        db.session.execute(insert(Order), [
+            {'user_id': user_id, 'total': 100 * i, 'status': OrderStatus.COMPLETED,
+             'created_at': start + timedelta(hours=i // 2)}  # Pairs share a timestamp
+            for i in range(count)
+        ])
+        db.session.commit()
+
+
+def test_pages_seek_newest_first_without_gaps(app, client, tokens):
+    add_orders(app, 2, 7)
+    add_orders(app, 1, 3)
+    seen, cursor = [], None
+    while True:
+        page = orders(client, tokens[1], limit=3, **({'cursor': cursor} if cursor else {}))
+        seen += [(o['created_at'], o['id']) for o in page['orders']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert len(seen) == 7
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_invalid_cursor_or_limit(client, tokens):
+    for args in ({'cursor': 'garbage'}, {'limit': 0}, {'limit': 'x'}):
+        assert client.get('/orders', headers=auth(tokens[1]), query_string=args).status_code == 400
+
+
+def test_first_page_is_cached_until_the_users_orders_change(app, client, tokens):
+    client.post('/cart/items', headers=auth(tokens[1]), json={'product_id': 2, 'quantity': 1})
+    order_id = client.post('/checkout', headers=auth(tokens[1]), json={}).get_json()['order_id']
+    assert [o['status'] for o in orders(client, tokens[1])['orders']] == ['pending']
+
+    add_orders(app, 2, 1)  # Written behind the app's back: served from the cache
+    assert len(orders(client, tokens[1])['orders']) == 1
+
+    response = client.post('/payments/process', headers=auth(tokens[1]),
+                           json={'order_id': order_id, 'payment_method': 'card'})
+    assert response.status_code == 200
+    page = orders(client, tokens[1])['orders']
+    assert len(page) == 2
+    assert page[0]['status'] == 'completed'
+
+
+def test_cache_refuses_a_read_that_started_before_an_invalidation():
+    cache = LocalCache(ttl=60, max_size=2)
+    value, token = cache.get('user')
+    assert value is None
+    cache.invalidate('user')  # An order changed while the page was read
+    cache.put('user', 'stale page', token)
+    assert cache.get('user')[0] is None
+
+    value, token = cache.get('user')
+    cache.put('user', 'fresh page', token)
+    assert cache.get('user')[0] == 'fresh page'
+    cache.put('a', 1, cache.get('a')[1])
+    cache.put('b', 2, cache.get('b')[1])
+    assert cache.get('user')[0] is None  # Evicted past max_size
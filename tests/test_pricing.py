@@ -0,0 +1,44 @@
+import pytest
+
+from yepto.pricing import to_cents, from_cents, cart_totals, discount_amount, order_totals
+
+
+@pytest.mark.parametrize('amount, cents', [
+    (19.99, 1999), ('19.99', 1999), (' 5 ', 500), (0.1 + 0.2, 30), ('0.005', 1), ('0.004', 0), (None, None),
+])
+def test_to_cents(amount, cents):
+    assert to_cents(amount) == cents
+
+
+@pytest.mark.parametrize('amount', ['abc', 'NaN', 'Infinity', ''])
+def test_to_cents_rejects_non_amounts(amount):
+    with pytest.raises(ValueError):
+        to_cents(amount)
+
+
+def test_from_cents():
+    assert from_cents(1999) == 19.99
+    assert from_cents(None) is None
+
+
+def test_cart_totals_sum_exact_cents():
+    # 0.1 * 3 would not add up in floats
+    assert cart_totals([10, 1999], [3, 2]) == {'subtotal': 4028, 'discount': 0, 'total': 4028}
+
+
+def test_percentage_discount_rounds_half_up():
+    # 12.5% of 1.00 is 12.5 cents
+    assert discount_amount(100, 'percentage', 1250) == 13
+    assert cart_totals([100], [1], ('percentage', 1250))['total'] == 87
+
+
+def test_fixed_discount_never_exceeds_subtotal():
+    assert cart_totals([300], [1], ('fixed', 500)) == {'subtotal': 300, 'discount': 300, 'total': 0}
+
+
+def test_unknown_discount_type_is_ignored():
+    assert discount_amount(1000, 'bogus', 100) == 0
+
+
+def test_order_totals_groups_items_by_order():
+    assert order_totals([2, 1, 2], [100, 250, 5], [1, 2, 3]) == {1: 500, 2: 115}
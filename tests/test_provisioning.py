@@ -0,0 +1,59 @@
+from functools import partial
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from conftest import auth
+from yepto import admin, provisioning
+from yepto.models import db, Cart, User
+
+
+def bulk(client, token, users):
+    return client.post('/admin/users/bulk', headers=auth(token), json={'users': users})
+
+
+def user_count(app):
+    with app.app_context():
+        return db.session.execute(select(func.count(User.id))).scalar()
+
+
+def test_creates_users_with_carts_and_skips_case_insensitive_duplicates(app, client, tokens):
+    response = bulk(client, tokens[0], [
+        {'email': 'new@example.com'},
+        {'email': ' NEW@example.com '},  # Same as the first once trimmed and lowercased
+        {'email': 'User2@Example.com'},  # Clashes with an existing account
+        {'email': 'other@example.com', 'username': 'USER1'},  # Existing username
+        {'email': 'pw@example.com', 'password': 'secret'},
+    ])
+    assert response.status_code == 201
+    assert response.get_json() == {'created': 2, 'skipped': ['NEW@example.com', 'User2@Example.com',
+                                                              'other@example.com']}
+    with app.app_context():
+        user = db.session.execute(select(User).where(User.email == 'pw@example.com')).scalar_one()
+        assert user.check_password('secret')
+        assert db.session.execute(select(func.count(Cart.id))).scalar() == 4
+
+
+@pytest.mark.parametrize('users', [
+    [{'email': 5}], [{'email': ['a@example.com']}], [{'email': '  '}], ['a@example.com'],
+    [{'email': 'a@example.com', 'username': 7}], [{'email': 'a@example.com', 'password': {'x': 1}}],
+])
+def test_rejects_malformed_users(client, tokens, users):
+    assert bulk(client, tokens[0], users).status_code == 400
+
+
+def test_failed_batch_reports_the_batches_already_committed(app, client, tokens, monkeypatch):
+    monkeypatch.setattr(admin, 'provision_users', partial(provisioning.provision_users, batch_size=2))
+    hashes = provisioning._password_hashes
+
+    def signup_races_second_batch(passwords):
+        if user_count(app) == 4:  # After the first batch: someone signs up as c@example.com meanwhile
+            db.session.execute(insert(User).values(username='racer', email='c@example.com', password='!'))
+        return hashes(passwords)
+
+    monkeypatch.setattr(provisioning, '_password_hashes', signup_races_second_batch)
+    response = bulk(client, tokens[0], [{'email': f'{name}@example.com'} for name in 'abcd'] +
+                    [{'email': 'user1@example.com'}])
+    assert response.status_code == 409
+    assert response.get_json() == {'error': 'Provisioning failed', 'created': 2, 'skipped': []}
+    assert user_count(app) == 4
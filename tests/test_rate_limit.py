@@ -0,0 +1,51 @@
+import pytest
+
+from yepto import rate_limit
+from yepto.rate_limit import MemoryBucketStore, limiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_bucket_refills_at_its_rate(clock):
+    store = MemoryBucketStore()
+    assert [store.take(['k'], 3, 1.0)[0] for _ in range(4)] == [True, True, True, False]
+    assert store.take(['k'], 3, 1.0) == (False, 1.0)
+    clock[0] += 0.5
+    assert store.take(['k'], 3, 1.0) == (False, 0.5)
+    clock[0] += 0.5
+    assert store.take(['k'], 3, 1.0) == (True, 0)
+
+
+def test_a_rejected_request_spends_no_token(clock):
+    store = MemoryBucketStore()
+    store.take(['ip'], 1, 1.0)
+    assert store.take(['user', 'ip'], 1, 1.0)[0] is False  # The ip bucket is empty
+    assert store.take(['user'], 1, 1.0)[0] is True  # The user bucket kept its token
+
+
+def test_shards_drop_refilled_buckets_and_stay_bounded(clock, monkeypatch):
+    monkeypatch.setattr(MemoryBucketStore, 'SHARDS', 1)
+    monkeypatch.setattr(MemoryBucketStore, 'SHARD_MAX_KEYS', 5)
+    store = MemoryBucketStore()
+    for i in range(20):
+        store.take([f'k{i}'], 10, 1.0)
+    assert len(store.shards[0][0]) == 5
+    clock[0] += 100  # Everything refilled
+    store.take(['new'], 10, 1.0)
+    assert list(store.shards[0][0]) == ['new']
+
+
+def test_login_is_limited_per_ip(app, client, tokens, monkeypatch):
+    monkeypatch.setattr(limiter, 'store', MemoryBucketStore())
+    app.config['RATE_LIMITS'] = {'login': (2, 60)}
+    body = {'email': 'user2@example.com', 'password': 'wrong'}
+    assert [client.post('/auth/login', json=body).status_code for _ in range(3)] == [401, 401, 429]
+    response = client.post('/auth/login', json=body)
+    assert response.headers['Retry-After'] == '30'
+    other_ip = client.post('/auth/login', json=body, environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other_ip.status_code == 401
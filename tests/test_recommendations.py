@@ -0,0 +1,58 @@
+import numpy as np
+
+from conftest import auth
+from yepto.models import db, Order, OrderItem, OrderStatus
+from yepto.recommendations import build_recommendations, record_completed_order, top_k
+
+
+def place(app, *product_ids, status=OrderStatus.COMPLETED, return_status='not_returned'):
+    with app.app_context():
+        order = Order(user_id=2, total=0, status=status, return_status=return_status,
+                      items=[OrderItem(product_id=pid, quantity=1, price=100) for pid in product_ids])
+        db.session.add(order)
+        db.session.commit()
+        return order.id
+
+
+def related(client, product_id):
+    return [(r['id'], r['score']) for r in client.get(f'/products/{product_id}/related').get_json()['related']]
+
+
+def test_top_k_keeps_the_highest_counts_per_row_with_id_ties():
+    rows, cols, counts = np.array([1, 1, 1, 2, 2]), np.array([5, 3, 4, 1, 3]), np.array([2, 2, 7, 1, 1])
+    kept = top_k(rows, cols, counts, k=2)
+    assert [a.tolist() for a in kept] == [[1, 1, 2, 2], [0, 1, 0, 1], [4, 3, 1, 3], [7, 2, 1, 1]]
+
+
+def test_build_counts_completed_orders_only(app, client, tokens):
+    place(app, 1, 2, 3)
+    place(app, 1, 2, 2)  # Two lines of product 2 count once
+    place(app, 1, 4)
+    place(app, 1, 5, status=OrderStatus.CANCELLED)
+    place(app, 1, 5, return_status='returned')
+    with app.app_context():
+        assert build_recommendations() == 4
+    assert related(client, 1) == [(2, 2), (3, 1), (4, 1)]
+    assert related(client, 5) == []
+
+
+def test_completed_orders_are_added_incrementally(app, client, tokens):
+    place(app, 1, 2)
+    with app.app_context():
+        build_recommendations()
+    order_id = place(app, 1, 3, 2)
+    with app.app_context():
+        record_completed_order(order_id)
+    assert related(client, 1) == [(2, 2), (3, 1)]
+    assert related(client, 3) == [(1, 1), (2, 1)]
+
+
+def test_paying_for_an_order_records_its_pairs(app, client, tokens):
+    client.post('/cart/items', headers=auth(tokens[1]), json={'product_id': 2, 'quantity': 1})
+    client.post('/cart/items', headers=auth(tokens[1]), json={'product_id': 4, 'quantity': 1})
+    order_id = client.post('/checkout', headers=auth(tokens[1]), json={}).get_json()['order_id']
+    assert related(client, 2) == []
+    response = client.post('/payments/process', headers=auth(tokens[1]),
+                           json={'order_id': order_id, 'payment_method': 'card'})
+    assert response.status_code == 200
+    assert related(client, 2) == [(4, 1)]
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from sqlalchemy import select
+
+from yepto import stock_watch
+from yepto.models import db, LowStock, Product, ProductVariant
+
+
+@pytest.fixture
+def alerts(monkeypatch):
+    sink = stock_watch.QueueSink()
+    monkeypatch.setattr(stock_watch, '_sink', None)
+    monkeypatch.setattr(stock_watch, '_sink_configured', False)
+    stock_watch.set_sink(sink)
+
+    def drain():
+        events = []
+        while not sink.queue.empty():
+            events.append(sink.queue.get_nowait())
+        return [(e['product_id'], e['variant_id'], e['previous'], e['level']) for e in events]
+    return drain
+
+
+def set_stock(model, id, stock):
+    db.session.get(model, id).stock = stock
+    db.session.commit()
+
+
+def low_stock_rows():
+    return db.session.execute(
+        select(LowStock.product_id, LowStock.variant_id, LowStock.level).order_by(LowStock.id)
+    ).all()
+
+
+def test_each_crossing_sends_one_alert_and_keeps_its_row(app, tokens, alerts):
+    with app.app_context():
+        set_stock(Product, 2, 4)
+        assert alerts() == [(2, None, None, 'low')]
+        assert (2, None, 'low') in low_stock_rows()
+
+        set_stock(Product, 2, 3)  # Still low: no crossing
+        assert alerts() == []
+
+        set_stock(Product, 2, 0)
+        assert alerts() == [(2, None, 'low', 'out')]
+        assert (2, None, 'out') in low_stock_rows()
+
+        set_stock(Product, 2, 50)
+        assert alerts() == [(2, None, 'out', None)]
+        assert all(row.product_id != 2 for row in low_stock_rows())
+
+
+def test_variant_crossings_are_tracked_per_variant(app, tokens, alerts):
+    with app.app_context():
+        set_stock(ProductVariant, 2, 5)
+        set_stock(ProductVariant, 3, 0)
+        assert alerts() == [(1, 2, None, 'low'), (1, 3, None, 'out')]
+        assert low_stock_rows() == [(1, 2, 'low'), (1, 3, 'out')]
+
+
+def test_nothing_is_sent_or_kept_on_rollback(app, tokens, alerts):
+    with app.app_context():
+        db.session.get(Product, 2).stock = 1
+        db.session.flush()
+        assert (2, None, 'low') in low_stock_rows()  # Written by the flush, not committed
+        db.session.rollback()
+        assert alerts() == []
+        assert all(row.product_id != 2 for row in low_stock_rows())
+
+        set_stock(Product, 3, 2)  # A later commit sends only its own crossing
+        assert alerts() == [(3, None, None, 'low')]
+
+
+def test_repeated_crossings_upsert_one_row(app, tokens, alerts):
+    with app.app_context():
+        for stock in (4, 0, 2, 0, 1):
+            set_stock(ProductVariant, 2, stock)
+        assert len(alerts()) == 5
+        assert [row for row in low_stock_rows() if row.variant_id == 2] == [(1, 2, 'low')]
+
+        # A second row for the same item is refused by ix_low_stock_item
+        db.session.add(LowStock(product_id=1, variant_id=2, level='out'))
+        with pytest.raises(Exception, match='UNIQUE'):
+            db.session.flush()
+        db.session.rollback()
+
+
+def test_file_sink_writes_one_json_line_per_alert(app, tokens, tmp_path, monkeypatch):
+    path = tmp_path / 'alerts.jsonl'
+    monkeypatch.setattr(stock_watch, '_sink', None)
+    monkeypatch.setattr(stock_watch, '_sink_configured', False)
+    app.config['STOCK_ALERT_SINK'] = f'file://{path}'
+    with app.app_context():
+        set_stock(Product, 4, 0)
+        set_stock(Product, 4, 9)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(e['product_id'], e['level'], e['stock']) for e in lines] == [(4, 'out', 0), (4, None, 9)]
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from conftest import auth
+
+
+def test_listing_flags_wishlisted_products_for_signed_in_users(client, tokens):
+    assert client.post('/wishlist', headers=auth(tokens[1]), json={'product_ids': [2, 4, 99]}).status_code == 201
+    products = client.get('/products', headers=auth(tokens[1])).get_json()['products']
+    assert {p['id']: p['in_wishlist'] for p in products} == {1: False, 2: True, 3: False, 4: True, 5: False}
+
+
+def test_adding_again_counts_as_added(client, tokens):
+    client.post('/wishlist', headers=auth(tokens[1]), json={'product_ids': [2]})
+    response = client.post('/wishlist', headers=auth(tokens[1]), json={'product_ids': [2, 3]})
+    assert (response.status_code, response.get_json()['added']) == (201, 1)
+    assert client.get('/wishlist/contains?product_ids=1,2,3', headers=auth(tokens[1])).get_json() == \
+        {'wishlisted': [2, 3]}
+
+
+@pytest.mark.parametrize('header', ['Bearer not-a-token', 'Bearer a.b.c', 'Basic abc'])
+def test_listing_is_anonymous_with_a_malformed_token(client, tokens, header):
+    response = client.get('/products', headers={'Authorization': header})
+    assert response.status_code == 200
+    assert all('in_wishlist' not in p for p in response.get_json()['products'])
+
+
+def test_listing_is_anonymous_with_an_expired_token(app, client, tokens):
+    with app.app_context():
+        expired = create_access_token(identity=2, expires_delta=timedelta(seconds=-1))
+    response = client.get('/products', headers=auth(expired))
+    assert response.status_code == 200
+    assert len(response.get_json()['products']) == 5
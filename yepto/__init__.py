@@ -3,8 +3,15 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from yepto.auth import register_revocation_check
 from yepto.config import Config
+from yepto.http_cache import HttpCache
+from yepto.rate_limit import limiter
 from yepto.models import db
+from yepto.provisioning import provision_users_command
+from yepto.datagen import generate_data_command
+from yepto.jobs import run_jobs_command
+from yepto.maintenance import scheduler
 
 
 app = Flask(__name__)
@@ -12,8 +19,14 @@ app.config.from_object(Config)
 
 db.init_app(app)
 Migrate(app, db)
-JWTManager(app)
+register_revocation_check(JWTManager(app))
 CORS(app)
+HttpCache(app)
+limiter.init_app(app)
+app.cli.add_command(provision_users_command)
+app.cli.add_command(run_jobs_command)
+app.cli.add_command(generate_data_command)
+scheduler.init_app(app)
 
 
 
@@ -25,11 +38,6 @@ if __name__ == "__main__":
 
 
 
-# git status
-git add yepto/
-git add .
-git commit -m "Updated complete yepto folder"
-git push origin main
 
 
 
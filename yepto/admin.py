@@ -8,10 +8,21 @@ from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identi
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from functools import wraps
-from .models import db, Product, Category, Cart, CartItem, Order, Payment, OrderItem, User, OrderStatus
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+from .models import (db, Product, ProductVariant, Category, Cart, CartItem, Order, Payment, OrderItem, User, OrderStatus,
+                     AuditLog, LowStock)
+from .audit import audited
+from .http_cache import HttpCache
+from .maintenance import admin_count, scheduler
+from .order_history import invalidate_order_history
+from .pricing import from_cents
+from .provisioning import ProvisioningError, provision_users
+from .serializers import AuditLogSchema, LowStockSchema, OrderSchema, UserSchema, json_response
 
 app = Flask(__name__)
 CORS(app)
+HttpCache(app)
 
 
 def admin_required(fn):
@@ -30,18 +41,16 @@ def admin_required(fn):
 def get_all_orders():
     page = request.args.get('page', 1, type=int)
     per_page = 20
-    orders = Order.query.paginate(page=page, per_page=per_page).items  # Extracting items
+    # Plain column tuples for one page, without paginate()'s extra COUNT query
+    orders = OrderSchema.all(
+        OrderSchema.select().order_by(Order.id).limit(per_page).offset((max(page, 1) - 1) * per_page)
+    )
 
-    return jsonify([{
-        "id": order.id,
-        "user_id": order.user_id,
-        "total": order.total,
-        "status": order.status.value,  # Ensuring proper Enum handling
-        "created_at": order.created_at.isoformat()
-    } for order in orders])
+    return json_response(orders)
 
 @app.route('/admin/orders/<int:order_id>', methods=['PUT'])
 @admin_required
+@audited('order.update_status', target='order')
 def update_order_status(order_id):
 
     data = request.get_json()
@@ -52,10 +61,10 @@ def update_order_status(order_id):
     valid_statuses = [status.value for status in OrderStatus]
     if data['status'] not in valid_statuses:
         return jsonify({"error": "Invalid status"}), 400
-    if data['status'] not in valid_statuses:
-        return jsonify({"error": "Invalid status"}), 400
     
-    order.status = data['status']
+    order.status = OrderStatus(data['status'])
+    db.session.commit()
+    invalidate_order_history(order.user_id)
     
     return jsonify({"message": "Order updated"}) 
 
@@ -66,50 +75,137 @@ def update_order_status(order_id):
 @app.route('/admin/dashboard/sales', methods=['GET'])
 @admin_required
 def get_sales_report():
-    total_sales = db.session.query(db.func.sum(Order.total)).filter(Order.status == 'completed').scalar() or 0
+    total_sales = from_cents(admin_count('total_sales'))  # Precomputed by the admin_counts job
     return jsonify({"total_sales": total_sales})
 
 @app.route('/admin/dashboard/orders', methods=['GET'])
 @admin_required
 def get_order_count():
-    total_orders = Order.query.count()
+    total_orders = int(admin_count('total_orders'))
     return jsonify({"total_orders": total_orders})
 
 @app.route('/admin/dashboard/users', methods=['GET'])
 @admin_required
 def get_user_count():
-    total_users = User.query.count()
+    total_users = int(admin_count('total_users'))
     return jsonify({"total_users": total_users})
 
+@app.route('/admin/jobs', methods=['GET'])
+@admin_required
+def get_jobs():
+    # Schedule, lease and last-run duration and row counts of every maintenance job
+    return json_response(scheduler.metrics())
+
+
+@app.route('/admin/inventory/low-stock', methods=['GET'])
+@admin_required
+def get_low_stock():
+    # Reads the low_stock table kept current by the stock watcher, not the catalog
+    level = request.args.get('level')
+    if level not in (None, 'low', 'out'):
+        return jsonify({"error": "level must be low or out"}), 400
+    stmt = (
+        LowStockSchema.select().select_from(LowStock)
+        .join(Product, Product.id == LowStock.product_id)
+        .outerjoin(ProductVariant, ProductVariant.id == LowStock.variant_id)
+        .order_by(LowStock.since.desc())
+    )
+    if level:
+        stmt = stmt.where(LowStock.level == level)
+    return json_response(LowStockSchema.all(stmt))
 
 @app.route('/admin/users', methods=['GET'])
 @admin_required
 def get_all_users():
-    users = User.query.all()
-    return jsonify([{
-        "id": user.id,
-        "email": user.email,
-        "is_admin": user.is_admin
-    } for user in users])
+    users = UserSchema.all(UserSchema.select().order_by(User.id))
+    return json_response(users)
+
+BULK_PROVISION_LIMIT = 10000  # Users per request; larger imports go through `flask provision-users`
+BULK_PROVISION_PASSWORD_LIMIT = 100  # Users with a password per request, each hashed before the response
+
+@app.route('/admin/users/bulk', methods=['POST'])
+@admin_required
+@audited('user.bulk_provision', payload=lambda body: {'users': len(body.get('users') or [])})  # No passwords
+def bulk_provision_users():
+    users = (request.get_json() or {}).get('users')
+    if not isinstance(users, list) or not users:
+        return jsonify({"error": "Missing users"}), 400
+    if len(users) > BULK_PROVISION_LIMIT:
+        return jsonify({"error": f"At most {BULK_PROVISION_LIMIT} users per request"}), 400
+    if sum(1 for u in users if isinstance(u, dict) and u.get('password')) > BULK_PROVISION_PASSWORD_LIMIT:
+        return jsonify({"error": f"At most {BULK_PROVISION_PASSWORD_LIMIT} users with a password per request; "
+                                 "import more with `flask provision-users`"}), 400
+    if not all(isinstance(u, dict) and isinstance(u.get('email'), str) and u['email'].strip() for u in users):
+        return jsonify({"error": "Every user needs an email"}), 400
+    if not all(isinstance(u.get(key) or '', str) for u in users for key in ('username', 'password')):
+        return jsonify({"error": "username and password must be strings"}), 400
+
+    try:
+        created, skipped = provision_users(users)
+    except ProvisioningError as e:
+        # Earlier batches are committed: report them so the caller can retry the rest
+        status = 409 if isinstance(e.__cause__, IntegrityError) else 500
+        return jsonify({"error": "Provisioning failed", "created": e.created, "skipped": e.skipped}), status
+    return jsonify({"created": created, "skipped": skipped}), 201
 
 @app.route('/admin/users/<int:user_id>/promote', methods=['POST'])
 @admin_required
+@audited('user.promote', target='user')
 def promote_user(user_id):
     user = User.query.get(user_id)
     if not user:
         return jsonify({"error": "User  not found"}), 404
     
     user.is_admin = True
+    db.session.commit()
     
     return jsonify({"message": f"User  {user_id} promoted to admin"})
 
 @app.route('/admin/users/<int:user_id>/deactivate', methods=['POST'])
 @admin_required
+@audited('user.deactivate', target='user')
 def deactivate_user(user_id):
     user = User.query.get(user_id)
     if not user:
         return jsonify({"error": "User  not found"}), 404
     
-    db.session.delete(user)
+    try:
+        db.session.delete(user)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to deactivate user"}), 500
     
     return jsonify({"message": f"User  {user_id} deactivated"})
+
+
+@app.route('/admin/audit', methods=['GET'])
+@admin_required
+def get_audit_log():
+    admin_id = request.args.get('admin_id', type=int)
+    before_id = request.args.get('before_id', type=int)  # Cursor: the last id of the previous page
+    per_page = min(request.args.get('per_page', 50, type=int), 200)
+    try:
+        since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+        until = datetime.fromisoformat(request.args['until']) if request.args.get('until') else None
+    except ValueError:
+        return jsonify({"error": "since and until must be ISO 8601 timestamps"}), 400
+
+    # Newest first. Ids are assigned when the writer flushes a batch, so they
+    # only break ties between equal timestamps: a backward range scan of
+    # ix_audit_log_admin_timestamp with an admin filter, of
+    # ix_audit_log_timestamp without one
+    stmt = AuditLogSchema.select().order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(per_page)
+    if admin_id:
+        stmt = stmt.where(AuditLog.admin_id == admin_id)
+    if since:
+        stmt = stmt.where(AuditLog.timestamp >= since)
+    if until:
+        stmt = stmt.where(AuditLog.timestamp < until)
+    if before_id:
+        before = select(AuditLog.timestamp).where(AuditLog.id == before_id).scalar_subquery()
+        stmt = stmt.where(tuple_(AuditLog.timestamp, AuditLog.id) < tuple_(before, before_id))
+
+    entries = AuditLogSchema.all(stmt)
+    next_cursor = entries[-1]['id'] if len(entries) == per_page else None
+    return json_response({'entries': entries, 'next_before_id': next_cursor})
@@ -0,0 +1,211 @@
+from contextlib import asynccontextmanager
+from flask import Flask
+from flask_jwt_extended import JWTManager, decode_token
+from sqlalchemy import select, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response
+from starlette.routing import Route
+from . import facets
+from .config import Config
+from .models import db, Product, Category, Cart, Order, Wishlist, RevokedToken
+from .order_history import (ORDER_HISTORY_PAGE_SIZE, ORDER_HISTORY_MAX_PAGE_SIZE, decode_cursor, history_select,
+                            history_page)
+from .pricing import cart_price_select, cart_summary
+from .serializers import (ProductSchema, VariantSchema, CartItemSchema, OrderSchema, OrderItemSchema, dumps,
+                          variant_select, attach_variants, order_item_select, attach_items, cart_item_select)
+
+# Async serving mode for the read-heavy catalog, cart and order-history
+# endpoints: `uvicorn yepto.asgi:app`. Writes stay on the WSGI apps, so a
+# proxy routes just these GETs here. Each request holds a coroutine rather
+# than a thread while it waits on the database.
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+# Config, JWT decoding and the facet snapshot still go through a Flask app context
+flask_app = Flask(__name__)
+flask_app.config.from_object(Config)
+db.init_app(flask_app)
+JWTManager(flask_app)
+
+
+def async_database_url(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def create_engine():
+    config = flask_app.config
+    url = config.get('ASYNC_DATABASE_URL') or async_database_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {'pool_pre_ping': True}
+    if make_url(url).get_backend_name() != 'sqlite':
+        options['pool_size'] = config.get('ASYNC_POOL_SIZE', Config.ASYNC_POOL_SIZE)
+    return create_async_engine(url, **options)
+
+
+engine = None
+Session = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global engine, Session
+    engine = create_engine()
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    yield
+    await engine.dispose()
+
+
+class AppContext:  # Pushes the Flask app context around every ASGI request
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        with flask_app.app_context():
+            await self.app(scope, receive, send)
+
+
+def json_response(obj, status=200):
+    return Response(dumps(obj), status_code=status, media_type='application/json')
+
+
+async def current_user(request):
+    # Same tokens as flask_jwt_extended's jwt_required(); None when missing,
+    # invalid, not an access token or logged out in any process
+    header = request.headers.get('authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    try:
+        claims = decode_token(header[7:])
+    except Exception:
+        return None
+    if claims.get('type') != 'access':
+        return None
+    async with Session() as session:
+        if await session.get(RevokedToken, claims['jti']) is not None:
+            return None
+    return claims[flask_app.config['JWT_IDENTITY_CLAIM']]
+
+
+def unauthorized():
+    return json_response({'msg': 'Missing or invalid Authorization header'}, 401)
+
+
+async def get_products(request):
+    try:
+        filters = facets.parse_filters(request.query_params)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    # Even with a snapshot, search_catalog may read the catalog version or rebuild
+    product_ids, total, facet_counts = await run_in_threadpool(facets.search_catalog, filters)
+
+    results = []
+    user_id = await current_user(request)
+    if product_ids:
+        async with Session() as session:
+            results = ProductSchema.dump(await session.execute(
+                ProductSchema.select().select_from(Product)
+                .outerjoin(Category, Category.id == Product.category_id)
+                .where(Product.id.in_(product_ids))
+            ))
+            attach_variants(results, VariantSchema.dump(await session.execute(variant_select(product_ids))))
+            wishlisted = set()
+            if user_id:
+                wishlisted = set((await session.execute(
+                    select(Wishlist.product_id)
+                    .where(Wishlist.user_id == user_id, Wishlist.product_id.in_(product_ids))
+                )).scalars())
+
+    position = {pid: i for i, pid in enumerate(product_ids)}
+    results.sort(key=lambda product: position[product['id']])
+    if user_id:
+        for product in results:
+            product['in_wishlist'] = product['id'] in wishlisted
+
+    return json_response({'products': results, 'total': total, 'facets': facet_counts})
+
+
+async def get_cart_items(request):
+    user_id = await current_user(request)
+    if not user_id:
+        return unauthorized()
+    async with Session() as session:
+        items = CartItemSchema.dump(await session.execute(cart_item_select(user_id)))
+        if not items and not (await session.execute(select(Cart.id).where(Cart.user_id == user_id))).first():
+            return json_response({'message': 'Cart is empty'}, 404)
+    return json_response(items)
+
+
+async def get_cart_summary(request):
+    user_id = await current_user(request)
+    if not user_id:
+        return unauthorized()
+    async with Session() as session:
+        summary = cart_summary(await session.execute(cart_price_select(user_id)))
+    return json_response(summary)
+
+
+async def order_rows(session, stmt):
+    # Orders plus their items and product names in exactly two queries
+    orders = OrderSchema.dump(await session.execute(stmt))
+    if not orders:
+        return orders
+    items = OrderItemSchema.dump(await session.execute(order_item_select([order['id'] for order in orders])))
+    return attach_items(orders, items)
+
+
+async def get_orders(request):
+    # Same pages and cursors as order_history.get_orders, minus its first-page
+    # cache, which is invalidated by writes in the WSGI processes
+    user_id = await current_user(request)
+    if not user_id:
+        return unauthorized()
+    params = request.query_params
+    try:
+        limit = min(int(params.get('limit', ORDER_HISTORY_PAGE_SIZE)), ORDER_HISTORY_MAX_PAGE_SIZE)
+        cursor = decode_cursor(params['cursor']) if params.get('cursor') else None
+    except ValueError:
+        return json_response({'error': 'Invalid limit or cursor'}, 400)
+    if limit < 1:
+        return json_response({'error': 'Invalid limit or cursor'}, 400)
+
+    async with Session() as session:
+        orders = await order_rows(session, history_select(user_id, limit, cursor))
+    return json_response(history_page(orders, limit))
+
+
+async def get_order(request):
+    user_id = await current_user(request)
+    if not user_id:
+        return unauthorized()
+    order_id = request.path_params['order_id']
+    async with Session() as session:
+        orders = await order_rows(session, OrderSchema.select().where(Order.id == order_id, Order.user_id == user_id))
+    if not orders:
+        return json_response({'error': 'Order not found'}, 404)
+    return json_response(orders[0])
+
+
+app = Starlette(
+    routes=[
+        Route('/products', get_products),
+        Route('/cart/items', get_cart_items),
+        Route('/cart-summary', get_cart_summary),
+        Route('/orders', get_orders),
+        Route('/orders/{order_id:int}', get_order),
+    ],
+    lifespan=lifespan,
+)
+app.add_middleware(GZipMiddleware, minimum_size=Config.COMPRESS_MIN_SIZE)
+app = AppContext(app)
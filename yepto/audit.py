@@ -0,0 +1,94 @@
+import atexit
+from datetime import datetime
+from functools import wraps
+from queue import Queue, Empty
+from threading import Thread, Lock
+from flask import request, current_app, make_response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import insert
+from .models import db, AuditLog
+
+
+class AuditWriter:
+    # Admin requests only enqueue their audit records; a daemon thread writes
+    # them in multi-row inserts, one commit per batch.
+
+    def __init__(self, batch_size=200, flush_interval=1.0, max_pending=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = Queue(maxsize=max_pending)  # Full queue blocks callers rather than dropping records
+        self.app = None
+        self.thread = None
+        self.lock = Lock()
+
+    def start(self, app):
+        with self.lock:
+            if self.thread is None:
+                self.app = app
+                self.thread = Thread(target=self._run, name='audit-writer', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+    def submit(self, record):
+        if self.thread is None:
+            self.start(current_app._get_current_object())
+        self.queue.put(record)
+
+    def flush(self):
+        # Blocks until everything submitted so far is written
+        if self.thread is not None:
+            self.queue.join()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(AuditLog), batch)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception("Failed to write %d audit records: %r", len(batch), batch)
+            finally:
+                db.session.remove()
+
+
+audit_writer = AuditWriter()
+
+
+def audited(action, target=None, payload=None):
+    # Records a successful admin action; the target id comes from the
+    # "<target>_id" URL argument and the payload from the JSON body, or
+    # from payload(body) when the body shouldn't be stored as is.
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code < 400:
+                body = request.get_json(silent=True)
+                audit_writer.submit({
+                    'admin_id': get_jwt_identity(),
+                    'action': action,
+                    'target_type': target,
+                    'target_id': kwargs.get(f'{target}_id') if target else None,
+                    'payload': payload(body) if payload and body is not None else body,
+                    'timestamp': datetime.utcnow(),
+                })
+            return response
+        return wrapper
+    return decorator
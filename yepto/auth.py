@@ -1,20 +1,26 @@
 from flask import Flask, Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import datetime
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt, JWTManager
-from .models import db, User,Cart
+from .models import db, User, Cart, RevokedToken
+from .guest_cart import load_guest_token, merge_guest_cart, clear_guest_cart
+from .rate_limit import limiter
 
 app = Flask(__name__)
+limiter.init_app(app)
 
 
 @app.route('/auth/register', methods=['POST'])
+@limiter.limit('register')
 def register():
     data = request.get_json()
     if not data or 'email' not in data or 'password' not in data or 'username' not in data:
         return jsonify({"error": "Missing email, username, or password"}), 400
 
-    if User.query.filter_by(email=data['email']).first():
-        return jsonify({"error": "Email exists"}), 409
-    
+    # One transaction: the flush assigns user.id for the cart, and the unique
+    # email/username indexes reject duplicates instead of a pre-check query
     try:
         user = User(
             username=data['username'],
@@ -23,20 +29,25 @@ def register():
             is_admin=False  # Explicitly set as False
         )
         db.session.add(user)
-        db.session.commit()  # Commit to get user.id
-        
-        # Create a cart for the new user
-        cart = Cart(user_id=user.id)
-        db.session.add(cart)
+        db.session.flush()
+        db.session.add(Cart(user_id=user.id))
         db.session.commit()
-        
         return jsonify({"message": "User created"}), 201
+    except IntegrityError:
+        db.session.rollback()
+        # Driver messages name the clashing column differently, so look it up
+        if db.session.execute(select(User.id).where(User.email == data['email'])).first():
+            return jsonify({"error": "Email exists"}), 409
+        if db.session.execute(select(User.id).where(User.username == data['username'])).first():
+            return jsonify({"error": "Username exists"}), 409
+        return jsonify({"error": "User exists"}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Registration failed"}), 500
 
 
 @app.route("/auth/login", methods=["POST"])
+@limiter.limit('login')
 def login():
     data = request.get_json()
     user = User.query.filter_by(email=data['email']).first()
@@ -45,17 +56,42 @@ def login():
         return jsonify({"error": "Invalid credentials"}), 401
 
     access_token = create_access_token(identity=user.id)
-    return jsonify(access_token=access_token), 200
+
+    # Carry over a cart built while signed out; a failed merge keeps the guest token
+    cart_id, lines = load_guest_token()
+    if not lines:
+        return jsonify(access_token=access_token), 200
+    try:
+        merged = merge_guest_cart(user.id, cart_id, lines)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify(access_token=access_token, cart_merged=0), 200
+    return clear_guest_cart(jsonify(access_token=access_token, cart_merged=merged)), 200
 
 # app.register_blueprint(api)  
 
 
-revoked_tokens = set()
+def is_token_revoked(jwt_header, jwt_payload):
+    # Blocklist check for every JWTManager; one primary key lookup per authenticated request
+    return db.session.get(RevokedToken, jwt_payload['jti']) is not None
+
+
+def register_revocation_check(jwt_manager):
+    jwt_manager.token_in_blocklist_loader(is_token_revoked)
+    return jwt_manager
 
 
 @app.route('/auth/logout', methods=['POST'])
 @jwt_required()
 def logout_user():
-    jti = get_jwt()['jti']
-    revoked_tokens.add(jti)
+    # Kept in the database so every process, the ASGI one included, refuses
+    # the token; prune_revoked_tokens drops it once it would have expired anyway
+    claims = get_jwt()
+    expires_at = datetime.utcfromtimestamp(claims['exp']) if claims.get('exp') else None
+    try:
+        db.session.execute(insert(RevokedToken).values(jti=claims['jti'], expires_at=expires_at))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()  # Logged out twice
     return jsonify({"message": "Successfully logged out"}), 200
\ No newline at end of file
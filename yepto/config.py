@@ -9,3 +9,52 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv("SECRET_KEY")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+    JWT_VERIFY_SUB = False  # Tokens carry the integer user id as subject
+
+    # Responses smaller than this are sent uncompressed
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+    COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", 5))
+
+    # Token buckets as (requests, per seconds), keyed by IP and/or user per route
+    RATE_LIMITS = {
+        'login': (10, 60),
+        'register': (5, 60),
+        'checkout': (10, 60),
+        'product_view': (120, 60),
+    }
+    RATE_LIMIT_STORAGE_URL = os.getenv("RATE_LIMIT_STORAGE_URL")  # e.g. redis://localhost:6379/0, in-process when unset
+
+    # Trending products: sliding window split into buckets, fed from analytics events
+    TRENDING_WINDOW_SECONDS = int(os.getenv("TRENDING_WINDOW_SECONDS", 3600))
+    TRENDING_BUCKETS = int(os.getenv("TRENDING_BUCKETS", 60))
+    TRENDING_SYNC_SECONDS = 5  # How stale the in-memory counts may get
+    TRENDING_CHECKPOINT_SECONDS = 300
+    TRENDING_EVENT_WEIGHTS = {
+        'product_view': 1,
+        'purchase': 5,
+    }
+
+    # Faceted product search over an in-memory catalog snapshot
+    FACET_PRICE_BUCKETS = [0, 25, 50, 100, 250, 500, 1000]  # Lower edges, last bucket is open-ended
+    FACET_REFRESH_SECONDS = 5  # Min gap between rebuilds after catalog changes
+    FACET_MAX_AGE_SECONDS = 60  # Rebuild anyway, to pick up writes made outside the app
+
+    # Async serving mode (yepto.asgi) for the read-heavy endpoints
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")  # Defaults to DATABASE_URL with its async driver
+    ASYNC_POOL_SIZE = int(os.getenv("ASYNC_POOL_SIZE", 20))
+
+    # Stock watcher: rows at or below the threshold are kept in low_stock and alerted on
+    LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", 5))
+    STOCK_ALERT_SINK = os.getenv("STOCK_ALERT_SINK", "log")  # 'log', 'file:///path/to/alerts.jsonl' or 'none'
+
+    # Maintenance jobs (yepto.maintenance), run in-process when enabled or by `flask run-jobs`
+    JOBS_ENABLED = os.getenv("JOBS_ENABLED", "0") == "1"
+    JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", 2))
+    JOBS_POLL_SECONDS = 5
+    JOBS_LEASE_SECONDS = 300  # A run that stops renewing its lease for this long is taken over by another process
+    JOB_SCHEDULES = {}  # Overrides by job name: seconds between runs or a cron expression
+    RETURN_WINDOW_DAYS = 30
+    CART_HOLD_HOURS = int(os.getenv("CART_HOLD_HOURS", 48))  # Stock held by a cart line is released after this
+    STALE_CART_DAYS = 30  # Empty carts of accounts older than this are purged, and recreated on demand
+    ADMIN_STATS_MAX_AGE_SECONDS = 900  # Older precomputed dashboard counts are recomputed live
@@ -0,0 +1,259 @@
+import time
+from datetime import datetime
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, insert
+from .config import Config
+from .models import (db, Category, Product, ProductVariant, User, Cart, Review, Order, OrderItem, OrderStatus,
+                     Payment, Analytics, LowStock)
+from .pricing import order_totals
+from .provisioning import UNUSABLE_PASSWORD
+from .recommendations import build_recommendations
+from .stock_watch import stock_level
+
+# Synthetic, production-shaped data for local scale testing. Every column is
+# drawn from one numpy Generator in a fixed order, so a seed and end date
+# always produce the same rows. Popularity is Zipfian and shuffled across ids:
+# a few products take most views and sales, a few users place most orders and
+# a few categories hold most products. Orders, reviews and analytics span
+# HISTORY_YEARS with volume growing toward the end date, and ids increase
+# with time like they do in production. Rows go in INSERT_CHUNK at a time as
+# executemany INSERTs, which the drivers send as multi-row statements.
+
+INSERT_CHUNK = 10000
+ANALYTICS_CHUNK = 1000000  # Analytics columns are drawn this many rows at a time to bound memory
+HISTORY_YEARS = 3
+SCALES = {'10k': 10000, '1m': 1000000, '10m': 10000000}  # Analytics rows; other tables are sized from it
+
+ADJECTIVES = ['red', 'blue', 'classic', 'eco', 'mini', 'pro', 'smart', 'vintage', 'compact', 'deluxe']
+NOUNS = ['shirt', 'lamp', 'mug', 'chair', 'bag', 'watch', 'speaker', 'sneaker', 'desk', 'jacket']
+SIZES = ['S', 'M', 'L']
+ORDER_STATUSES = [OrderStatus.COMPLETED, OrderStatus.PENDING, OrderStatus.CANCELLED]
+ORDER_STATUS_P = [0.85, 0.05, 0.10]
+RATING_P = [0.05, 0.05, 0.10, 0.30, 0.50]
+
+
+def plan(rows):
+    # Table sizes for a scale given as the number of analytics rows
+    return {
+        'categories': max(rows // 20000, 10),
+        'products': max(rows // 50, 100),
+        'users': max(rows // 50, 100),
+        'orders': max(rows // 5, 100),
+        'reviews': max(rows // 20, 100),
+        'analytics': rows,
+    }
+
+
+def zipf_weights(rng, n, s):
+    # Probabilities of n ids by Zipf's law, shuffled so popularity doesn't follow id order
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def timestamps(rng, size, end, years=HISTORY_YEARS, growth=True):
+    # Sorted datetime64 seconds over the years before end, denser toward end when growth is set
+    u = rng.random(size)
+    offsets = ((1 - np.sqrt(u)) if growth else u) * years * 365 * 86400
+    return np.sort(np.datetime64(end, 's') - offsets.astype('timedelta64[s]'))
+
+
+def _datetimes(seconds):
+    return seconds.astype('datetime64[us]').tolist()
+
+
+def _insert(model, columns):
+    # columns: name -> equal-length array or list
+    names = list(columns)
+    values = [c.tolist() if isinstance(c, np.ndarray) else c for c in columns.values()]
+    for start in range(0, len(values[0]), INSERT_CHUNK):
+        db.session.execute(insert(model), [
+            dict(zip(names, row)) for row in zip(*(v[start:start + INSERT_CHUNK] for v in values))
+        ])
+    db.session.commit()
+
+
+# Every table generate writes, so the ids read back after each insert are all its own
+TABLES = (Category, Product, ProductVariant, LowStock, User, Cart, Review, Order, OrderItem, Payment, Analytics)
+
+
+def _ids(model):
+    # Ids of the rows just inserted into a table that was empty, in insert order.
+    # Read back rather than assumed contiguous: sequences and auto-increment
+    # settings may leave gaps.
+    return np.fromiter(db.session.execute(select(model.id).order_by(model.id)).scalars(), dtype=np.int64)
+
+
+def _is_empty():
+    return not any(db.session.execute(select(model.id).limit(1)).first() for model in TABLES)
+
+
+def generate(rows, seed=1, end=None, recommendations=True, echo=None):
+    # Loads a dataset sized by plan(rows) into empty tables; returns rows written per table
+    if not _is_empty():
+        raise ValueError(f"generate needs empty {', '.join(model.__tablename__ for model in TABLES)} tables")
+    echo = echo or (lambda message: None)
+    end = end or datetime.utcnow().replace(microsecond=0)
+    sizes = plan(rows)
+    rng = np.random.default_rng(seed)
+    threshold = current_app.config.get('LOW_STOCK_THRESHOLD', Config.LOW_STOCK_THRESHOLD)
+    written = {}
+
+    # Catalog: long-tail categories, log-normal prices, a few products out of stock
+    n_categories, n_products = sizes['categories'], sizes['products']
+    _insert(Category, {'name': [f'category-{i}' for i in range(n_categories)]})
+    category_ids = _ids(Category)
+    category = category_ids[rng.choice(n_categories, n_products, p=zipf_weights(rng, n_categories, 1.2))]
+    price = np.clip(rng.lognormal(np.log(3000), 1.0, n_products), 100, 500000).astype(np.int64)
+    stock = np.where(rng.random(n_products) < 0.02, 0, rng.integers(1, 1000, n_products))
+    adjectives = rng.integers(0, len(ADJECTIVES), n_products)
+    nouns = rng.integers(0, len(NOUNS), n_products)
+    created = _datetimes(timestamps(rng, n_products, end, growth=False))
+    _insert(Product, {
+        'name': [f'{ADJECTIVES[a]} {NOUNS[n]} {i}' for i, (a, n) in enumerate(zip(adjectives, nouns))],
+        'description': ['Synthetic product'] * n_products,
+        'price': price, 'stock': stock, 'category_id': category,
+        'image_url': [f'https://cdn.example.com/p/{i}.jpg' for i in range(n_products)],
+        'created_at': created, 'updated_at': created,
+    })
+    product_ids = _ids(Product)
+    written.update(category=n_categories, product=n_products)
+    echo(f"catalog: {n_products} products in {n_categories} categories")
+
+    # Sized variants for a fifth of the catalog; those products sell through their variants
+    with_variants = np.flatnonzero(rng.random(n_products) < 0.2)
+    variant_product = np.repeat(with_variants, len(SIZES))
+    variant_stock = rng.integers(0, 200, len(variant_product))
+    price_modifier = np.tile([0, 0, 200], len(with_variants))
+    _insert(ProductVariant, {
+        'product_id': product_ids[variant_product],
+        'variant_type': ['size'] * len(variant_product),
+        'variant_value': SIZES * len(with_variants),
+        'price_modifier': price_modifier,
+        'stock': variant_stock,
+    })
+    variant_ids = _ids(ProductVariant)
+    written['product_variant'] = len(variant_product)
+    has_variants = np.zeros(n_products, dtype=bool)
+    has_variants[with_variants] = True
+    first_variant = np.zeros(n_products, dtype=np.int64)  # Index of a product's first variant row
+    first_variant[with_variants] = np.arange(0, len(variant_product), len(SIZES))
+
+    # low_stock is normally kept by the stock watcher, which bulk inserts bypass
+    low_products = np.flatnonzero(~has_variants & (stock <= threshold))
+    low_variants = np.flatnonzero(variant_stock <= threshold)
+    _insert(LowStock, {
+        'product_id': np.concatenate([product_ids[low_products], product_ids[variant_product[low_variants]]]),
+        'variant_id': [None] * len(low_products) + variant_ids[low_variants].tolist(),
+        'level': [stock_level(int(s), threshold) for s in stock[low_products]]
+                 + [stock_level(int(s), threshold) for s in variant_stock[low_variants]],
+        'since': [end] * (len(low_products) + len(low_variants)),
+    })
+    written['low_stock'] = len(low_products) + len(low_variants)
+
+    # Users, the first one an admin, each with the cart registration creates
+    n_users = sizes['users']
+    _insert(User, {
+        'username': [f'user{i}' for i in range(n_users)],
+        'email': [f'user{i}@example.com' for i in range(n_users)],
+        'password': [UNUSABLE_PASSWORD] * n_users,
+        'is_admin': [i == 0 for i in range(n_users)],
+        'created_at': _datetimes(timestamps(rng, n_users, end)),
+    })
+    user_ids = _ids(User)
+    _insert(Cart, {'user_id': user_ids})
+    written.update(user=n_users, cart=n_users)
+    echo(f"users: {n_users}")
+
+    product_p = zipf_weights(rng, n_products, 1.1)
+    user_p = zipf_weights(rng, n_users, 0.9)
+
+    n_reviews = sizes['reviews']
+    _insert(Review, {
+        'user_id': user_ids[rng.choice(n_users, n_reviews, p=user_p)],
+        'product_id': product_ids[rng.choice(n_products, n_reviews, p=product_p)],
+        'rating': rng.choice(np.arange(1, 6), n_reviews, p=RATING_P),
+        'created_at': _datetimes(timestamps(rng, n_reviews, end)),
+    })
+    written['review'] = n_reviews
+
+    # Order history: items per order 1 + Poisson(1.5), priced at the catalog
+    # price; products with variants are ordered in a random size
+    n_orders = sizes['orders']
+    order_user = user_ids[rng.choice(n_users, n_orders, p=user_p)]
+    order_status = rng.choice(len(ORDER_STATUSES), n_orders, p=ORDER_STATUS_P)
+    order_created = _datetimes(timestamps(rng, n_orders, end))
+    item_counts = 1 + rng.poisson(1.5, n_orders)
+    item_order = np.repeat(np.arange(n_orders), item_counts)
+    item_product = rng.choice(n_products, len(item_order), p=product_p)
+    item_quantity = 1 + rng.poisson(0.3, len(item_order))
+    item_has_variant = has_variants[item_product]
+    item_variant = first_variant[item_product] + rng.integers(0, len(SIZES), len(item_order))
+    item_price = price[item_product].copy()
+    item_price[item_has_variant] += price_modifier[item_variant[item_has_variant]]
+    item_variant_id = np.zeros(len(item_order), dtype=np.int64)
+    item_variant_id[item_has_variant] = variant_ids[item_variant[item_has_variant]]
+    totals = order_totals(item_order, item_price, item_quantity)
+    order_total = np.fromiter((totals[i] for i in range(n_orders)), dtype=np.int64, count=n_orders)
+    _insert(Order, {
+        'user_id': order_user, 'total': order_total,
+        'status': [ORDER_STATUSES[s] for s in order_status],
+        'return_status': ['not_returned'] * n_orders, 'created_at': order_created,
+    })
+    order_ids = _ids(Order)
+    _insert(OrderItem, {
+        'order_id': order_ids[item_order], 'product_id': product_ids[item_product],
+        'variant_id': [v if has else None for has, v in zip(item_has_variant.tolist(), item_variant_id.tolist())],
+        'quantity': item_quantity, 'price': item_price,
+    })
+    paid = np.flatnonzero(order_status == 0)
+    _insert(Payment, {
+        'order_id': order_ids[paid], 'amount': order_total[paid], 'payment_method': ['card'] * len(paid),
+        'status': ['completed'] * len(paid), 'created_at': [order_created[i] for i in paid],
+    })
+    written.update(order=n_orders, order_item=len(item_order), payment=len(paid))
+    echo(f"orders: {n_orders} with {len(item_order)} items")
+
+    # Analytics: 95% product views, the rest purchases, 30% of events anonymous
+    n_events = sizes['analytics']
+    event_times = timestamps(rng, n_events, end)
+    for start in range(0, n_events, ANALYTICS_CHUNK):
+        size = min(ANALYTICS_CHUNK, n_events - start)
+        purchase = rng.random(size) < 0.05
+        anonymous = rng.random(size) < 0.3
+        users = user_ids[rng.choice(n_users, size, p=user_p)]
+        _insert(Analytics, {
+            'event_type': np.where(purchase, 'purchase', 'product_view'),
+            'user_id': [None if a else u for a, u in zip(anonymous.tolist(), users.tolist())],
+            'product_id': product_ids[rng.choice(n_products, size, p=product_p)],
+            'created_at': _datetimes(event_times[start:start + size]),
+        })
+        echo(f"analytics: {start + size}/{n_events}")
+    written['analytics'] = n_events
+
+    if recommendations:
+        echo(f"recommendations: {build_recommendations()} products")
+    return written
+
+
+@click.command('generate-data')
+@click.option('--scale', type=click.Choice(list(SCALES)), default='10k', show_default=True)
+@click.option('--rows', type=int, help='Analytics rows, instead of a named scale')
+@click.option('--seed', default=1, show_default=True)
+@click.option('--end', type=click.DateTime(), help='Newest timestamp; defaults to now')
+@click.option('--no-recommendations', is_flag=True, help='Skip rebuilding product recommendations')
+@with_appcontext
+def generate_data_command(scale, rows, seed, end, no_recommendations):
+    """Bulk-load a deterministic synthetic dataset with skewed popularity into an empty database."""
+    start = time.perf_counter()
+    try:
+        written = generate(rows or SCALES[scale], seed, end, not no_recommendations, click.echo)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    elapsed = time.perf_counter() - start
+    total = sum(written.values())
+    click.echo(f"Wrote {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s): "
+               + ', '.join(f'{table} {count}' for table, count in written.items()))
@@ -0,0 +1,233 @@
+import time
+from calendar import timegm
+from threading import Lock, Thread
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, func, case
+from . import http_cache
+from .config import Config
+from .models import db, Product, ProductVariant, Category, Review
+from .pricing import to_cents
+
+SORTS = ('id', 'price_asc', 'price_desc', 'newest', 'rating', 'name')
+
+
+def parse_filters(args):
+    # Raises ValueError on malformed numbers or an unknown sort
+    filters = {
+        'categories': [c for c in args.getlist('category') if c],  # Repeated, so names may contain commas
+        'search': args.get('search', '').strip().lower(),
+        'min_price': to_cents(args['min_price']) if args.get('min_price') else None,  # In cents from here on
+        'max_price': to_cents(args['max_price']) if args.get('max_price') else None,
+        'in_stock': args.get('in_stock') in ('1', 'true'),
+        'min_rating': float(args['min_rating']) if args.get('min_rating') else None,
+        'sort': args.get('sort', 'id'),
+        'page': int(args.get('page', 1)),
+        'per_page': min(int(args.get('per_page', 50)), 200),
+    }
+    if filters['sort'] not in SORTS:
+        raise ValueError(f"Unknown sort {filters['sort']}")
+    if filters['page'] < 1 or filters['per_page'] < 1:
+        raise ValueError("page and per_page must be positive")
+    return filters
+
+
+def _price_buckets():
+    # Lower edges as configured, in currency units, and in cents for comparing with Product.price
+    edges = current_app.config.get('FACET_PRICE_BUCKETS', Config.FACET_PRICE_BUCKETS)
+    return edges, [to_cents(edge) for edge in edges]
+
+
+def _bucket_labels(edges):
+    return [f'{lo:g}-{hi:g}' for lo, hi in zip(edges, edges[1:])] + [f'{edges[-1]:g}+']
+
+
+def _offset(filters):
+    return (filters['page'] - 1) * filters['per_page']
+
+
+def _catalog_rows():
+    variant_stock = (
+        select(ProductVariant.product_id, func.sum(ProductVariant.stock).label('stock'))
+        .group_by(ProductVariant.product_id).subquery()
+    )
+    rating = (
+        select(Review.product_id, func.avg(Review.rating).label('rating'))
+        .group_by(Review.product_id).subquery()
+    )
+    stmt = (
+        select(
+            Product.id, Product.name, Product.price,
+            (Product.stock + func.coalesce(variant_stock.c.stock, 0)).label('stock'),
+            Product.category_id, Category.name.label('category'), Product.created_at,
+            rating.c.rating,
+        )
+        .outerjoin(Category, Category.id == Product.category_id)
+        .outerjoin(variant_stock, variant_stock.c.product_id == Product.id)
+        .outerjoin(rating, rating.c.product_id == Product.id)
+    )
+    return stmt, variant_stock, rating
+
+
+class CatalogSnapshot:
+    # Column arrays over the whole catalog, so a filter is a few vectorized
+    # comparisons and facet counts are bincounts instead of GROUP BY queries.
+
+    def __init__(self, version):
+        self.version = version
+        stmt, _, _ = _catalog_rows()
+        rows = db.session.execute(stmt.order_by(Product.id)).all()
+        self.ids = np.array([r.id for r in rows], dtype=np.int64)
+        self.names = np.array([(r.name or '').lower() for r in rows], dtype=str)
+        self.price = np.array([r.price for r in rows], dtype=np.int64)
+        self.stock = np.array([r.stock for r in rows], dtype=np.int64)
+        self.rating = np.array([r.rating if r.rating is not None else np.nan for r in rows], dtype=np.float64)
+        self.created = np.array([timegm(r.created_at.utctimetuple()) if r.created_at else 0 for r in rows],
+                                dtype=np.int64)
+        self.name_rank = np.argsort(np.argsort(self.names, kind='stable'), kind='stable')
+
+        # Categories as dense codes; code 0 is "no category"
+        self.category_names = [None] + sorted({r.category for r in rows if r.category})
+        codes = {name: code for code, name in enumerate(self.category_names)}
+        self.category = np.array([codes[r.category] if r.category else 0 for r in rows], dtype=np.int64)
+        self.built_at = time.monotonic()
+
+    def query(self, filters):
+        labels, edges = _price_buckets()
+        edges = np.array(edges, dtype=np.int64)
+        base = np.ones(len(self.ids), dtype=bool)
+        if filters['search']:
+            base &= np.char.find(self.names, filters['search']) >= 0
+        if filters['in_stock']:
+            base &= self.stock > 0
+        if filters['min_rating'] is not None:
+            base &= self.rating >= filters['min_rating']  # NaN (unrated) compares False
+
+        by_category = np.ones(len(self.ids), dtype=bool)
+        if filters['categories']:
+            wanted = [self.category_names.index(c) for c in filters['categories'] if c in self.category_names]
+            by_category = np.isin(self.category, wanted)
+
+        by_price = np.ones(len(self.ids), dtype=bool)
+        if filters['min_price'] is not None:
+            by_price &= self.price >= filters['min_price']
+        if filters['max_price'] is not None:
+            by_price &= self.price <= filters['max_price']
+
+        # Each facet counts with every filter applied except its own
+        bucket = np.digitize(self.price, edges) - 1
+        category_counts = np.bincount(self.category[base & by_price], minlength=len(self.category_names))
+        price_counts = np.bincount(bucket[base & by_category & (bucket >= 0)], minlength=len(edges))
+
+        selected = np.flatnonzero(base & by_category & by_price)
+        order = self._order(selected, filters['sort'])
+        ids = self.ids[selected[order]]
+
+        facets = {
+            'categories': {name: int(n) for name, n in zip(self.category_names[1:], category_counts[1:]) if n},
+            'price': dict(zip(_bucket_labels(labels), price_counts.tolist())),
+        }
+        start = _offset(filters)
+        return ids[start:start + filters['per_page']].tolist(), len(ids), facets
+
+    def _order(self, selected, sort):
+        if sort == 'price_asc':
+            return np.lexsort((self.ids[selected], self.price[selected]))
+        if sort == 'price_desc':
+            return np.lexsort((self.ids[selected], -self.price[selected]))
+        if sort == 'newest':
+            return np.lexsort((-self.ids[selected], -self.created[selected]))
+        if sort == 'rating':
+            return np.lexsort((self.ids[selected], -np.nan_to_num(self.rating[selected], nan=-1)))
+        if sort == 'name':
+            return np.argsort(self.name_rank[selected], kind='stable')
+        return np.arange(len(selected))  # Already in id order
+
+
+def sql_query(filters):
+    # Cold-start path with the same semantics, used until a snapshot exists
+    stmt, variant_stock, rating = _catalog_rows()
+    stock = Product.stock + func.coalesce(variant_stock.c.stock, 0)
+    base = []
+    if filters['search']:
+        base.append(Product.name.icontains(filters['search'], autoescape=True))  # Literal, like the snapshot
+    if filters['in_stock']:
+        base.append(stock > 0)
+    if filters['min_rating'] is not None:
+        base.append(rating.c.rating >= filters['min_rating'])
+    by_category = [Category.name.in_(filters['categories'])] if filters['categories'] else []
+    by_price = []
+    if filters['min_price'] is not None:
+        by_price.append(Product.price >= filters['min_price'])
+    if filters['max_price'] is not None:
+        by_price.append(Product.price <= filters['max_price'])
+
+    order = {
+        'id': [Product.id],
+        'price_asc': [Product.price, Product.id],
+        'price_desc': [Product.price.desc(), Product.id],
+        'newest': [Product.created_at.desc(), Product.id.desc()],
+        'rating': [func.coalesce(rating.c.rating, -1).desc(), Product.id],
+        'name': [func.lower(Product.name), Product.id],
+    }[filters['sort']]
+    matching = stmt.with_only_columns(Product.id).where(*base, *by_category, *by_price)
+    total = db.session.execute(select(func.count()).select_from(matching.subquery())).scalar()
+    ids = db.session.execute(
+        matching.order_by(*order).limit(filters['per_page']).offset(_offset(filters))
+    ).scalars().all()
+
+    category_counts = db.session.execute(
+        stmt.with_only_columns(Category.name, func.count())
+        .where(*base, *by_price, Category.name.isnot(None)).group_by(Category.name)
+    ).all()
+
+    labels, edges = _price_buckets()
+    bucket = case(
+        *[(Product.price < hi, i) for i, hi in enumerate(edges[1:])], else_=len(edges) - 1
+    )
+    price_counts = dict(db.session.execute(
+        stmt.with_only_columns(bucket, func.count())
+        .where(*base, *by_category, Product.price >= edges[0]).group_by(bucket)
+    ).all())
+
+    facets = {
+        'categories': {name: n for name, n in sorted(category_counts)},
+        'price': {label: price_counts.get(i, 0) for i, label in enumerate(_bucket_labels(labels))},
+    }
+    return ids, total, facets
+
+
+snapshot = None
+rebuild_lock = Lock()
+
+
+def _rebuild(app):
+    global snapshot
+    try:
+        with app.app_context():
+            snapshot = CatalogSnapshot(http_cache.load_catalog_version())  # Read before the rows
+            db.session.remove()
+    except Exception as e:
+        app.logger.exception("Failed to build catalog snapshot")
+    finally:
+        rebuild_lock.release()
+
+
+def search_catalog(filters):
+    # Serves from the snapshot when there is one, rebuilding it in the
+    # background after catalog changes by any worker at most every
+    # FACET_REFRESH_SECONDS. The max age covers writes made outside the app.
+    config = current_app.config
+    current = snapshot
+    age = time.monotonic() - current.built_at if current else None
+    stale = (current is None or current.version != http_cache.catalog_version()
+             or age >= config.get('FACET_MAX_AGE_SECONDS', Config.FACET_MAX_AGE_SECONDS))
+    if stale and (current is None or age >= config.get('FACET_REFRESH_SECONDS', Config.FACET_REFRESH_SECONDS)):
+        if rebuild_lock.acquire(blocking=False):
+            Thread(target=_rebuild, args=(current_app._get_current_object(),), daemon=True).start()
+    if current is None:
+        return sql_query(filters)
+    if current.version != http_cache.catalog_version():
+        http_cache.stale_catalog_response()  # Until the rebuild lands
+    return current.query(filters)
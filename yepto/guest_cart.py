@@ -0,0 +1,206 @@
+from flask import Flask, request, jsonify, current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from datetime import datetime
+from uuid import uuid4
+from sqlalchemy import select, insert, update
+from .config import Config
+from .inventory import lock_products, lock_variants
+from .pricing import cart_totals, from_cents
+from .models import db, Product, ProductVariant, Cart, CartItem, ConsumedGuestCart
+from .serializers import json_response
+
+app = Flask(__name__)
+
+GUEST_CART_COOKIE = 'guest_cart'
+GUEST_CART_HEADER = 'X-Guest-Cart'
+GUEST_CART_MAX_ITEMS = 50
+GUEST_CART_MAX_AGE = 30 * 24 * 3600  # Seconds before a token stops being accepted
+
+# Anonymous carts live entirely in a signed, zlib-compressed token held by the
+# client (cookie or X-Guest-Cart header), so browsing never writes to the
+# database. The token only carries a random cart id and [product_id,
+# variant_id, quantity, price seen] per line; prices are always re-read from
+# the catalog. The cart id survives edits, and merging it into an account
+# consumes it, so no copy of the token can be merged again.
+
+
+def _serializer():
+    secret = current_app.config.get('SECRET_KEY') or Config.SECRET_KEY
+    return URLSafeTimedSerializer(secret, salt='guest-cart')
+
+
+def load_guest_token(token=None):
+    # (cart id, lines); missing, tampered or expired tokens are an empty cart with no id
+    token = token or request.headers.get(GUEST_CART_HEADER) or request.cookies.get(GUEST_CART_COOKIE)
+    if not token:
+        return None, []
+    try:
+        data = _serializer().loads(token, max_age=GUEST_CART_MAX_AGE)
+    except BadSignature:
+        return None, []
+    return data['id'], [tuple(line) for line in data['lines']][:GUEST_CART_MAX_ITEMS]
+
+
+def load_guest_cart(token=None):
+    return load_guest_token(token)[1]
+
+
+def dump_guest_cart(cart_id, lines):
+    return _serializer().dumps({'id': cart_id or uuid4().hex, 'lines': [list(line) for line in lines]})
+
+
+def price_lookup(lines):
+    # (product_id, variant_id) -> (name, current price, stock) for every line, in one query
+    product_ids = {line[0] for line in lines}
+    if not product_ids:
+        return {}
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.price, Product.stock,
+               ProductVariant.id, ProductVariant.price_modifier, ProductVariant.stock)
+        .outerjoin(ProductVariant, ProductVariant.product_id == Product.id)
+        .where(Product.id.in_(product_ids))
+    ).all()
+    found = {}
+    for product_id, name, price, stock, variant_id, price_modifier, variant_stock in rows:
+        found[(product_id, None)] = (name, price, stock)
+        if variant_id is not None:
+            found[(product_id, variant_id)] = (name, price + (price_modifier or 0), variant_stock)
+    return found
+
+
+def _set_token(response, cart_id, lines):
+    token = dump_guest_cart(cart_id, lines)
+    response.set_cookie(GUEST_CART_COOKIE, token, max_age=GUEST_CART_MAX_AGE, httponly=True, samesite='Lax')
+    response.headers[GUEST_CART_HEADER] = token
+    return response
+
+
+def priced_lines(lines):
+    # Lines with current prices, in cents
+    prices = price_lookup(lines)
+    items = []
+    for product_id, variant_id, quantity, price_seen in lines:
+        if (product_id, variant_id) not in prices:
+            continue  # Product or variant removed since it was added
+        name, price, stock = prices[(product_id, variant_id)]
+        items.append({
+            'product_id': product_id, 'variant_id': variant_id, 'name': name, 'price': price,
+            'quantity': quantity, 'price_changed': price != price_seen,
+        })
+    return items
+
+
+@app.route('/guest/cart', methods=['GET'])
+def get_guest_cart():
+    items = priced_lines(load_guest_cart())
+    totals = cart_totals([item['price'] for item in items], [item['quantity'] for item in items])
+    for item in items:
+        item['price'] = from_cents(item['price'])
+    return json_response({'items': items, 'total_items': len(items), 'total_price': from_cents(totals['total'])})
+
+
+@app.route('/guest/cart', methods=['POST'])
+def add_to_guest_cart():
+    data = request.get_json() or {}
+    try:
+        product_id = int(data['product_id'])
+        variant_id = int(data['variant_id']) if data.get('variant_id') else None
+        quantity = int(data.get('quantity', 1))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Missing or invalid product_id, variant_id or quantity"}), 400
+    if quantity < 1:
+        return jsonify({"error": "Quantity must be positive"}), 400
+
+    cart_id, lines = load_guest_token()
+    current = price_lookup([(product_id, variant_id)]).get((product_id, variant_id))
+    if not current:
+        return jsonify({"error": "Invalid product or variant"}), 400
+    name, price, stock = current
+
+    existing = next((i for i, line in enumerate(lines) if line[:2] == (product_id, variant_id)), None)
+    if existing is not None:
+        quantity += lines[existing][2]
+        lines[existing] = (product_id, variant_id, quantity, price)
+    elif len(lines) >= GUEST_CART_MAX_ITEMS:
+        return jsonify({"error": "Guest cart is full"}), 400
+    else:
+        lines.append((product_id, variant_id, quantity, price))
+    if stock < quantity:
+        return jsonify({"error": "Insufficient stock"}), 400
+
+    return _set_token(jsonify({"message": "Item added to cart"}), cart_id, lines), 201
+
+
+@app.route('/guest/cart', methods=['DELETE'])
+def remove_from_guest_cart():
+    data = request.get_json() or {}
+    try:
+        key = (int(data['product_id']), int(data['variant_id']) if data.get('variant_id') else None)
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Missing or invalid product_id or variant_id"}), 400
+    cart_id, lines = load_guest_token()
+    lines = [line for line in lines if line[:2] != key]
+    return _set_token(jsonify({"message": "Item removed from cart"}), cart_id, lines), 200
+
+
+def merge_guest_cart(user_id, cart_id, lines):
+    # Folds guest lines into the user's persistent cart: one batched price and
+    # stock lookup, then one multi-row UPDATE for lines already in the cart and
+    # one multi-row INSERT for the rest. Nullable variant_id rules out an
+    # ON CONFLICT upsert, so the cart row lock serializes concurrent merges.
+    # The guest cart id is consumed in the same transaction: a replayed token
+    # merges nothing, and a concurrent merge of the same token fails on its
+    # primary key. Returns the number of lines merged; the caller commits.
+    if not lines or not cart_id or db.session.get(ConsumedGuestCart, cart_id):
+        return 0
+    db.session.execute(insert(ConsumedGuestCart).values(id=cart_id, consumed_at=datetime.utcnow()))
+    prices = price_lookup(lines)
+    wanted = {}
+    for product_id, variant_id, quantity, _ in lines:
+        if (product_id, variant_id) in prices and quantity > 0:
+            wanted[(product_id, variant_id)] = wanted.get((product_id, variant_id), 0) + quantity
+    if not wanted:
+        return 0
+
+    cart = db.session.execute(select(Cart).where(Cart.user_id == user_id).with_for_update()).scalar_one_or_none()
+    if not cart:
+        cart = Cart(user_id=user_id)
+        db.session.add(cart)
+        db.session.flush()
+    existing = {
+        (product_id, variant_id): (item_id, quantity)
+        for item_id, product_id, variant_id, quantity in db.session.execute(
+            select(CartItem.id, CartItem.product_id, CartItem.variant_id, CartItem.quantity)
+            .where(CartItem.cart_id == cart.id)
+        )
+    }
+
+    # Guest lines never reserved stock, so each one is capped at what is left
+    # now and reserved like add_to_cart does; release_abandoned_stock gives it
+    # back if the cart is abandoned
+    products = lock_products(product_id for product_id, _ in wanted)
+    variants = lock_variants(variant_id for _, variant_id in wanted if variant_id)
+    now = datetime.utcnow()
+    updates, inserts = [], []
+    for key, quantity in wanted.items():
+        stock_row = variants.get(key[1]) if key[1] else products.get(key[0])
+        quantity = min(quantity, stock_row.stock) if stock_row else 0
+        if quantity <= 0:
+            continue
+        stock_row.stock -= quantity
+        if key in existing:
+            item_id, current = existing[key]
+            updates.append({'id': item_id, 'quantity': current + quantity, 'added_at': now})
+        else:
+            inserts.append({'cart_id': cart.id, 'product_id': key[0], 'variant_id': key[1], 'quantity': quantity,
+                            'added_at': now})
+    if updates:
+        db.session.execute(update(CartItem), updates)
+    if inserts:
+        db.session.execute(insert(CartItem), inserts)
+    return len(updates) + len(inserts)
+
+
+def clear_guest_cart(response):
+    response.delete_cookie(GUEST_CART_COOKIE)
+    return response
@@ -0,0 +1,213 @@
+import gzip
+import hashlib
+import logging
+from functools import wraps
+from flask import request, current_app, make_response, g
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+from sqlalchemy import event, inspect, select, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import db, Product, ProductVariant, Category, Review, CatalogVersion
+
+try:
+    import brotli  # Optional, only offered to clients when installed
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = {'application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript'}
+CATALOG_MODELS = (Product, ProductVariant, Category, Review)
+CATALOG_TABLES = {model.__table__ for model in CATALOG_MODELS}
+
+# The catalog version is the catalog_version row, so every worker and restart
+# agrees on it. A transaction that changed the catalog, through the ORM or a
+# Core insert/update/delete, bumps it once it has committed; requests read it
+# before any catalog rows. A version is therefore never paired with rows
+# older than it, and a rolled back transaction bumps nothing.
+
+
+# Stock moves on every cart add, stock release, cancel and return, so bumping on it
+# would make the version row a hot spot every buyer serializes on. Listings
+# only show whether a product or variant is in stock, so a stock change counts
+# only when it crosses zero.
+UNVERSIONED_ATTRS = {'stock', 'updated_at'}
+
+
+def _in_stock(stock):
+    return stock is not None and stock > 0
+
+
+def _changes_catalog(obj):
+    state = inspect(obj)
+    for key in state.mapper.column_attrs.keys():
+        history = state.attrs[key].history
+        if not history.added:
+            continue
+        if key == 'stock':
+            old = history.deleted[0] if history.deleted else None
+            if _in_stock(old) != _in_stock(history.added[0]):
+                return True
+        elif key not in UNVERSIONED_ATTRS:
+            return True
+    return False
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_catalog_flush(session, flush_context):
+    if any(isinstance(obj, CATALOG_MODELS) for obj in (*session.new, *session.deleted)) or \
+            any(isinstance(obj, CATALOG_MODELS) and _changes_catalog(obj) for obj in session.dirty):
+        session.info['catalog_changed'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_catalog_statements(state):
+    if (state.is_insert or state.is_update or state.is_delete) and state.statement.table in CATALOG_TABLES:
+        state.session.info['catalog_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_catalog_version(session):
+    if not session.info.pop('catalog_changed', False):
+        return
+    # The session can't run SQL after its commit, so this is a short transaction of its own
+    table = CatalogVersion.__table__
+    for attempt in range(2):
+        try:
+            with session.get_bind().begin() as connection:
+                bumped = connection.execute(
+                    update(table).where(table.c.id == 1).values(version=table.c.version + 1)
+                ).rowcount
+                if not bumped:  # Tables made by create_all() rather than the migration
+                    connection.execute(insert(table).values(id=1, version=1))
+            return
+        except IntegrityError:
+            continue  # Another process inserted the row first
+        except Exception:
+            logger.exception("Failed to bump the catalog version")
+            return
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_catalog_changes(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('catalog_changed', None)
+
+
+def load_catalog_version():
+    return db.session.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1)).scalar() or 0
+
+
+def catalog_version():
+    # Read once per request, before the view reads any catalog rows
+    if 'catalog_version' not in g:
+        g.catalog_version = load_catalog_version()
+    return g.catalog_version
+
+
+def stale_catalog_response():
+    # For views answering from catalog data older than catalog_version(), e.g.
+    # a facet snapshot being rebuilt: the response is tagged by its body hash,
+    # so clients don't keep getting 304s for it under the new version
+    g.catalog_stale = True
+
+
+def optional_identity():
+    # The signed-in user's id, or None. Public views treat an expired or
+    # malformed token like no token rather than answering 401/422.
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, PyJWTError):
+        return None
+    return get_jwt_identity()
+
+
+def _accepted_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _not_modified(etag):
+    # Compressed variants carry an "-<encoding>" suffix; any variant of the same body matches
+    tags = request.if_none_match
+    return tags.star_tag or any(tag.partition('-')[0] == etag for tag in tags.as_set(include_weak=True))
+
+
+def _not_modified_response(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def catalog_etag(fn):
+    # Answers If-None-Match from the catalog version before the view runs.
+    # Signed-in users get per-user fields (e.g. wishlist flags), so their
+    # responses fall back to hashing the body.
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if optional_identity():
+            return fn(*args, **kwargs)
+
+        etag = hashlib.sha1(f'{catalog_version()}:{request.full_path}'.encode()).hexdigest()
+        if _not_modified(etag):
+            return _not_modified_response(etag)
+        response = make_response(fn(*args, **kwargs))
+        if response.status_code == 200 and not g.get('catalog_stale'):
+            response.set_etag(etag)
+        return response
+    return wrapper
+
+
+def finalize_response(response):
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+
+    cacheable = request.method in ('GET', 'HEAD') and response.status_code == 200
+    compressible = response.mimetype in COMPRESSIBLE_TYPES
+    if not (cacheable or compressible):
+        return response
+
+    body = response.get_data()
+    etag = None
+    if cacheable:
+        etag = response.get_etag()[0] or hashlib.sha1(body).hexdigest()
+        if _not_modified(etag):
+            return _not_modified_response(etag)
+
+    encoding = None
+    if compressible:
+        response.vary.add('Accept-Encoding')
+        if len(body) >= current_app.config['COMPRESS_MIN_SIZE']:
+            encoding = _accepted_encoding()
+
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=current_app.config['COMPRESS_BROTLI_QUALITY']))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(body, compresslevel=current_app.config['COMPRESS_GZIP_LEVEL']))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+
+    if etag:
+        # Strong ETags must differ between encodings of the same resource
+        response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+    return response
+
+
+class HttpCache:  # Compression and conditional GET for every response of an app
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+        app.after_request(finalize_response)
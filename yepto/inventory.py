@@ -0,0 +1,64 @@
+from sqlalchemy import select
+from .models import db, Product, ProductVariant, CartItem
+from . import stock_watch  # Registers the low-stock flush hook for every stock change
+
+
+# Rows are always locked products first, then variants, then cart lines, each
+# in primary key order, so two checkouts touching the same rows can never
+# deadlock.
+
+def lock_products(product_ids):
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    products = db.session.execute(
+        select(Product)
+        .where(Product.id.in_(product_ids))
+        .order_by(Product.id)
+        .with_for_update()
+    ).scalars()
+    return {p.id: p for p in products}
+
+
+def lock_variants(variant_ids):
+    variant_ids = set(variant_ids)
+    if not variant_ids:
+        return {}
+    variants = db.session.execute(
+        select(ProductVariant)
+        .where(ProductVariant.id.in_(variant_ids))
+        .order_by(ProductVariant.id)
+        .with_for_update()
+    ).scalars()
+    return {v.id: v for v in variants}
+
+
+def lock_stock(items):
+    # Lock everything a list of cart/order items draws stock from in two queries
+    products = lock_products(item.product_id for item in items)
+    variants = lock_variants(item.variant_id for item in items if item.variant_id)
+    return products, variants
+
+
+def restore_stock(items):
+    products, variants = lock_stock(items)
+    for item in items:
+        stock_row = variants.get(item.variant_id) if item.variant_id else products.get(item.product_id)
+        if stock_row:
+            stock_row.stock += item.quantity
+
+
+def lock_cart_lines(item_ids, skip_locked=False):
+    # Re-reads cart lines under lock once their stock rows are locked, so a
+    # checkout or stock release that got there first is seen: its lines are
+    # gone or carry their new quantity and added_at
+    item_ids = set(item_ids)
+    if not item_ids:
+        return []
+    return db.session.execute(
+        select(CartItem)
+        .where(CartItem.id.in_(item_ids))
+        .order_by(CartItem.id)
+        .with_for_update(skip_locked=skip_locked)
+        .execution_options(populate_existing=True)
+    ).scalars().all()
@@ -0,0 +1,322 @@
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Thread, Lock
+from uuid import uuid4
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, insert, update, or_
+from sqlalchemy.exc import IntegrityError
+from .config import Config
+from .models import db, JobLease
+
+logger = logging.getLogger(__name__)
+
+
+class Every:  # Interval schedule, counted from the previous start
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def next_after(self, dt):
+        return dt + timedelta(seconds=self.seconds)
+
+    def __str__(self):
+        return f'every {self.seconds}s'
+
+
+class Cron:  # "minute hour day-of-month month day-of-week", with *, a-b, lists and /step; Sunday is 0
+
+    RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expr}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, lo, hi) for field, (lo, hi) in zip(fields, self.RANGES)
+        )
+        self.any_day, self.any_weekday = fields[2] == '*', fields[4] == '*'
+
+    @staticmethod
+    def _parse(field, lo, hi):
+        values = set()
+        for part in field.split(','):
+            part, _, step = part.partition('/')
+            if part == '*':
+                start, end = lo, hi
+            elif '-' in part:
+                start, end = map(int, part.split('-'))
+            else:
+                start = int(part)
+                end = hi if step else start
+            if not lo <= start <= end <= hi:
+                raise ValueError(f"Cron field {field} outside {lo}-{hi}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return frozenset(values)
+
+    def _day_matches(self, dt):
+        in_month, in_week = dt.day in self.days, (dt.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week  # Like cron, restricting both fields matches either
+
+    def next_after(self, dt):
+        # Skips whole months, days and hours that can't match instead of stepping minute by minute
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=4 * 366)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"Cron expression never matches: {self.expr}")
+
+    def __str__(self):
+        return self.expr
+
+
+def parse_schedule(value):
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        return Every(int(value))
+    return Cron(value)
+
+
+class Job:
+
+    def __init__(self, name, fn, schedule, chunk_size=None, local=False):
+        self.name = name
+        self.fn = fn
+        self.schedule = schedule
+        self.chunk_size = chunk_size  # fn(checkpoint, limit) -> (rows, next checkpoint or None)
+        self.local = local  # Runs in every process, e.g. for per-process state; no lease
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class Scheduler:
+    # Runs maintenance jobs on a small worker pool. A leased job runs on one
+    # process at a time: claiming it is a conditional UPDATE of its job_lease
+    # row, which also holds the checkpoint of a chunked run and the metrics of
+    # the last one. Each chunk commits together with its checkpoint, so a run
+    # cut short resumes where it stopped.
+
+    def __init__(self):
+        self.jobs = {}
+        self.app = None
+        self.thread = None
+        self.pool = None
+        self.running = set()
+        self.lock = Lock()
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}'
+        self.local_stats = {}
+
+    def job(self, name, schedule, chunk_size=None, local=False):
+        def decorator(fn):
+            self.jobs[name] = Job(name, fn, parse_schedule(schedule), chunk_size, local)
+            return fn
+        return decorator
+
+    def init_app(self, app):
+        if app.config.get('JOBS_ENABLED', Config.JOBS_ENABLED):
+            self.start(app)
+
+    def configure(self, app):
+        self.app = app
+        for name, schedule in app.config.get('JOB_SCHEDULES', Config.JOB_SCHEDULES).items():
+            if name in self.jobs:
+                self.jobs[name].schedule = parse_schedule(schedule)
+
+    def start(self, app):
+        with self.lock:
+            if self.thread is None:
+                self.configure(app)
+                self.pool = ThreadPoolExecutor(app.config.get('JOBS_WORKERS', Config.JOBS_WORKERS),
+                                               thread_name_prefix='job')
+                self.thread = Thread(target=self._loop, name='job-scheduler', daemon=True)
+                self.thread.start()
+
+    def _loop(self):
+        poll = self.app.config.get('JOBS_POLL_SECONDS', Config.JOBS_POLL_SECONDS)
+        while True:
+            try:
+                for job in self.claim_due():
+                    self.pool.submit(self.run, job)
+            except Exception:
+                logger.exception("Job scheduler tick failed")
+            time.sleep(poll)
+
+    def _lease_seconds(self):
+        return self.app.config.get('JOBS_LEASE_SECONDS', Config.JOBS_LEASE_SECONDS)
+
+    def _ensure_leases(self):
+        names = [name for name, job in self.jobs.items() if not job.local]
+        existing = set(db.session.execute(select(JobLease.name).where(JobLease.name.in_(names))).scalars())
+        missing = [{'name': name, 'runs': 0, 'failures': 0, 'total_rows': 0} for name in names if name not in existing]
+        if missing:
+            try:
+                db.session.execute(insert(JobLease), missing)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()  # Another process created them first
+
+    def claim_due(self, now=None):
+        # Returns the jobs this process just claimed and should run now
+        now = now or datetime.utcnow()
+        claimed = []
+        with self.app.app_context():
+            self._ensure_leases()
+            leases = {row.name: row for row in db.session.execute(select(JobLease)).scalars()}
+            for name, job in self.jobs.items():
+                with self.lock:
+                    if name in self.running:
+                        continue
+                if job.local:
+                    stats = self.local_stats.get(name, {})
+                    due = not stats.get('last_started_at') or job.schedule.next_after(stats['last_started_at']) <= now
+                else:
+                    due = self._claim(job, leases.get(name), now)
+                if due:
+                    with self.lock:
+                        self.running.add(name)
+                    claimed.append(job)
+            db.session.remove()
+        return claimed
+
+    def _claim(self, job, lease, now):
+        if lease is None or (lease.expires_at and lease.expires_at > now):
+            return False  # Not created yet, or running elsewhere
+        interrupted = lease.last_started_at and (
+            lease.last_finished_at is None or lease.last_finished_at < lease.last_started_at
+        )
+        if lease.last_started_at and not interrupted and job.schedule.next_after(lease.last_started_at) > now:
+            return False
+        result = db.session.execute(
+            update(JobLease)
+            .where(JobLease.name == job.name,
+                   or_(JobLease.expires_at.is_(None), JobLease.expires_at <= now),
+                   JobLease.last_started_at.is_not_distinct_from(lease.last_started_at))
+            .values(owner=self.owner, expires_at=now + timedelta(seconds=self._lease_seconds()), last_started_at=now)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _checkpoint(self, job, checkpoint):
+        # Commits the chunk just written together with its checkpoint and a renewed lease
+        if job.local:
+            db.session.commit()
+            return
+        result = db.session.execute(
+            update(JobLease)
+            .where(JobLease.name == job.name, JobLease.owner == self.owner)
+            .values(checkpoint=checkpoint,
+                    expires_at=datetime.utcnow() + timedelta(seconds=self._lease_seconds()))
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            raise LeaseLost(job.name)
+        db.session.commit()
+
+    def run(self, job):
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        rows, error, checkpoint = 0, None, None
+        with self.app.app_context():
+            try:
+                if job.local:
+                    self.local_stats.setdefault(job.name, {})['last_started_at'] = started_at
+                else:
+                    checkpoint = db.session.execute(
+                        select(JobLease.checkpoint).where(JobLease.name == job.name)
+                    ).scalar()
+                if job.chunk_size:
+                    while True:
+                        count, checkpoint = job.fn(checkpoint, job.chunk_size)
+                        rows += count
+                        self._checkpoint(job, checkpoint)
+                        if checkpoint is None:
+                            break
+                else:
+                    rows = job.fn() or 0
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                error = repr(e)
+                logger.exception("Job %s failed", job.name)
+            finally:
+                self._record(job, started_at, time.perf_counter() - start, rows, error)
+                db.session.remove()
+                with self.lock:
+                    self.running.discard(job.name)
+
+    def _record(self, job, started_at, duration, rows, error):
+        finished_at = datetime.utcnow()
+        if job.local:
+            stats = self.local_stats.setdefault(job.name, {'runs': 0, 'failures': 0, 'total_rows': 0})
+            stats.update(last_finished_at=finished_at, last_duration=duration, last_rows=rows, last_error=error,
+                         runs=stats.get('runs', 0) + 1, failures=stats.get('failures', 0) + bool(error),
+                         total_rows=stats.get('total_rows', 0) + rows)
+            return
+        values = {
+            'owner': None, 'expires_at': None, 'last_finished_at': finished_at, 'last_duration': duration,
+            'last_rows': rows, 'last_error': error, 'runs': JobLease.runs + 1,
+            'failures': JobLease.failures + (1 if error else 0), 'total_rows': JobLease.total_rows + rows,
+        }
+        if not error:
+            values['checkpoint'] = None  # A failed run keeps its checkpoint, so the next one resumes
+        try:
+            db.session.execute(
+                update(JobLease).where(JobLease.name == job.name, JobLease.owner == self.owner).values(**values)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception("Failed to record run of job %s", job.name)
+
+    def metrics(self):
+        # Per-job schedule and last-run metrics; leased jobs from job_lease, so runs on any process count
+        leases = {row.name: row for row in db.session.execute(select(JobLease)).scalars()}
+        result = []
+        for name, job in self.jobs.items():
+            if job.local:
+                stats = dict(self.local_stats.get(name, {}))
+            else:
+                lease = leases.get(name)
+                stats = {column: getattr(lease, column) for column in (
+                    'owner', 'expires_at', 'checkpoint', 'last_started_at', 'last_finished_at', 'last_duration',
+                    'last_rows', 'last_error', 'runs', 'failures', 'total_rows',
+                )} if lease else {}
+            last_started_at = stats.get('last_started_at')
+            stats.update(
+                name=name, schedule=str(job.schedule), chunk_size=job.chunk_size, local=job.local,
+                running=bool(stats.get('owner')) if not job.local else name in self.running,
+                next_run_at=job.schedule.next_after(last_started_at) if last_started_at else None,
+            )
+            result.append(stats)
+        return result
+
+
+scheduler = Scheduler()
+
+
+@click.command('run-jobs')
+@with_appcontext
+def run_jobs_command():
+    """Run the maintenance job scheduler in the foreground."""
+    app = current_app._get_current_object()
+    scheduler.start(app)
+    click.echo(f"Running {len(scheduler.jobs)} jobs as {scheduler.owner}")
+    scheduler.thread.join()
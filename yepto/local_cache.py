@@ -0,0 +1,47 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class LocalCache:
+    # Per-process cache of per-user values. Every worker keeps its own copy,
+    # so entries expire after ttl seconds for other workers' writes to show
+    # up; a write in this worker invalidates at once. invalidate() leaves a
+    # marker, so a read that started before it can't store what it fetched.
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()  # key -> (stored at, value or None after an invalidate)
+        self.lock = Lock()
+
+    def get(self, key):
+        # Returns (value or None, token for put)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[1] is not None and now - entry[0] < self.ttl:
+            return entry[1], now
+        return None, now
+
+    def put(self, key, value, token):
+        # Stores a value read after get() returned token, unless key was invalidated or stored since
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] >= token:
+                return
+            self._set(key, value)
+
+    def invalidate(self, key):
+        with self.lock:
+            self._set(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def _set(self, key, value):
+        self.entries[key] = (time.monotonic(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)  # Least recently written first
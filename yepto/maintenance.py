@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, insert, update, delete, exists
+from .config import Config
+from .guest_cart import GUEST_CART_MAX_AGE
+from .inventory import lock_stock, lock_cart_lines, restore_stock
+from .jobs import scheduler
+from .models import db, Order, OrderStatus, Cart, CartItem, User, AdminStat, ConsumedGuestCart, RevokedToken
+from .recommendations import build_recommendations
+
+# Maintenance work that grows with the data, run by the job scheduler instead
+# of request handlers. Chunked jobs take (checkpoint, limit), write one chunk
+# without committing and return (rows, next checkpoint); the scheduler commits
+# each chunk with its checkpoint.
+
+
+def _setting(key):
+    return current_app.config.get(key, getattr(Config, key))
+
+
+def _next_checkpoint(ids, limit):
+    return ids[-1] if len(ids) == limit else None
+
+
+@scheduler.job('expire_return_window', '15 3 * * *', chunk_size=1000)
+def expire_return_window(checkpoint, limit):
+    # Closes the return window of orders past it, so returns are refused by status
+    cutoff = datetime.utcnow() - timedelta(days=_setting('RETURN_WINDOW_DAYS'))
+    ids = db.session.execute(
+        select(Order.id)
+        .where(Order.id > (checkpoint or 0), Order.return_status == 'not_returned', Order.created_at < cutoff)
+        .order_by(Order.id)
+        .limit(limit)
+    ).scalars().all()
+    if ids:
+        db.session.execute(update(Order).where(Order.id.in_(ids)).values(return_status='return_expired'))
+    return len(ids), _next_checkpoint(ids, limit)
+
+
+@scheduler.job('purge_stale_carts', '45 3 * * *', chunk_size=1000)
+def purge_stale_carts(checkpoint, limit):
+    # Every account gets a cart at registration; most stay empty forever
+    cutoff = datetime.utcnow() - timedelta(days=_setting('STALE_CART_DAYS'))
+    empty = ~exists().where(CartItem.cart_id == Cart.id)
+    ids = db.session.execute(
+        select(Cart.id)
+        .join(User, User.id == Cart.user_id)
+        .where(Cart.id > (checkpoint or 0), Cart.discount_id.is_(None), User.created_at < cutoff, empty)
+        .order_by(Cart.id)
+        .limit(limit)
+    ).scalars().all()
+    if ids:
+        # Re-checked in the DELETE in case an item was added since the select
+        db.session.execute(delete(Cart).where(Cart.id.in_(ids), empty))
+    return len(ids), _next_checkpoint(ids, limit)
+
+
+@scheduler.job('purge_consumed_guest_carts', '50 3 * * *')
+def purge_consumed_guest_carts():
+    # A consumed guest cart's tokens expire GUEST_CART_MAX_AGE after their last edit at the latest
+    cutoff = datetime.utcnow() - timedelta(seconds=GUEST_CART_MAX_AGE)
+    return db.session.execute(delete(ConsumedGuestCart).where(ConsumedGuestCart.consumed_at < cutoff)).rowcount
+
+
+@scheduler.job('release_abandoned_stock', 900, chunk_size=500)
+def release_abandoned_stock(checkpoint, limit):
+    # Adding to a cart reserves stock; lines left untouched past the hold give it back.
+    # Candidates are re-read under lock after their stock rows, like checkout
+    # does; lines a checkout holds are skipped, and lines checked out or
+    # refreshed since the first read are left alone.
+    cutoff = datetime.utcnow() - timedelta(hours=_setting('CART_HOLD_HOURS'))
+    candidates = db.session.execute(
+        select(CartItem)
+        .where(CartItem.id > (checkpoint or 0), CartItem.added_at < cutoff)
+        .order_by(CartItem.id)
+        .limit(limit)
+    ).scalars().all()
+    lock_stock(candidates)
+    items = [item for item in lock_cart_lines((item.id for item in candidates), skip_locked=True)
+             if item.added_at < cutoff]
+    restore_stock(items)  # Through the ORM, so the stock watcher sees the restocks
+    for item in items:
+        db.session.delete(item)
+    return len(items), _next_checkpoint([item.id for item in candidates], limit)
+
+
+@scheduler.job('rebuild_recommendations', '30 4 * * *')
+def rebuild_recommendations():
+    # Orders only ever add to the co-purchase counts; the full rebuild drops cancelled and returned ones
+    return build_recommendations()
+
+
+ADMIN_COUNTS = {
+    'total_orders': lambda: Order.query.count(),
+    'total_users': lambda: User.query.count(),
+    'total_sales': lambda: int(db.session.query(db.func.sum(Order.total))  # Cents; an exact integer SUM
+        .filter(Order.status == OrderStatus.COMPLETED).scalar() or 0),
+}
+
+
+@scheduler.job('admin_counts', 300)
+def recompute_admin_counts():
+    now = datetime.utcnow()
+    rows = [{'name': name, 'value': compute(), 'computed_at': now} for name, compute in ADMIN_COUNTS.items()]
+    db.session.execute(delete(AdminStat).where(AdminStat.name.in_(ADMIN_COUNTS)))
+    db.session.execute(insert(AdminStat), rows)
+    return len(rows)
+
+
+def admin_count(name):
+    # The precomputed value while it is fresh, a live count otherwise
+    stat = db.session.get(AdminStat, name)
+    max_age = timedelta(seconds=_setting('ADMIN_STATS_MAX_AGE_SECONDS'))
+    if stat and stat.computed_at > datetime.utcnow() - max_age:
+        return stat.value
+    return ADMIN_COUNTS[name]()
+
+
+@scheduler.job('prune_revoked_tokens', '0 * * * *')
+def prune_revoked_tokens():
+    # An expired token is refused anyway, so its revocation can go
+    return db.session.execute(
+        delete(RevokedToken).where(RevokedToken.expires_at < datetime.utcnow())
+    ).rowcount
@@ -29,7 +29,7 @@ class Product(db.Model):  # Product model for managing products
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text, nullable=True)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Integer, nullable=False)  # In cents, see yepto.pricing
     stock = db.Column(db.Integer, nullable=False)
     variants = db.relationship('ProductVariant', backref='product', lazy=True)
     reviews = db.relationship('Review', backref='product', lazy=True)
@@ -41,14 +41,15 @@ class Product(db.Model):  # Product model for managing products
     image_url = db.Column(db.String(500), nullable=True) 
     category = db.relationship('Category', backref=db.backref('products', lazy=True))
 
-# class ProductVariant(db.Model):
-#     __tablename__ = 'product_variant'
-#     id = db.Column(db.Integer, primary_key=True)
-#     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
-#     variant_type = db.Column(db.String(50), nullable=False)  # e.g., 'color', 'size'
-#     variant_value = db.Column(db.String(50), nullable=False)  # e.g., 'red', 'XL'
-#     price_modifier = db.Column(db.Float, default=0.0)
-#     stock = db.Column(db.Integer, nullable=False)
+class ProductVariant(db.Model):  # ProductVariant model for sizes, colors, etc. with their own stock
+
+    __tablename__ = 'product_variant'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
+    variant_type = db.Column(db.String(50), nullable=False)  # e.g., 'color', 'size'
+    variant_value = db.Column(db.String(50), nullable=False)  # e.g., 'red', 'XL'
+    price_modifier = db.Column(db.Integer, default=0)  # Cents added to Product.price
+    stock = db.Column(db.Integer, nullable=False)
 
 class Category(db.Model):  # Category model for managing product categories
 
@@ -58,6 +59,9 @@ class Category(db.Model):  # Category model for managing product categories
 class Wishlist(db.Model):  # Wishlist model for managing user wishlists
 
     __tablename__ = 'wishlist'
+    __table_args__ = (
+        db.Index('ix_wishlist_user_product', 'user_id', 'product_id', unique=True),  # Covers membership lookups
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
@@ -79,7 +83,7 @@ class Discount(db.Model):  # Discount model for managing discount codes
     id = db.Column(db.Integer, primary_key=True)
     code = db.Column(db.String(50), unique=True, nullable=False)
     discount_type = db.Column(db.String(20), nullable=False)  # 'percentage' or 'fixed'
-    value = db.Column(db.Float, nullable=False)
+    value = db.Column(db.Integer, nullable=False)  # Basis points if percentage, cents if fixed
     valid_from = db.Column(db.DateTime, nullable=False)
     valid_to = db.Column(db.DateTime, nullable=False)
     max_uses = db.Column(db.Integer, nullable=True)
@@ -99,7 +103,10 @@ class CartItem(db.Model):  # CartItem model for managing items in the cart
     id = db.Column(db.Integer, primary_key=True)
     cart_id = db.Column(db.Integer, db.ForeignKey('cart.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    variant_id = db.Column(db.Integer, db.ForeignKey('product_variant.id'), nullable=True)
     quantity = db.Column(db.Integer, nullable=False, default=1)
+    added_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Stock is held from here; released when abandoned
+    variant = db.relationship('ProductVariant')
 
 class OrderStatus(Enum):
     PENDING = 'pending'
@@ -108,9 +115,15 @@ class OrderStatus(Enum):
 
 class Order(db.Model):  # Order model for managing user orders
 
+    __table_args__ = (
+        # Order history pages: seek on (user_id, created_at, id), list columns included where supported
+        db.Index('ix_order_user_created', 'user_id', 'created_at', 'id', postgresql_include=['total', 'status']),
+        # Sales rollups: SUM(total) per status straight from the index
+        db.Index('ix_order_status_total', 'status', 'total'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    total = db.Column(db.Float, nullable=False)
+    total = db.Column(db.BigInteger, nullable=False)  # In cents
     status = db.Column(db.Enum(OrderStatus), default=OrderStatus.PENDING) 
     return_status = db.Column(db.String(20), default='not_returned') # New field for return status
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -122,15 +135,16 @@ class OrderItem(db.Model):  # OrderItem model for managing items in an order
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    variant_id = db.Column(db.Integer, db.ForeignKey('product_variant.id'), nullable=True)
     quantity = db.Column(db.Integer, nullable=False)
-    price = db.Column(db.Float, nullable=False)  # Price at time of purchase
+    price = db.Column(db.Integer, nullable=False)  # Unit price in cents at time of purchase
 
 class Payment(db.Model):  # Payment model for managing payments
 
     __tablename__ = 'payment'
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False)  # In cents
     payment_method = db.Column(db.String(50), nullable=False)
     status = db.Column(db.String(20), nullable=False)
     transaction_id = db.Column(db.String(100), nullable=True)
@@ -143,11 +157,96 @@ class Analytics(db.Model):  # Analytics model for tracking user interactions
     event_type = db.Column(db.String(50), nullable=False)  # e.g., 'product_view', 'purchase'
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 class AuditLog(db.Model):  # AuditLog model for tracking admin actions
 
+    __table_args__ = (
+        db.Index('ix_audit_log_admin_timestamp', 'admin_id', 'timestamp', 'id'),  # One admin's entries by time
+    )
     id = db.Column(db.Integer, primary_key=True)
     admin_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     action = db.Column(db.String(100))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    target_type = db.Column(db.String(50), nullable=True)  # e.g. 'order', 'user'
+    target_id = db.Column(db.Integer, nullable=True)
+    payload = db.Column(db.JSON, nullable=True)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class CatalogVersion(db.Model):  # Single row counting committed catalog changes, shared by every worker
+
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+class ProductCooccurrence(db.Model):  # Co-purchase counts, one row per ordered pair of products
+
+    __tablename__ = 'product_cooccurrence'
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    other_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class ProductRecommendation(db.Model):  # Top-K "frequently bought together" products per product
+
+    __tablename__ = 'product_recommendation'
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    rank = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    related_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    score = db.Column(db.Integer, nullable=False)  # Number of orders containing both products
+
+class TrendingCheckpoint(db.Model):  # Saved trending tracker state, so restarts only replay recent events
+
+    __tablename__ = 'trending_checkpoint'
+    id = db.Column(db.Integer, primary_key=True)
+    last_event_id = db.Column(db.Integer, nullable=False)  # Last analytics.id folded into the state
+    state = db.Column(db.LargeBinary(length=16777215), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class LowStock(db.Model):  # Products and variants currently at or below the low-stock threshold
+
+    __tablename__ = 'low_stock'
+    __table_args__ = (
+        db.Index('ix_low_stock_level_since', 'level', 'since'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
+    variant_id = db.Column(db.Integer, db.ForeignKey('product_variant.id'), nullable=True, index=True)  # NULL for product stock
+    level = db.Column(db.String(10), nullable=False)  # 'low' or 'out'
+    since = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# One row per product or variant; COALESCE because unique indexes let NULL variant_ids repeat
+db.Index('ix_low_stock_item', LowStock.product_id, db.func.coalesce(LowStock.variant_id, 0), unique=True)
+
+class JobLease(db.Model):  # One row per scheduled job: who runs it, its checkpoint and its last run's metrics
+
+    __tablename__ = 'job_lease'
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(200), nullable=True)  # host:pid:nonce of the process running it
+    expires_at = db.Column(db.DateTime, nullable=True)
+    checkpoint = db.Column(db.JSON, nullable=True)  # Where an unfinished chunked run resumes
+    last_started_at = db.Column(db.DateTime, nullable=True)
+    last_finished_at = db.Column(db.DateTime, nullable=True)
+    last_duration = db.Column(db.Float, nullable=True)  # Seconds
+    last_rows = db.Column(db.Integer, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    runs = db.Column(db.Integer, nullable=False, default=0)
+    failures = db.Column(db.Integer, nullable=False, default=0)
+    total_rows = db.Column(db.BigInteger, nullable=False, default=0)
+
+class AdminStat(db.Model):  # Dashboard counts precomputed by the admin_counts job
+
+    __tablename__ = 'admin_stat'
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False)  # Counts, or cents for total_sales
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ConsumedGuestCart(db.Model):  # Guest cart tokens already merged into an account, so they can't be merged twice
+
+    __tablename__ = 'consumed_guest_cart'
+    id = db.Column(db.String(32), primary_key=True)  # The cart id carried in the token
+    consumed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class RevokedToken(db.Model):  # Logged-out tokens, shared by every WSGI and ASGI process until they expire
+
+    __tablename__ = 'revoked_token'
+    jti = db.Column(db.String(36), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)  # NULL for tokens that never expire
@@ -0,0 +1,91 @@
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from datetime import datetime
+from flask import Flask, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import tuple_
+from .http_cache import HttpCache
+from .local_cache import LocalCache
+from .models import Order
+from .serializers import OrderSchema, json_response, order_rows
+
+app = Flask(__name__)
+HttpCache(app)
+
+ORDER_HISTORY_PAGE_SIZE = 20
+ORDER_HISTORY_MAX_PAGE_SIZE = 100
+ORDER_HISTORY_CACHE_SIZE = 10000  # Max users whose first page is kept in memory
+ORDER_HISTORY_CACHE_TTL = 5  # Seconds another worker's order change may go unseen here
+
+# user_id -> first page response, dropped whenever one of that user's orders changes
+first_page_cache = LocalCache(ORDER_HISTORY_CACHE_TTL, ORDER_HISTORY_CACHE_SIZE)
+
+
+def invalidate_order_history(user_id):
+    first_page_cache.invalidate(user_id)
+
+
+def encode_cursor(order):
+    return urlsafe_b64encode(f"{order['created_at'].isoformat()}|{order['id']}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    # Raises ValueError on anything encode_cursor didn't produce
+    try:
+        created_at, order_id = urlsafe_b64decode(cursor.encode()).decode().split('|')
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    return datetime.fromisoformat(created_at), int(order_id)
+
+
+def history_select(user_id, limit, cursor=None):
+    # Newest first, seeking past the cursor on ix_order_user_created instead of OFFSET.
+    # One extra row tells whether there is a next page.
+    stmt = (
+        OrderSchema.select()
+        .where(Order.user_id == user_id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        stmt = stmt.where(tuple_(Order.created_at, Order.id) < cursor)
+    return stmt
+
+
+def history_page(orders, limit):
+    next_cursor = encode_cursor(orders[limit - 1]) if len(orders) > limit else None
+    return {'orders': orders[:limit], 'next_cursor': next_cursor}
+
+
+@app.route('/orders', methods=['GET'])
+@jwt_required()
+def get_orders():
+    user_id = get_jwt_identity()
+    try:
+        limit = min(int(request.args.get('limit', ORDER_HISTORY_PAGE_SIZE)), ORDER_HISTORY_MAX_PAGE_SIZE)
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    if limit < 1:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    first_page = cursor is None and limit == ORDER_HISTORY_PAGE_SIZE
+    if first_page:
+        page, token = first_page_cache.get(user_id)
+        if page is not None:
+            return json_response(page)
+
+    page = history_page(order_rows(history_select(user_id, limit, cursor)), limit)
+
+    if first_page:
+        first_page_cache.put(user_id, page, token)
+    return json_response(page)
+
+
+@app.route('/orders/<int:order_id>', methods=['GET'])
+@jwt_required()
+def get_order(order_id):
+    user_id = get_jwt_identity()
+    orders = order_rows(OrderSchema.select().where(Order.id == order_id, Order.user_id == user_id))
+    if not orders:
+        return jsonify({"error": "Order not found"}), 404
+    return json_response(orders[0])
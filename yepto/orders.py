@@ -1,10 +1,18 @@
-from flask import Flask,Blueprint, request, jsonify
+from flask import Flask,Blueprint, current_app, request, jsonify
 from sqlalchemy import select
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from .models import db, Order, OrderItem, Cart, CartItem, Product, Payment
-from datetime import datetime
+from .models import db, Order, OrderItem, Cart, CartItem, Product, Payment, OrderStatus
+from .config import Config
+from .inventory import lock_stock, lock_cart_lines, restore_stock
+from .order_history import invalidate_order_history
+from .pricing import cart_totals, lock_cart_discount, redeem, to_cents
+from .rate_limit import limiter
+from .recommendations import record_completed_order
+from .trending import record_events
+from datetime import datetime, timedelta
 
 app = Flask(__name__)
+limiter.init_app(app)
 
 @app.route('/api/orders/<int:order_id>/return', methods=['POST'])
 @jwt_required()
@@ -15,22 +23,25 @@ def return_order(order_id):
     if not order:
         return jsonify({"error": "Order not found"}), 404
     
-    if order.return_status is not None:
-        return jsonify({"error": "Order already returned"}), 400
-    
-    # Check if the order is eligible for return (e.g., within 30 days)
-    if (datetime.utcnow() - order.created_at).days > 30:
+    # expire_return_window marks orders past the window 'return_expired'; the
+    # date check covers orders it hasn't reached yet
+    window = timedelta(days=current_app.config.get('RETURN_WINDOW_DAYS', Config.RETURN_WINDOW_DAYS))
+    if order.return_status == 'return_expired' or order.created_at < datetime.utcnow() - window:
         return jsonify({"error": "Order return period has expired"}), 400
+
+    if order.return_status != 'not_returned':
+        return jsonify({"error": "Order already returned"}), 400
+
+    if order.status == OrderStatus.CANCELLED:
+        return jsonify({"error": "Cancelled orders cannot be returned"}), 400
     
     # Restore stock
-    for item in order.items:
-        product = Product.query.get(item.product_id)
-        if product:
-            product.stock += item.quantity
+    restore_stock(order.items)
     
     order.return_status = 'returned'
     
     db.session.commit()  # Commit the session after updating the order
+    invalidate_order_history(user_id)
     return jsonify({"message": "Order returned successfully"})
 
 
@@ -39,6 +50,7 @@ def return_order(order_id):
 
 @app.route("/checkout", methods=["POST"])
 @jwt_required()
+@limiter.limit('checkout', by=('user', 'ip'))
 def create_order():
     user_id = get_jwt_identity()
     user_cart = Cart.query.filter_by(user_id=user_id).first()
@@ -49,30 +61,44 @@ def create_order():
     try:
         db.session.begin_nested()  # Start nested transaction
 
-        total = 0
-        new_order = Order(user_id=user_id, status="pending_payment")
+        # Adding to the cart already took the stock, so the order just consumes
+        # those reservations. Stock rows are still locked first, in the order
+        # every writer uses, before the new order can be autoflushed
+        products, variants = lock_stock(user_cart.items)
+        items = lock_cart_lines(item.id for item in user_cart.items)
+        if not items:
+            db.session.rollback()
+            return jsonify({"error": "Cart is empty"}), 400
+        discount = lock_cart_discount(user_cart)
+
+        prices, quantities = [], []
+        new_order = Order(user_id=user_id, status=OrderStatus.PENDING)
         db.session.add(new_order)
 
-        for cart_item in user_cart.items:
-            product = db.session.execute(
-                select(Product).where(Product.id == cart_item.product_id).with_for_update()
-            ).scalar_one()
-
-            if product.stock < cart_item.quantity:
+        for cart_item in items:
+            product = products.get(cart_item.product_id)
+            variant = variants.get(cart_item.variant_id) if cart_item.variant_id else None
+            if not product or (cart_item.variant_id and not variant):
+                # Removed since it was added; never fall back to another row's stock
                 db.session.rollback()
-                return jsonify({"error": f"Insufficient stock for {product.name}"}), 400
+                return jsonify({"error": "An item in your cart is no longer available"}), 409
 
-            total += cart_item.quantity * product.price
+            price = product.price + ((variant.price_modifier or 0) if variant else 0)
+            prices.append(price)
+            quantities.append(cart_item.quantity)
             new_order.items.append(OrderItem(
                 product_id=product.id,
+                variant_id=cart_item.variant_id,
                 quantity=cart_item.quantity,
-                price=product.price
+                price=price
             ))
-            product.stock -= cart_item.quantity
 
-        new_order.total = total
-        CartItem.query.filter_by(cart_id=user_cart.id).delete()
+        totals = cart_totals(prices, quantities, discount)  # Exact, in cents
+        new_order.total = totals['total']
+        redeem(user_cart, discount, totals)
+        CartItem.query.filter(CartItem.id.in_([item.id for item in items])).delete()  # Not lines added since
         db.session.commit()
+        invalidate_order_history(user_id)
         return jsonify({"message": "Order created", "order_id": new_order.id}), 201
 
     except Exception as e:
@@ -95,11 +121,11 @@ def process_payment():
         if order.user_id != get_jwt_identity():
             return jsonify({"error": "Unauthorized access"}), 403
 
-        if order.status.value != "pending_payment":
+        if order.status != OrderStatus.PENDING:
             return jsonify({"error": "Payment already processed"}), 400
 
         if data['payment_method'] == 'card':
-            order.status = "completed"
+            order.status = OrderStatus.COMPLETED
             new_payment = Payment(
                 order_id=order.id,
                 amount=order.total,
@@ -107,7 +133,10 @@ def process_payment():
                 status="completed"
             )
             db.session.add(new_payment)
+            record_events('purchase', [item.product_id for item in order.items], order.user_id)
             db.session.commit()
+            invalidate_order_history(order.user_id)
+            record_completed_order(order.id)
             return jsonify({"message": "Payment successful"}), 200
 
         return jsonify({"error": "Unsupported payment method"}), 400
@@ -123,19 +152,28 @@ def process_payment():
 def initialize_payment():
     user_id = get_jwt_identity()
     data = request.get_json()
-    if not all(key in data for key in ['card_number', 'expiry', 'cvv', 'amount']):
+    if not data or not all(key in data for key in ['card_number', 'expiry', 'cvv', 'amount', 'payment_method']):
         return jsonify({"error": "Invalid payment details"}), 400
+    try:
+        amount = to_cents(data['amount'])
+    except ValueError:
+        return jsonify({"error": "Invalid amount"}), 400
+    if amount is None or amount <= 0:
+        return jsonify({"error": "Invalid amount"}), 400
     new_order = Order(
         user_id=user_id,
-        total_amount=data['amount'],
-        status='pending'
+        total=amount,
+        status=OrderStatus.PENDING
     )
+    db.session.add(new_order)
+    db.session.flush()  # Assigns new_order.id for the payment
     new_payment = Payment(
-        order=new_order,
-        amount=data['amount'],
+        order_id=new_order.id,
+        amount=amount,
         payment_method=data['payment_method'],
         status='completed'
     )
-    db.session.add_all([new_order, new_payment])
+    db.session.add(new_payment)
     db.session.commit()  # Commit the session after adding the order and payment
+    invalidate_order_history(user_id)
     return jsonify({"message": "Payment processed successfully"}), 201
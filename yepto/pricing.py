@@ -0,0 +1,115 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import numpy as np
+from sqlalchemy import select, and_, or_
+from .models import db, Discount, Cart, CartItem, Product, ProductVariant
+
+# Money is stored and added up as integer minor units (cents): Product.price,
+# ProductVariant.price_modifier, OrderItem.price, Order.total, Payment.amount
+# and fixed Discount.value. Percentage discounts are in basis points, so 10%
+# is 1000. Amounts become decimals only at the edges: to_cents on input,
+# from_cents in JSON. Totals are computed over arrays of (price, quantity)
+# with int64 arithmetic, so they are exact and independent of summing order.
+
+CENTS = 100
+BASIS_POINTS = 10000
+
+
+def to_cents(amount):
+    # 19.99, '19.99' or Decimal('19.99') -> 1999, rounding half up; ValueError if not a finite amount
+    if amount is None:
+        return None
+    try:
+        return int((Decimal(str(amount).strip()) * CENTS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, OverflowError):
+        raise ValueError(f"Invalid amount {amount!r}")
+
+
+def from_cents(cents):
+    # The float nearest the exact decimal amount, which JSON-encodes as e.g. 19.99
+    if cents is None:
+        return None
+    return cents / CENTS
+
+
+def line_totals(prices, quantities):
+    return np.asarray(prices, dtype=np.int64) * np.asarray(quantities, dtype=np.int64)
+
+
+def discount_amount(subtotal, discount_type, value):
+    if not discount_type or not value:
+        return 0
+    if discount_type == 'percentage':
+        amount = (subtotal * value + BASIS_POINTS // 2) // BASIS_POINTS
+    elif discount_type == 'fixed':
+        amount = value
+    else:
+        return 0
+    return min(amount, subtotal)
+
+
+def cart_totals(prices, quantities, discount=None):
+    # Subtotal, discount and total in cents for one cart or order; discount is
+    # a Discount or a (discount_type, value) pair
+    subtotal = int(line_totals(prices, quantities).sum())
+    if isinstance(discount, Discount):
+        discount = (discount.discount_type, discount.value)
+    discount = discount_amount(subtotal, *discount) if discount else 0
+    return {'subtotal': subtotal, 'discount': discount, 'total': subtotal - discount}
+
+
+def order_totals(order_ids, prices, quantities):
+    # Totals of many orders at once from their item rows: order id -> cents
+    keys, index = np.unique(np.asarray(order_ids, dtype=np.int64), return_inverse=True)
+    totals = np.zeros(len(keys), dtype=np.int64)
+    np.add.at(totals, index, line_totals(prices, quantities))
+    return dict(zip(keys.tolist(), totals.tolist()))
+
+
+def discount_usable(now=None):
+    # SQL condition for a discount that is in its validity window and has uses left
+    now = now or datetime.utcnow()
+    return and_(
+        Discount.valid_from <= now, Discount.valid_to >= now,
+        or_(Discount.max_uses.is_(None), db.func.coalesce(Discount.used_count, 0) < Discount.max_uses),
+    )
+
+
+def cart_price_select(user_id, now=None):
+    # (unit price, quantity, discount type, discount value) per line of a user's
+    # cart; the discount columns are NULL unless the cart's discount is usable
+    return (
+        select(Product.price + db.func.coalesce(ProductVariant.price_modifier, 0), CartItem.quantity,
+               Discount.discount_type, Discount.value)
+        .select_from(CartItem)
+        .join(Cart, Cart.id == CartItem.cart_id)
+        .join(Product, Product.id == CartItem.product_id)
+        .outerjoin(ProductVariant, ProductVariant.id == CartItem.variant_id)
+        .outerjoin(Discount, and_(Discount.id == Cart.discount_id, discount_usable(now)))
+        .where(Cart.user_id == user_id)
+    )
+
+
+def cart_summary(rows):
+    # JSON body of the cart summary endpoints from cart_price_select rows
+    rows = list(rows)
+    discount = (rows[0][2], rows[0][3]) if rows else None
+    totals = cart_totals([r[0] for r in rows], [r[1] for r in rows], discount)
+    return {'total_items': len(rows), 'discount': from_cents(totals['discount']),
+            'total_price': from_cents(totals['total'])}
+
+
+def lock_cart_discount(cart):
+    # The cart's discount if it can still be used, locked so concurrent checkouts can't overrun max_uses
+    if not cart.discount_id:
+        return None
+    return db.session.execute(
+        select(Discount).where(Discount.id == cart.discount_id, discount_usable()).with_for_update()
+    ).scalar_one_or_none()
+
+
+def redeem(cart, discount, totals):
+    # Counts a use of the discount an order was priced with; the cart's code is spent
+    if discount and totals['discount']:
+        discount.used_count = (discount.used_count or 0) + 1
+    cart.discount_id = None
@@ -0,0 +1,100 @@
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, insert, or_, func
+from werkzeug.security import generate_password_hash
+from .models import db, User, Cart
+
+PROVISION_BATCH_SIZE = 1000
+HASH_THREADS = 8  # hashlib's scrypt/pbkdf2 release the GIL, so hashing scales across threads
+UNUSABLE_PASSWORD = '!'  # Never matches a hash; provisioned users without a password must reset it
+
+
+def _password_hashes(passwords):
+    with ThreadPoolExecutor(HASH_THREADS) as pool:
+        return list(pool.map(lambda p: generate_password_hash(p) if p else UNUSABLE_PASSWORD, passwords))
+
+
+class ProvisioningError(Exception):  # A batch failed; the batches before it stay committed
+
+    def __init__(self, created, skipped):
+        super().__init__(f"Provisioning failed after {created} users")
+        self.created = created
+        self.skipped = skipped
+
+
+def _clashes(user, names):
+    # Compared lowercased, as MySQL's default collation does for the unique indexes
+    return user['email'].lower() in names or user['username'].lower() in names
+
+
+def provision_users(users, batch_size=PROVISION_BATCH_SIZE):
+    # Bulk signup for B2B onboarding. Each batch is one transaction: a lookup
+    # of taken emails and usernames, one multi-row INSERT of users, one id
+    # lookup, one multi-row INSERT of their carts. Returns (created, skipped
+    # emails). A failed batch raises ProvisioningError with the counts of the
+    # batches committed before it.
+    created, skipped, seen = 0, [], set()
+    for start in range(0, len(users), batch_size):
+        batch = []
+        for user in users[start:start + batch_size]:
+            email = user['email'].strip()
+            username = (user.get('username') or email)[:80]
+            user = {**user, 'email': email, 'username': username}
+            if _clashes(user, seen):
+                skipped.append(email)
+                continue
+            seen.update((email.lower(), username.lower()))
+            batch.append(user)
+        if not batch:
+            continue
+
+        # Both columns are unique, one clash would fail the whole multi-row insert
+        taken = set()
+        for email, username in db.session.execute(
+            select(User.email, User.username).where(or_(
+                func.lower(User.email).in_([u['email'].lower() for u in batch]),
+                func.lower(User.username).in_([u['username'].lower() for u in batch]),
+            ))
+        ):
+            taken.update((email.lower(), username.lower()))
+        skipped.extend(u['email'] for u in batch if _clashes(u, taken))
+        batch = [u for u in batch if not _clashes(u, taken)]
+        if not batch:
+            continue
+
+        now = datetime.utcnow()
+        hashes = _password_hashes([u.get('password') for u in batch])
+        try:
+            db.session.execute(insert(User), [
+                {'username': u['username'], 'email': u['email'], 'password': password,
+                 'is_admin': False, 'created_at': now}
+                for u, password in zip(batch, hashes)
+            ])
+            user_ids = db.session.execute(
+                select(User.id).where(User.email.in_([u['email'] for u in batch]))
+            ).scalars().all()
+            db.session.execute(insert(Cart), [{'user_id': user_id} for user_id in user_ids])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise ProvisioningError(created, skipped) from e
+        created += len(batch)
+    return created, skipped
+
+
+@click.command('provision-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=PROVISION_BATCH_SIZE, show_default=True)
+@with_appcontext
+def provision_users_command(path, batch_size):
+    """Create users and their carts from a CSV with email, username and optional password columns."""
+    with open(path, newline='') as f:
+        users = list(csv.DictReader(f))
+    try:
+        created, skipped = provision_users(users, batch_size)
+    except ProvisioningError as e:
+        raise click.ClickException(f"{e} ({len(e.skipped)} skipped): {e.__cause__}")
+    click.echo(f"Created {created} users, skipped {len(skipped)} existing or duplicate emails")
@@ -0,0 +1,145 @@
+import math
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from flask import request, current_app, jsonify
+from flask_jwt_extended import get_jwt_identity
+from .config import Config
+
+try:
+    import redis  # Optional, only needed for the shared backend
+except ImportError:
+    redis = None
+
+
+class MemoryBucketStore:  # In-process token buckets, for single-worker or per-worker limits
+
+    SHARDS = 64  # Lock striping, so unrelated keys never contend
+    SHARD_MAX_KEYS = 10000
+
+    def __init__(self):
+        # key -> (tokens, last update, time it is full again), least recently used first
+        self.shards = [(OrderedDict(), Lock()) for _ in range(self.SHARDS)]
+
+    def take(self, keys, capacity, rate):
+        # Takes a token from every bucket in keys, or from none of them when
+        # any is empty. Returns (allowed, seconds until they all have a token).
+        now = time.monotonic()
+        shards = sorted({hash(key) % self.SHARDS for key in keys})  # Locked in order, so never deadlocks
+        for i in shards:
+            self.shards[i][1].acquire()
+        try:
+            levels = []
+            for key in keys:
+                tokens, last, _ = self.shards[hash(key) % self.SHARDS][0].get(key, (capacity, now, now))
+                levels.append(min(capacity, tokens + (now - last) * rate))
+            allowed = all(tokens >= 1 for tokens in levels)
+            for key, tokens in zip(keys, levels):
+                tokens -= 1 if allowed else 0
+                self._store(self.shards[hash(key) % self.SHARDS][0], key, tokens, now, capacity, rate)
+        finally:
+            for i in reversed(shards):
+                self.shards[i][1].release()
+        return allowed, 0 if allowed else (1 - min(levels)) / rate
+
+    def _store(self, buckets, key, tokens, now, capacity, rate):
+        buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        buckets.move_to_end(key)
+        # Refilled buckets carry no state worth keeping; past the cap the least
+        # recently used goes anyway. Both only look at the front, so a burst of
+        # new keys costs O(1) each instead of a scan of the shard.
+        while len(buckets) > 1:
+            oldest = next(iter(buckets))
+            if buckets[oldest][2] > now and len(buckets) <= self.SHARD_MAX_KEYS:
+                break
+            del buckets[oldest]
+
+
+class RedisBucketStore:  # Token buckets shared by every worker through Redis
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local levels = {}
+    local allowed = 1
+    local lowest = capacity
+    for i, key in ipairs(KEYS) do
+        local state = redis.call('HMGET', key, 'tokens', 'ts')
+        local tokens = tonumber(state[1]) or capacity
+        local last = tonumber(state[2]) or now
+        levels[i] = math.min(capacity, tokens + (now - last) * rate)
+        lowest = math.min(lowest, levels[i])
+        if levels[i] < 1 then
+            allowed = 0
+        end
+    end
+    for i, key in ipairs(KEYS) do
+        redis.call('HSET', key, 'tokens', tostring(levels[i] - allowed), 'ts', tostring(now))
+        redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000))
+    end
+    return {allowed, tostring(lowest)}
+    """
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_STORAGE_URL needs the redis package installed")
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def take(self, keys, capacity, rate):
+        allowed, lowest = self.script(keys=[f'ratelimit:{key}' for key in keys], args=[capacity, rate])
+        if allowed:
+            return True, 0
+        return False, (1 - float(lowest)) / rate
+
+
+class RateLimiter:
+
+    def __init__(self, app=None):
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMITS', Config.RATE_LIMITS)
+        app.config.setdefault('RATE_LIMIT_STORAGE_URL', Config.RATE_LIMIT_STORAGE_URL)
+        if self.store is None:
+            url = app.config['RATE_LIMIT_STORAGE_URL']
+            self.store = RedisBucketStore(url) if url else MemoryBucketStore()
+
+    def limit(self, name, by=('ip',)):
+        # Checked before the view body, so rejected requests never reach the
+        # database or password hashing. Use below @jwt_required() to key by user.
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                limits = current_app.config.get('RATE_LIMITS', Config.RATE_LIMITS)
+                if name not in limits:
+                    return fn(*args, **kwargs)
+                if self.store is None:
+                    self.init_app(current_app)
+
+                requests, per = limits[name]
+                keys = []
+                for key_type in by:
+                    ident = request.remote_addr if key_type == 'ip' else get_jwt_identity()
+                    if ident is not None:
+                        keys.append(f'{name}:{key_type}:{ident}')
+                if not keys:
+                    return fn(*args, **kwargs)
+
+                # All buckets at once, so a request rejected by one doesn't spend another's token
+                allowed, retry_after = self.store.take(keys, requests, requests / per)
+                if not allowed:
+                    response = jsonify({"error": "Too many requests"})
+                    response.headers['Retry-After'] = str(math.ceil(retry_after))
+                    return response, 429
+                return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+limiter = RateLimiter()
@@ -0,0 +1,144 @@
+import numpy as np
+from flask import Flask, current_app
+from scipy import sparse
+from sqlalchemy import select, delete, insert, or_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from .models import db, Order, OrderItem, OrderStatus, Product, ProductCooccurrence, ProductRecommendation
+from .pricing import from_cents
+from .serializers import Schema, json_response
+
+app = Flask(__name__)
+
+TOP_K = 10  # Related products kept per product
+INSERT_CHUNK = 5000
+
+RelatedSchema = Schema(
+    id=Product.id,
+    name=Product.name,
+    price=(Product.price, from_cents),
+    image_url=Product.image_url,
+    score=ProductRecommendation.score,
+)
+
+
+def top_k(rows, cols, counts, k=TOP_K):
+    # Keeps the k highest counts per row of a sparse (row, col, count) triple
+    # list using sorts instead of a Python loop per product.
+    if not len(rows):
+        return rows, rows, cols, counts
+    order = np.lexsort((cols, -counts, rows))  # Row, then count desc, then id for stable ties
+    rows, cols, counts = rows[order], cols[order], counts[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+    keep = rank < k
+    return rows[keep], rank[keep], cols[keep], counts[keep]
+
+
+def _insert_chunked(model, rows):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(insert(model), rows[start:start + INSERT_CHUNK])
+
+
+def _write_recommendations(product_ids, rows, ranks, cols, counts):
+    db.session.execute(delete(ProductRecommendation).where(ProductRecommendation.product_id.in_(product_ids)))
+    _insert_chunked(ProductRecommendation, [
+        {'product_id': int(p), 'rank': int(r), 'related_id': int(c), 'score': int(n)}
+        for p, r, c, n in zip(rows, ranks, cols, counts)
+    ])
+
+
+def _increment_counts(pairs):
+    table = ProductCooccurrence.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted['count'])
+    else:
+        stmt = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['product_id', 'other_id'], set_={'count': table.c.count + stmt.excluded['count']}
+        )
+    db.session.execute(stmt, [{'product_id': int(a), 'other_id': int(b), 'count': 1} for a, b in pairs])
+
+
+def build_recommendations(k=TOP_K):
+    # Full rebuild from every completed order not returned: an order x product
+    # incidence matrix X, co-occurrence C = X^T X with the diagonal dropped,
+    # then top-k per row. Run nightly by the rebuild_recommendations job, which
+    # also takes out the pairs of orders cancelled or returned since.
+    items = db.session.execute(
+        select(OrderItem.order_id, OrderItem.product_id)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status == OrderStatus.COMPLETED,
+               or_(Order.return_status.is_(None), Order.return_status != 'returned'))
+    ).all()
+
+    db.session.execute(delete(ProductRecommendation))
+    db.session.execute(delete(ProductCooccurrence))
+    if not items:
+        db.session.commit()
+        return 0
+
+    pairs = np.unique(np.array(items, dtype=np.int64), axis=0)  # One entry per product per order
+    order_ids, order_idx = np.unique(pairs[:, 0], return_inverse=True)
+    product_ids, product_idx = np.unique(pairs[:, 1], return_inverse=True)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.int32), (order_idx, product_idx)),
+        shape=(len(order_ids), len(product_ids)),
+    )
+    cooccurrence = (incidence.T @ incidence).tocoo()
+    off_diagonal = cooccurrence.row != cooccurrence.col
+    rows = product_ids[cooccurrence.row[off_diagonal]]
+    cols = product_ids[cooccurrence.col[off_diagonal]]
+    counts = cooccurrence.data[off_diagonal]
+
+    _insert_chunked(ProductCooccurrence, [
+        {'product_id': int(p), 'other_id': int(o), 'count': int(n)} for p, o, n in zip(rows, cols, counts)
+    ])
+    _write_recommendations(product_ids.tolist(), *top_k(rows, cols, counts, k))
+    db.session.commit()
+    return len(product_ids)
+
+
+def refresh_recommendations(product_ids, k=TOP_K):
+    # Recomputes top-k for just these products from their stored counts
+    counts = db.session.execute(
+        select(ProductCooccurrence.product_id, ProductCooccurrence.other_id, ProductCooccurrence.count)
+        .where(ProductCooccurrence.product_id.in_(product_ids))
+    ).all()
+    counts = np.array(counts, dtype=np.int64).reshape(-1, 3)
+    _write_recommendations(product_ids, *top_k(counts[:, 0], counts[:, 1], counts[:, 2], k))
+
+
+def record_completed_order(order_id):
+    # Adds one order's product pairs to the counts and refreshes only the
+    # products it touched. Counts only grow here; failures, cancels and
+    # returns are repaired by the next full build.
+    try:
+        product_ids = np.unique(np.fromiter(db.session.execute(
+            select(OrderItem.product_id).where(OrderItem.order_id == order_id)
+        ).scalars(), dtype=np.int64))
+        if len(product_ids) < 2:
+            return
+
+        a, b = np.meshgrid(product_ids, product_ids)
+        mask = a != b
+        _increment_counts(zip(a[mask], b[mask]))
+        refresh_recommendations(product_ids.tolist())
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Failed to update recommendations for order %s", order_id)
+
+
+@app.route('/products/<int:product_id>/related', methods=['GET'])
+def get_related_products(product_id):
+    # One read on the (product_id, rank) primary key
+    related = RelatedSchema.all(
+        RelatedSchema.select()
+        .select_from(ProductRecommendation)
+        .join(Product, Product.id == ProductRecommendation.related_id)
+        .where(ProductRecommendation.product_id == product_id)
+        .order_by(ProductRecommendation.rank)
+    )
+    return json_response({'product_id': product_id, 'related': related})
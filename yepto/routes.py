@@ -1,29 +1,50 @@
-from flask import Flask, Blueprint, jsonify, request, redirect, url_for
+from flask import Flask, Blueprint, current_app, jsonify, request, redirect, url_for
 from flask_cors import CORS
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import select
-from datetime import datetime
-from .models import db, Product, Category, Cart, CartItem, Order, Payment, OrderItem, User, OrderStatus
+from datetime import datetime, timedelta
+from .models import db, Product, ProductVariant, Category, Cart, CartItem, Order, Payment, OrderItem, User, OrderStatus
+from .facets import parse_filters, search_catalog
+from .config import Config
+from .inventory import lock_stock, lock_cart_lines, restore_stock
+from .order_history import invalidate_order_history
+from .pricing import cart_price_select, cart_summary, cart_totals, from_cents, lock_cart_discount, redeem
+from .http_cache import HttpCache, catalog_etag, optional_identity
+from .rate_limit import limiter
+from .serializers import ProductSchema, json_response, product_rows, cart_item_rows
+from .wishlist import get_wishlist_ids
 
 app = Flask(__name__)
 CORS(app)
+HttpCache(app)
+limiter.init_app(app)
 
 @app.route('/products', methods=['GET'])
+@catalog_etag
 def get_products():
-    category = request.args.get('category')
-    search = request.args.get('search')
-
-    query = Product.query
-    if category:
-        query = query.join(Category).filter(Category.name == category)
-    if search:
-        query = query.filter(Product.name.ilike(f"%{search}%"))
-
-    products = query.all()
-    return jsonify({'products': [
-        {'id': p.id, 'name': p.name, 'price': p.price, 'image_url': p.image_url, 'category': p.category.name}
-        for p in products
-    ]})
+    try:
+        filters = parse_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Matching ids in display order plus facet counts, then rows for just that page
+    product_ids, total, facets = search_catalog(filters)
+    results = product_rows(
+        ProductSchema.select().select_from(Product)
+        .outerjoin(Category, Category.id == Product.category_id)
+        .where(Product.id.in_(product_ids))
+    ) if product_ids else []
+    position = {pid: i for i, pid in enumerate(product_ids)}
+    results.sort(key=lambda product: position[product['id']])
+
+    # Flag wishlisted products for signed-in users from their cached id set
+    user_id = optional_identity()
+    if user_id:
+        wishlisted = get_wishlist_ids(user_id)
+        for product in results:
+            product['in_wishlist'] = product['id'] in wishlisted
+
+    return json_response({'products': results, 'total': total, 'facets': facets})
 
 @app.route('/categories', methods=['GET'])
 def get_categories():
@@ -34,32 +55,42 @@ def get_categories():
 @jwt_required()
 def get_cart_items():
     user_id = get_jwt_identity()
-    cart = Cart.query.filter_by(user_id=user_id).first()
-    if not cart:
+    items = cart_item_rows(user_id)
+    if not items and not Cart.query.filter_by(user_id=user_id).first():
         return jsonify({"message": "Cart is empty"}), 404
-    return jsonify([{
-        "product_id": item.product_id,
-        "name": item.product.name,
-        "price": item.product.price,
-        "quantity": item.quantity
-    } for item in cart.items]), 200
+    return json_response(items, 200)
 
 @app.route('/cart/items', methods=['POST'])
 @jwt_required()
 def add_item_to_cart():
     user_id = get_jwt_identity()
     data = request.get_json()
-    cart = Cart.query.filter_by(user_id=user_id).first() or Cart(user_id=user_id)
-    product = Product.query.get(data['product_id'])
-    if not product or product.stock < data.get('quantity', 1):
+    cart = Cart.query.filter_by(user_id=user_id).first()
+    if not cart:  # Carts can be purged while empty
+        cart = Cart(user_id=user_id)
+        db.session.add(cart)
+        db.session.flush()
+    try:
+        product_id = int(data['product_id'])
+        variant_id = int(data['variant_id']) if data.get('variant_id') else None
+        quantity = int(data.get('quantity', 1))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Missing or invalid product_id, variant_id or quantity"}), 400
+    product = Product.query.get(product_id)
+    variant = ProductVariant.query.get(variant_id) if variant_id else None
+    if variant and variant.product_id != product_id:
+        variant = None
+    stock_row = variant or product
+    if not product or (variant_id and not variant) or quantity < 1 or stock_row.stock < quantity:
         return jsonify({"error": "Invalid product or insufficient stock"}), 400
     cart_item = CartItem(
         cart_id=cart.id,
-        product_id=data['product_id'],
-        quantity=data['quantity']
+        product_id=product_id,
+        variant_id=variant.id if variant else None,
+        quantity=quantity
     )
     db.session.add(cart_item)
-    product.stock -= data['quantity']
+    stock_row.stock -= quantity
     db.session.commit()
     return jsonify({"message": "Item added to cart"}), 201
 
@@ -79,22 +110,36 @@ def add_to_cart():
             .with_for_update()
         ).scalar_one()
 
-        if product.stock < data['quantity']:
+        variant = None
+        if data.get('variant_id'):
+            variant = db.session.execute(
+                select(ProductVariant)
+                .where(ProductVariant.id == data['variant_id'], ProductVariant.product_id == product.id)
+                .with_for_update()
+            ).scalar_one_or_none()
+            if not variant:
+                return jsonify({"error": "Invalid variant"}), 400
+
+        stock_row = variant or product
+        if stock_row.stock < data['quantity']:
             return jsonify({"error": "Insufficient stock"}), 400
 
         cart = Cart.query.filter_by(user_id=user_id).first()
-        if not cart:
+        if not cart:  # Carts can be purged while empty
             cart = Cart(user_id=user_id)
             db.session.add(cart)
+            db.session.flush()
 
-        existing_item = next((i for i in cart.items if i.product_id == product.id), None)
+        variant_id = variant.id if variant else None
+        existing_item = next((i for i in cart.items if i.product_id == product.id and i.variant_id == variant_id), None)
         if existing_item:
             existing_item.quantity += data['quantity']
+            existing_item.added_at = datetime.utcnow()  # The whole line is held again from now
         else:
-            cart_item = CartItem(cart_id=cart.id, product_id=product.id, quantity=data['quantity'])
+            cart_item = CartItem(cart_id=cart.id, product_id=product.id, variant_id=variant_id, quantity=data['quantity'])
             db.session.add(cart_item)
 
-        product.stock -= data['quantity']
+        stock_row.stock -= data['quantity']
         db.session.commit()
         return jsonify({"message": "Item added to cart"}), 201
 
@@ -106,9 +151,7 @@ def add_to_cart():
 @jwt_required()
 def get_cart_summary():
     user_id = get_jwt_identity()
-    cart_items = Cart.query.filter_by(user_id=user_id).all()
-    total_price = sum(item.product.price * item.quantity for item in cart_items)
-    return jsonify({'total_items': len(cart_items), 'total_price': total_price})
+    return json_response(cart_summary(db.session.execute(cart_price_select(user_id))))
 
 @app.route('/', methods=['GET'])
 def get_dashboard():
@@ -116,7 +159,7 @@ def get_dashboard():
     products = Product.query.limit(10).all()
     return jsonify({
         'categories': [cat.name for cat in categories],
-        'featured_products': [{'id': p.id, 'name': p.name, 'price': p.price} for p in products]
+        'featured_products': [{'id': p.id, 'name': p.name, 'price': from_cents(p.price)} for p in products]
     })
 
 
@@ -128,23 +171,28 @@ def return_order(order_id):
     if not order:
         return jsonify({"error": "Order not found"}), 404
     
-    if order.return_status is not None:
-        return jsonify({"error": "Order already returned"}), 400
-    
-    if (datetime.utcnow() - order.created_at).days > 30:
+    # expire_return_window marks orders past the window 'return_expired'; the
+    # date check covers orders it hasn't reached yet
+    window = timedelta(days=current_app.config.get('RETURN_WINDOW_DAYS', Config.RETURN_WINDOW_DAYS))
+    if order.return_status == 'return_expired' or order.created_at < datetime.utcnow() - window:
         return jsonify({"error": "Order return period has expired"}), 400
+
+    if order.return_status != 'not_returned':
+        return jsonify({"error": "Order already returned"}), 400
+
+    if order.status == OrderStatus.CANCELLED:
+        return jsonify({"error": "Cancelled orders cannot be returned"}), 400
     
-    for item in order.items:
-        product = Product.query.get(item.product_id)
-        if product:
-            product.stock += item.quantity
+    restore_stock(order.items)
     
     order.return_status = 'returned'
     db.session.commit()
+    invalidate_order_history(user_id)
     return jsonify({"message": "Order returned successfully"})
 
 @app.route('/checkout', methods=['POST'])
 @jwt_required()
+@limiter.limit('checkout', by=('user', 'ip'))
 def create_order():
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
@@ -155,32 +203,44 @@ def create_order():
     try:
         db.session.begin_nested()
 
-        total = 0
-        new_order = Order(user_id=user_id, status="pending_payment")
+        # Adding to the cart already took the stock, so the order just consumes
+        # those reservations. Stock rows are still locked first, in the order
+        # every writer uses, before the new order can be autoflushed
+        products, variants = lock_stock(user.cart.items)
+        items = lock_cart_lines(item.id for item in user.cart.items)
+        if not items:
+            db.session.rollback()
+            return jsonify({"error": "Cart is empty"}), 400
+        discount = lock_cart_discount(user.cart)
+
+        prices, quantities = [], []
+        new_order = Order(user_id=user_id, status=OrderStatus.PENDING)
         db.session.add(new_order)
 
-        for cart_item in user.cart.items:
-            product = db.session.execute(
-                select(Product)
-                .where(Product.id == cart_item.product_id)
-                .with_for_update()
-            ).scalar_one()
-
-            if product.stock < cart_item.quantity:
+        for cart_item in items:
+            product = products.get(cart_item.product_id)
+            variant = variants.get(cart_item.variant_id) if cart_item.variant_id else None
+            if not product or (cart_item.variant_id and not variant):
+                # Removed since it was added; never fall back to another row's stock
                 db.session.rollback()
-                return jsonify({"error": f"Insufficient stock for {product.name}"}), 400
+                return jsonify({"error": "An item in your cart is no longer available"}), 409
 
-            total += cart_item.quantity * product.price
+            price = product.price + ((variant.price_modifier or 0) if variant else 0)
+            prices.append(price)
+            quantities.append(cart_item.quantity)
             new_order.items.append(OrderItem(
                 product_id=product.id,
+                variant_id=cart_item.variant_id,
                 quantity=cart_item.quantity,
-                price=product.price
+                price=price
             ))
-            product.stock -= cart_item.quantity
 
-        new_order.total = total
-        CartItem.query.filter_by(cart_id=user.cart.id).delete()
+        totals = cart_totals(prices, quantities, discount)  # Exact, in cents
+        new_order.total = totals['total']
+        redeem(user.cart, discount, totals)
+        CartItem.query.filter(CartItem.id.in_([item.id for item in items])).delete()  # Not lines added since
         db.session.commit()
+        invalidate_order_history(user_id)
         return jsonify({"message": "Order created", "order_id": new_order.id}), 201
 
     except Exception as e:
@@ -195,15 +255,14 @@ def cancel_order(order_id):
     if not order:
         return jsonify({"error": "Order not found"}), 404
 
-    if order.status not in [OrderStatus.PENDING.value, OrderStatus.COMPLETED.value]:
+    # A returned order's stock is already back on the shelf
+    if order.status not in (OrderStatus.PENDING, OrderStatus.COMPLETED) or order.return_status == 'returned':
         return jsonify({"error": "Order cannot be cancelled"}), 400
 
-    for item in order.items:
-        product = Product.query.get(item.product_id)
-        if product:
-            product.stock += item.quantity
+    restore_stock(order.items)
 
-    order.status = OrderStatus.CANCELLED.value
+    order.status = OrderStatus.CANCELLED
     db.session.commit()
+    invalidate_order_history(user_id)
 
     return jsonify({"message": "Order cancelled successfully"}), 200
@@ -0,0 +1,201 @@
+import json
+from datetime import date, datetime
+from enum import Enum
+from flask import Response
+from sqlalchemy import select
+from .models import db, Product, ProductVariant, Category, CartItem, Cart, Order, OrderItem, User, AuditLog, LowStock
+from .pricing import from_cents
+
+try:
+    import orjson  # Optional, several times faster than the stdlib encoder
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    # Only called by the stdlib encoder for types it can't handle; orjson does these natively
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+
+def json_response(obj, status=200):
+    return Response(dumps(obj), status=status, mimetype='application/json')
+
+
+class Schema:
+    # Declares the JSON fields of a model as plain column expressions, so list
+    # endpoints can select just those columns and build each dict straight from
+    # the result tuple instead of loading full ORM instances.
+
+    def __init__(self, **fields):
+        self.names = tuple(fields)
+        self.columns = []
+        self.converters = []
+        for name, field in fields.items():
+            column, convert = field if isinstance(field, tuple) else (field, None)
+            self.columns.append(column.label(name))
+            if convert:
+                self.converters.append((name, convert))
+
+    def select(self):
+        return select(*self.columns)
+
+    def dump(self, rows):
+        names = self.names
+        items = [dict(zip(names, row)) for row in rows]
+        for name, convert in self.converters:
+            for item in items:
+                item[name] = convert(item[name])
+        return items
+
+    def all(self, stmt):
+        return self.dump(db.session.execute(stmt))
+
+
+ProductSchema = Schema(
+    id=Product.id,
+    name=Product.name,
+    price=(Product.price, from_cents),
+    image_url=Product.image_url,
+    category=Category.name,
+)
+
+VariantSchema = Schema(
+    product_id=ProductVariant.product_id,
+    id=ProductVariant.id,
+    type=ProductVariant.variant_type,
+    value=ProductVariant.variant_value,
+    price=(Product.price + db.func.coalesce(ProductVariant.price_modifier, 0), from_cents),
+    in_stock=(ProductVariant.stock > 0, bool),
+)
+
+CartItemSchema = Schema(
+    product_id=CartItem.product_id,
+    variant_id=CartItem.variant_id,
+    name=Product.name,
+    price=(Product.price + db.func.coalesce(ProductVariant.price_modifier, 0), from_cents),
+    quantity=CartItem.quantity,
+)
+
+OrderSchema = Schema(
+    id=Order.id,
+    user_id=Order.user_id,
+    total=(Order.total, from_cents),
+    status=Order.status,
+    created_at=Order.created_at,
+)
+
+OrderItemSchema = Schema(
+    order_id=OrderItem.order_id,
+    product_id=OrderItem.product_id,
+    variant_id=OrderItem.variant_id,
+    name=Product.name,
+    quantity=OrderItem.quantity,
+    price=(OrderItem.price, from_cents),
+)
+
+UserSchema = Schema(
+    id=User.id,
+    email=User.email,
+    is_admin=(User.is_admin, bool),
+)
+
+AuditLogSchema = Schema(
+    id=AuditLog.id,
+    admin_id=AuditLog.admin_id,
+    action=AuditLog.action,
+    target_type=AuditLog.target_type,
+    target_id=AuditLog.target_id,
+    payload=AuditLog.payload,
+    timestamp=AuditLog.timestamp,
+)
+
+LowStockSchema = Schema(
+    product_id=LowStock.product_id,
+    variant_id=LowStock.variant_id,
+    name=Product.name,
+    level=LowStock.level,
+    stock=db.func.coalesce(ProductVariant.stock, Product.stock),
+    since=LowStock.since,
+)
+
+
+def variant_select(product_ids):
+    return (
+        VariantSchema.select()
+        .join(Product, Product.id == ProductVariant.product_id)
+        .where(ProductVariant.product_id.in_(product_ids))
+        .order_by(ProductVariant.id)
+    )
+
+
+def attach_variants(products, variants):
+    by_id = {}
+    for product in products:
+        product['variants'] = []
+        by_id[product['id']] = product
+    for variant in variants:
+        by_id[variant.pop('product_id')]['variants'].append(variant)
+    return products
+
+
+def product_rows(stmt):
+    # Products plus their variants in exactly two queries
+    products = ProductSchema.all(stmt)
+    if not products:
+        return products
+    variants = VariantSchema.all(variant_select([product['id'] for product in products]))
+    return attach_variants(products, variants)
+
+
+def order_item_select(order_ids):
+    return (
+        OrderItemSchema.select()
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(OrderItem.order_id.in_(order_ids))
+        .order_by(OrderItem.id)
+    )
+
+
+def attach_items(orders, items):
+    by_id = {}
+    for order in orders:
+        order['items'] = []
+        by_id[order['id']] = order
+    for item in items:
+        by_id[item.pop('order_id')]['items'].append(item)
+    return orders
+
+
+def order_rows(stmt):
+    # Orders plus their items and product names in exactly two queries
+    orders = OrderSchema.all(stmt)
+    if not orders:
+        return orders
+    items = OrderItemSchema.all(order_item_select([order['id'] for order in orders]))
+    return attach_items(orders, items)
+
+
+def cart_item_select(user_id):
+    return (
+        CartItemSchema.select()
+        .select_from(CartItem)
+        .join(Cart, Cart.id == CartItem.cart_id)
+        .join(Product, Product.id == CartItem.product_id)
+        .outerjoin(ProductVariant, ProductVariant.id == CartItem.variant_id)
+        .where(Cart.user_id == user_id)
+        .order_by(CartItem.id)
+    )
+
+
+def cart_item_rows(user_id):
+    return CartItemSchema.all(cart_item_select(user_id))
@@ -0,0 +1,193 @@
+import json
+import logging
+from datetime import datetime
+from queue import Queue
+from threading import Lock
+from flask import current_app, has_app_context
+from sqlalchemy import event, delete, func, inspect, literal_column, or_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from .config import Config
+from .models import Product, ProductVariant, LowStock
+
+logger = logging.getLogger(__name__)
+
+# Watches stock levels from the flush itself: every flush that changes
+# Product.stock or ProductVariant.stock (add_to_cart, stock release, cancel,
+# return, admin edits) compares the old and new value of just those rows with
+# the threshold. Crossings update low_stock in the same transaction and are
+# handed to the alert sink once it commits, so nothing ever scans the catalog.
+# Flushes don't lock the stock rows they change, so low_stock is upserted on
+# its unique ix_low_stock_item rather than deleted and re-inserted.
+# Bulk UPDATE statements bypass the ORM and so this hook as well.
+
+
+def stock_level(stock, threshold):
+    if stock is None:
+        return None
+    if stock <= 0:
+        return 'out'
+    if stock <= threshold:
+        return 'low'
+    return None
+
+
+class LogSink:  # Alerts as warnings in the application log
+
+    def send(self, events):
+        for e in events:
+            logger.warning("Stock %s: product %s variant %s at %s", e['level'] or 'restocked',
+                           e['product_id'], e['variant_id'], e['stock'])
+
+
+class FileSink:  # One JSON line per alert, for a log shipper or tests
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = Lock()
+
+    def send(self, events):
+        lines = ''.join(json.dumps(e) + '\n' for e in events)
+        with self.lock, open(self.path, 'a') as f:
+            f.write(lines)
+
+
+class QueueSink:  # Alerts on an in-process queue, for tests or a consumer thread
+
+    def __init__(self, queue=None):
+        self.queue = queue or Queue()
+
+    def send(self, events):
+        for e in events:
+            self.queue.put(e)
+
+
+def sink_from_url(url):
+    if not url or url == 'none':
+        return None
+    if url == 'log':
+        return LogSink()
+    if url.startswith('file://'):
+        return FileSink(url[len('file://'):])
+    raise ValueError(f"Unknown stock alert sink {url}")
+
+
+_sink = None
+_sink_configured = False
+
+
+def set_sink(sink):
+    # Replaces the sink built from STOCK_ALERT_SINK, e.g. with a QueueSink in tests
+    global _sink, _sink_configured
+    _sink, _sink_configured = sink, True
+
+
+def get_sink():
+    global _sink, _sink_configured
+    if not _sink_configured:
+        url = current_app.config.get('STOCK_ALERT_SINK', Config.STOCK_ALERT_SINK) if has_app_context() \
+            else Config.STOCK_ALERT_SINK
+        _sink, _sink_configured = sink_from_url(url), True
+    return _sink
+
+
+def _threshold():
+    if has_app_context():
+        return current_app.config.get('LOW_STOCK_THRESHOLD', Config.LOW_STOCK_THRESHOLD)
+    return Config.LOW_STOCK_THRESHOLD
+
+
+def _crossings(session, threshold):
+    for obj in (*session.new, *session.dirty):
+        if not isinstance(obj, (Product, ProductVariant)):
+            continue
+        history = inspect(obj).attrs.stock.history
+        if not history.added:
+            continue
+        old = history.deleted[0] if history.deleted else None
+        new = history.added[0]
+        before, after = stock_level(old, threshold), stock_level(new, threshold)
+        if before == after:
+            continue
+        if isinstance(obj, ProductVariant):
+            yield obj.product_id, obj.id, before, after, new
+        else:
+            yield obj.id, None, before, after, new
+
+
+def _upsert(connection, rows):
+    table = LowStock.__table__
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update(level=stmt.inserted.level, since=stmt.inserted.since)
+    else:
+        stmt = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.product_id, func.coalesce(table.c.variant_id, literal_column("0"))],
+            set_={'level': stmt.excluded.level, 'since': stmt.excluded.since},
+        )
+    connection.execute(stmt, rows)
+
+
+@event.listens_for(Product.stock, 'set', active_history=True)
+@event.listens_for(ProductVariant.stock, 'set', active_history=True)
+def _load_old_stock(target, value, oldvalue, initiator):
+    # Registered for active_history alone: assigning stock to an expired row
+    # loads the old value first, so a restock by assignment is still a crossing
+    return value
+
+
+@event.listens_for(Session, 'after_flush')
+def _watch_stock(session, flush_context):
+    threshold = _threshold()
+    crossings = list(_crossings(session, threshold))
+    if not crossings:
+        return
+
+    # Core statements on the flush's connection, so nothing here triggers another flush
+    now = datetime.utcnow()
+    table = LowStock.__table__
+    connection = session.connection()
+    restocked = [(product_id, variant_id) for product_id, variant_id, before, after, stock in crossings if not after]
+    product_ids = [product_id for product_id, variant_id in restocked if variant_id is None]
+    variant_ids = [variant_id for product_id, variant_id in restocked if variant_id is not None]
+    conditions = []
+    if product_ids:
+        conditions.append(table.c.product_id.in_(product_ids) & table.c.variant_id.is_(None))
+    if variant_ids:
+        conditions.append(table.c.variant_id.in_(variant_ids))
+    if conditions:
+        connection.execute(delete(table).where(or_(*conditions)))
+    rows = [
+        {'product_id': product_id, 'variant_id': variant_id, 'level': after, 'since': now}
+        for product_id, variant_id, before, after, stock in crossings if after
+    ]
+    if rows:
+        _upsert(connection, rows)
+
+    session.info.setdefault('stock_alerts', []).extend(
+        {'product_id': product_id, 'variant_id': variant_id, 'level': after, 'previous': before,
+         'stock': stock, 'threshold': threshold, 'at': now.isoformat()}
+        for product_id, variant_id, before, after, stock in crossings
+    )
+
+
+@event.listens_for(Session, 'after_commit')
+def _send_alerts(session):
+    alerts = session.info.pop('stock_alerts', None)
+    if not alerts:
+        return
+    sink = get_sink()
+    if sink is None:
+        return
+    try:
+        sink.send(alerts)
+    except Exception:
+        logger.exception("Failed to send %d stock alerts", len(alerts))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_alerts(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('stock_alerts', None)
@@ -0,0 +1,44 @@
+import importlib
+from flask import Flask
+from flask_cors import CORS
+from flask_jwt_extended import JWTManager
+from .auth import register_revocation_check
+from .config import Config
+from .http_cache import HttpCache
+from .models import db
+from .rate_limit import limiter
+
+# Module apps whose views are mounted, in priority order for duplicate rules (e.g. /checkout)
+VIEW_MODULES = ['orders', 'routes', 'admin', 'auth', 'wishlist', 'recommendations', 'trending', 'order_history',
+                'guest_cart']
+
+
+def create_app(database_url, **config):
+    # Every module app's views on one app, for the load tests, benchmarks and tests
+    app = Flask('yepto_storefront')
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    if database_url.startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30, 'check_same_thread': False}}
+    app.config.update(config)
+
+    db.init_app(app)
+    register_revocation_check(JWTManager(app))
+    CORS(app)
+    HttpCache(app)
+    limiter.init_app(app)
+
+    mounted = set()
+    for name in VIEW_MODULES:
+        module = importlib.import_module(f'yepto.{name}')
+        for rule in module.app.url_map.iter_rules():
+            if rule.endpoint == 'static':
+                continue
+            methods = rule.methods - {'HEAD', 'OPTIONS'}
+            key = (rule.rule, frozenset(methods))
+            if key in mounted:
+                continue
+            mounted.add(key)
+            app.add_url_rule(rule.rule, endpoint=f'{name}.{rule.endpoint}',
+                             view_func=module.app.view_functions[rule.endpoint], methods=methods)
+    return app
@@ -0,0 +1,279 @@
+import heapq
+import io
+import math
+import time
+from calendar import timegm
+from datetime import datetime, timedelta
+from threading import Lock
+
+import numpy as np
+from flask import Flask, current_app, request, jsonify
+from sqlalchemy import select, func, insert, delete
+from .config import Config
+from .http_cache import optional_identity
+from .models import db, Analytics, Product, TrendingCheckpoint
+from .rate_limit import limiter
+from .serializers import json_response
+
+app = Flask(__name__)
+limiter.init_app(app)
+
+PRIME = 2147483647  # 2^31 - 1, so a * product_id + b stays inside int64
+SYNC_BATCH = 10000
+SYNC_GAP_SECONDS = 60  # How long ids skipped over by a sync are looked for again
+SYNC_MAX_GAPS = 1000
+RESULT_TTL = 1.0  # Seconds a computed ranking is served from memory
+
+
+def _epoch_seconds(dt):
+    return timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
+class TrendingTracker:
+    # Approximate top-K over a sliding window in bounded memory. The window is
+    # split into buckets, each holding a Count-Min sketch; the running total
+    # sketch gains every event and loses a bucket's counts when it expires.
+    # A bounded candidate set remembers which products might be in the top K.
+
+    def __init__(self, window_seconds=3600, buckets=60, width=2048, depth=4, capacity=512, seed=0x7e4d):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, PRIME, depth, dtype=np.int64)
+        self.b = rng.integers(0, PRIME, depth, dtype=np.int64)
+        self.rows = np.arange(depth)
+        self.sketches = np.zeros((buckets, depth, width), dtype=np.int32)
+        self.total = np.zeros((depth, width), dtype=np.int64)
+        self.epoch = int(time.time() // self.bucket_seconds)
+        self.candidates = {}  # product_id -> estimate when last seen
+        self.last_event_id = 0
+        self.gaps = {}  # analytics ids below last_event_id not seen yet -> when first skipped
+        self.lock = Lock()
+        self.results = {}
+
+    def _columns(self, product_ids):
+        return (self.a[:, None] * product_ids + self.b[:, None]) % PRIME % self.width
+
+    def _advance(self, epoch):
+        if epoch <= self.epoch:
+            return
+        for e in range(self.epoch + 1, self.epoch + 1 + min(epoch - self.epoch, self.buckets)):
+            slot = e % self.buckets
+            self.total -= self.sketches[slot]
+            self.sketches[slot] = 0
+        self.epoch = epoch
+        self.results.clear()
+
+    def add(self, product_id, weight=1, at=None):
+        epoch = int((time.time() if at is None else at) // self.bucket_seconds)
+        with self.lock:
+            self._advance(epoch)
+            if epoch <= self.epoch - self.buckets:
+                return  # Already outside the window
+            cols = self._columns(np.array([product_id]))[:, 0]
+            self.sketches[epoch % self.buckets, self.rows, cols] += weight
+            self.total[self.rows, cols] += weight
+            estimate = int(self.total[self.rows, cols].min())
+
+            if product_id in self.candidates or len(self.candidates) < self.capacity:
+                self.candidates[product_id] = estimate
+                return
+            weakest = min(self.candidates, key=self.candidates.get)
+            if estimate > self.candidates[weakest]:
+                del self.candidates[weakest]
+                self.candidates[product_id] = estimate
+
+    def top(self, limit=20, window_seconds=None):
+        now = time.monotonic()
+        span = self.buckets
+        if window_seconds:
+            span = max(1, min(self.buckets, math.ceil(window_seconds / self.bucket_seconds)))
+
+        cached = self.results.get((span, limit))
+        if cached and cached[0] > now:
+            return cached[1]
+
+        with self.lock:
+            self._advance(int(time.time() // self.bucket_seconds))
+            if not self.candidates:
+                return []
+            if span == self.buckets:
+                sketch = self.total
+            else:
+                slots = [(self.epoch - i) % self.buckets for i in range(span)]
+                sketch = self.sketches[slots].sum(axis=0)
+            ids = np.fromiter(self.candidates, dtype=np.int64, count=len(self.candidates))
+            estimates = sketch[self.rows[:, None], self._columns(ids)].min(axis=0)
+            if span == self.buckets:
+                self.candidates = dict(zip(ids.tolist(), estimates.tolist()))
+
+        ranked = heapq.nlargest(limit, zip(estimates.tolist(), ids.tolist()))
+        result = [{'product_id': pid, 'score': score} for score, pid in ranked if score > 0]
+        self.results[(span, limit)] = (now + RESULT_TTL, result)
+        return result
+
+    def dumps(self):
+        with self.lock:
+            buffer = io.BytesIO()
+            np.savez_compressed(
+                buffer, sketches=self.sketches, epoch=self.epoch,
+                candidates=np.array(list(self.candidates.items()), dtype=np.int64).reshape(-1, 2),
+                shape=(self.window_seconds, self.buckets, self.width, self.depth),
+            )
+            return buffer.getvalue()
+
+    def loads(self, data):
+        state = np.load(io.BytesIO(data))
+        if tuple(state['shape']) != (self.window_seconds, self.buckets, self.width, self.depth):
+            return False  # Saved with a different configuration
+        with self.lock:
+            self.sketches = state['sketches']
+            self.total = self.sketches.sum(axis=0, dtype=np.int64)
+            self.epoch = int(state['epoch'])
+            self.candidates = dict(state['candidates'].tolist())
+            self.results.clear()
+        return True
+
+
+tracker = None
+tracker_lock = Lock()
+sync_lock = Lock()
+last_sync = 0.0
+last_checkpoint = 0.0
+
+
+def get_tracker():
+    global tracker, last_checkpoint
+    if tracker is None:
+        with tracker_lock:
+            if tracker is None:
+                config = current_app.config
+                new_tracker = TrendingTracker(
+                    window_seconds=config.get('TRENDING_WINDOW_SECONDS', Config.TRENDING_WINDOW_SECONDS),
+                    buckets=config.get('TRENDING_BUCKETS', Config.TRENDING_BUCKETS),
+                )
+                restore(new_tracker)
+                last_checkpoint = time.monotonic()
+                tracker = new_tracker
+    return tracker
+
+
+def restore(tracker):
+    since = datetime.utcnow() - timedelta(seconds=tracker.window_seconds)
+    checkpoint = db.session.execute(
+        select(TrendingCheckpoint).order_by(TrendingCheckpoint.id.desc()).limit(1)
+    ).scalar_one_or_none()
+    if checkpoint and checkpoint.created_at >= since and tracker.loads(checkpoint.state):
+        tracker.last_event_id = checkpoint.last_event_id
+    else:
+        # No usable checkpoint, replay just the current window
+        first_id = db.session.execute(select(func.min(Analytics.id)).where(Analytics.created_at >= since)).scalar()
+        if first_id is None:
+            first_id = (db.session.execute(select(func.max(Analytics.id))).scalar() or 0) + 1
+        tracker.last_event_id = first_id - 1
+    sync(tracker)
+
+
+def _fold(tracker, events, weights):
+    for event_id, product_id, event_type, created_at in events:
+        if product_id and event_type in weights:
+            tracker.add(product_id, weights[event_type], _epoch_seconds(created_at) if created_at else None)
+
+
+def sync(tracker):
+    # Folds in analytics rows written since the last sync by any worker, read
+    # by primary key. Ids are taken at insert but become visible at commit, so
+    # a lower id can show up after a higher one was read; ids skipped over are
+    # looked up again on every sync for SYNC_GAP_SECONDS, then given up on as
+    # rolled back.
+    weights = current_app.config.get('TRENDING_EVENT_WEIGHTS', Config.TRENDING_EVENT_WEIGHTS)
+    columns = (Analytics.id, Analytics.product_id, Analytics.event_type, Analytics.created_at)
+    now = time.monotonic()
+    tracker.gaps = {event_id: at for event_id, at in tracker.gaps.items() if now - at < SYNC_GAP_SECONDS}
+    if tracker.gaps:
+        late = db.session.execute(select(*columns).where(Analytics.id.in_(list(tracker.gaps)))).all()
+        _fold(tracker, late, weights)
+        for event in late:
+            del tracker.gaps[event.id]
+
+    while True:
+        events = db.session.execute(
+            select(*columns)
+            .where(Analytics.id > tracker.last_event_id)
+            .order_by(Analytics.id)
+            .limit(SYNC_BATCH)
+        ).all()
+        _fold(tracker, events, weights)
+        previous = tracker.last_event_id
+        for event in events:
+            if 1 < event.id - previous <= SYNC_MAX_GAPS:  # Larger jumps are id reservations, not open transactions
+                tracker.gaps.update(dict.fromkeys(range(previous + 1, event.id), now))
+            previous = event.id
+        while len(tracker.gaps) > SYNC_MAX_GAPS:
+            del tracker.gaps[next(iter(tracker.gaps))]  # Oldest first
+        if events:
+            tracker.last_event_id = events[-1].id
+        if len(events) < SYNC_BATCH:
+            return
+
+
+def checkpoint(tracker):
+    saved = TrendingCheckpoint(last_event_id=tracker.last_event_id, state=tracker.dumps())
+    db.session.add(saved)
+    db.session.flush()
+    db.session.execute(delete(TrendingCheckpoint).where(TrendingCheckpoint.id != saved.id))
+    db.session.commit()
+
+
+def refresh_if_due(tracker):
+    # Only one request thread syncs at a time, the rest keep serving cached rankings
+    global last_sync, last_checkpoint
+    config = current_app.config
+    now = time.monotonic()
+    if now - last_sync < config.get('TRENDING_SYNC_SECONDS', Config.TRENDING_SYNC_SECONDS):
+        return
+    if not sync_lock.acquire(blocking=False):
+        return
+    try:
+        last_sync = now
+        sync(tracker)
+        if now - last_checkpoint >= config.get('TRENDING_CHECKPOINT_SECONDS', Config.TRENDING_CHECKPOINT_SECONDS):
+            last_checkpoint = now
+            checkpoint(tracker)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Failed to refresh trending products")
+    finally:
+        sync_lock.release()
+
+
+def record_events(event_type, product_ids, user_id=None):
+    # Appends analytics rows in one multi-row insert; the caller commits
+    if product_ids:
+        db.session.execute(insert(Analytics), [
+            {'event_type': event_type, 'user_id': user_id, 'product_id': pid, 'created_at': datetime.utcnow()}
+            for pid in product_ids
+        ])
+
+
+@app.route('/products/<int:product_id>/view', methods=['POST'])
+@limiter.limit('product_view')
+def record_product_view(product_id):
+    if not db.session.execute(select(Product.id).where(Product.id == product_id)).first():
+        return jsonify({"error": "Product not found"}), 404
+    record_events('product_view', [product_id], optional_identity())
+    db.session.commit()
+    return jsonify({"message": "View recorded"}), 201
+
+
+@app.route('/products/trending', methods=['GET'])
+def get_trending_products():
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    window = request.args.get('window', type=int)  # Seconds, capped at the tracker's window
+    tracker = get_tracker()
+    refresh_if_due(tracker)
+    return json_response({'products': tracker.top(limit, window)})
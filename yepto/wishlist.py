@@ -0,0 +1,142 @@
+from flask import Flask, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import IntegrityError
+from .local_cache import LocalCache
+from .models import db, Wishlist, Product
+from .pricing import from_cents
+
+app = Flask(__name__)
+
+WISHLIST_CACHE_SIZE = 10000  # Max users whose wishlist ids are kept in memory
+WISHLIST_CACHE_TTL = 5  # Seconds another worker's wishlist change may go unseen here
+WISHLIST_ADD_ATTEMPTS = 3
+
+# user_id -> frozenset of wishlisted product ids, for the in_wishlist flags on reads
+wishlist_cache = LocalCache(WISHLIST_CACHE_TTL, WISHLIST_CACHE_SIZE)
+
+
+def get_wishlist_ids(user_id):
+    ids, token = wishlist_cache.get(user_id)
+    if ids is not None:
+        return ids
+
+    # One query on the (user_id, product_id) index, no table rows touched
+    ids = frozenset(db.session.execute(
+        select(Wishlist.product_id).where(Wishlist.user_id == user_id)
+    ).scalars())
+    wishlist_cache.put(user_id, ids, token)
+    return ids
+
+
+def invalidate_wishlist(user_id):
+    wishlist_cache.invalidate(user_id)
+
+
+def _add_missing(user_id, product_ids):
+    # Inserts the products not on the wishlist yet and returns how many. Reads
+    # the table rather than the cache, which may be seconds old. A concurrent
+    # add of the same product trips ix_wishlist_user_product; that one counts
+    # as already added and the rest are inserted again.
+    for attempt in range(WISHLIST_ADD_ATTEMPTS):
+        present = set(db.session.execute(
+            select(Wishlist.product_id).where(Wishlist.user_id == user_id, Wishlist.product_id.in_(product_ids))
+        ).scalars())
+        missing = [pid for pid in product_ids if pid not in present]
+        if not missing:
+            return 0
+        try:
+            db.session.execute(insert(Wishlist), [{'user_id': user_id, 'product_id': pid} for pid in missing])
+            db.session.commit()
+            return len(missing)
+        except IntegrityError:
+            db.session.rollback()
+            if attempt == WISHLIST_ADD_ATTEMPTS - 1:
+                raise
+
+
+def parse_product_ids(values):
+    try:
+        return list(dict.fromkeys(int(v) for v in values))  # Dedupe, keep order
+    except (TypeError, ValueError):
+        return None
+
+
+@app.route('/wishlist', methods=['GET'])
+@jwt_required()
+def get_wishlist():
+    user_id = get_jwt_identity()
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.price, Product.image_url, Wishlist.added_at)
+        .join(Product, Product.id == Wishlist.product_id)
+        .where(Wishlist.user_id == user_id)
+        .order_by(Wishlist.added_at.desc())
+    ).all()
+    return jsonify({'wishlist': [
+        {'product_id': r.id, 'name': r.name, 'price': from_cents(r.price), 'image_url': r.image_url,
+         'added_at': r.added_at.isoformat() if r.added_at else None}
+        for r in rows
+    ]})
+
+
+@app.route('/wishlist', methods=['POST'])
+@jwt_required()
+def add_to_wishlist():
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    product_ids = parse_product_ids(data.get('product_ids', []))
+    if not product_ids:
+        return jsonify({"error": "Missing or invalid product_ids"}), 400
+
+    product_ids = db.session.execute(
+        select(Product.id).where(Product.id.in_(product_ids))
+    ).scalars().all()
+    if not product_ids:
+        return jsonify({"message": "Wishlist updated", "added": 0}), 200
+
+    try:
+        added = _add_missing(user_id, product_ids)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to update wishlist"}), 500
+    finally:
+        invalidate_wishlist(user_id)
+
+    return jsonify({"message": "Wishlist updated", "added": added}), 201 if added else 200
+
+
+@app.route('/wishlist', methods=['DELETE'])
+@jwt_required()
+def remove_from_wishlist():
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    product_ids = parse_product_ids(data.get('product_ids', []))
+    if not product_ids:
+        return jsonify({"error": "Missing or invalid product_ids"}), 400
+
+    try:
+        result = db.session.execute(
+            delete(Wishlist)
+            .where(Wishlist.user_id == user_id, Wishlist.product_id.in_(product_ids))
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to update wishlist"}), 500
+    finally:
+        invalidate_wishlist(user_id)
+
+    return jsonify({"message": "Wishlist updated", "removed": result.rowcount}), 200
+
+
+@app.route('/wishlist/contains', methods=['GET'])
+@jwt_required()
+def wishlist_contains():
+    user_id = get_jwt_identity()
+    raw_ids = request.args.get('product_ids', '')
+    product_ids = parse_product_ids(raw_ids.split(',')) if raw_ids else []
+    if product_ids is None:
+        return jsonify({"error": "Invalid product_ids"}), 400
+
+    wishlisted = get_wishlist_ids(user_id)
+    return jsonify({'wishlisted': [pid for pid in product_ids if pid in wishlisted]})